@@ -11,15 +11,86 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from backend.routes import chat
+from backend.routes import chat, cluster, debug, disputes, metrics, stats, ws
+from backend.routing import SessionRoutingMiddleware, get_cluster
+from backend.session_store import SESSION_SWEEP_INTERVAL_S, sweep_sessions
+from backend.message_log import get_message_log
+from backend.snapshot import SNAPSHOT_INTERVAL_S, load_snapshot, snapshot_path, write_snapshot
+from src.crm import close_crm_client
+from src.utils.log import configure_logging, get_logger
+
+# JSON lines through a background writer (LOG_LEVEL, LOG_FORMAT)
+configure_logging()
+logger = get_logger(__name__)
+
+
+async def sweep_sessions_periodically():
+    """Evict expired sessions even when no requests arrive."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_S)
+        try:
+            removed = await asyncio.to_thread(sweep_sessions)
+            if removed:
+                logger.info("Swept %d expired sessions", removed)
+            if chat.SESSION_MODE == "stateless":
+                removed = await asyncio.to_thread(get_message_log().sweep)
+                if removed:
+                    logger.info("Swept %d idle message logs", removed)
+        except Exception:
+            logger.exception("Session sweep failed")
+
+
+async def snapshot_periodically():
+    """Bound what a crash can lose to SNAPSHOT_INTERVAL_S of changes."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_S)
+        try:
+            await asyncio.to_thread(write_snapshot)
+        except Exception:
+            logger.exception("Snapshot failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks."""
+    try:
+        restored = load_snapshot()
+        if restored:
+            logger.info(
+                "Restored %d sessions from %s (%ss old)", restored["sessions"], snapshot_path(), restored["age_s"]
+            )
+    except Exception as e:
+        logger.error("Could not load snapshot, starting empty: %s", e)
+
+    sweeper = asyncio.create_task(sweep_sessions_periodically())
+    snapshotter = asyncio.create_task(snapshot_periodically()) if SNAPSHOT_INTERVAL_S > 0 else None
+    yield
+    sweeper.cancel()
+    if snapshotter:
+        snapshotter.cancel()
+    try:
+        saved = await asyncio.to_thread(write_snapshot, force=True)
+        if saved:
+            logger.info("Saved %d sessions and %d records", saved["sessions"], saved["records"])
+    except Exception:
+        logger.exception("Shutdown snapshot failed")
+    # Release pooled CRM connections
+    await close_crm_client()
+    if get_cluster():
+        await get_cluster().close()
+
 
 app = FastAPI(
     title="Debt Collection Agent API",
     description="Web-based debt collection agent backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware to allow frontend requests
@@ -31,8 +102,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Send each session's requests to the node owning it (multi-node only)
+if get_cluster():
+    app.add_middleware(SessionRoutingMiddleware, cluster=get_cluster())
+
 # Register routes
 app.include_router(chat.router, prefix="/api", tags=["chat"])
+app.include_router(ws.router, prefix="/api", tags=["chat"])
+app.include_router(debug.router, prefix="/api", tags=["debug"])
+app.include_router(disputes.router, prefix="/api", tags=["disputes"])
+app.include_router(stats.router, prefix="/api", tags=["stats"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
+app.include_router(cluster.router, prefix="/api", tags=["cluster"])
 
 
 @app.get("/")
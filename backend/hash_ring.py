@@ -0,0 +1,71 @@
+# backend/hash_ring.py
+
+"""
+Consistent-hash ring with virtual nodes.
+
+Each node is placed on the ring at `vnodes` points; a key belongs to the
+first point clockwise from its hash. Adding or removing one of N nodes
+moves about 1/N of the keys, all of them to or from that node, and more
+virtual nodes give a more even share per node.
+
+Hashes are BLAKE2b rather than hash(), which is salted per process, so
+every worker and every node computes the same placement.
+"""
+
+import bisect
+import hashlib
+from collections import Counter
+from typing import Iterable, Optional
+
+
+DEFAULT_VNODES = 160
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Maps keys (session IDs) to nodes (base URLs)."""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self._nodes: set[str] = set()
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> list[str]:
+        return sorted(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for i in range(self.vnodes):
+            point = ring_hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """The node owning `key`, or None if the ring is empty."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, ring_hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def distribution(self, keys: Iterable[str]) -> dict[str, int]:
+        """How many of `keys` each node owns."""
+        counts = Counter(self.node_for(key) for key in keys)
+        return {node: counts.get(node, 0) for node in self.nodes}
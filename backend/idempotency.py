@@ -0,0 +1,129 @@
+# backend/idempotency.py
+
+"""
+Idempotency-Key support for /api/chat.
+
+Responses are cached per (session_id, key) for IDEMPOTENCY_TTL_S after the
+turn completes. A repeat of a completed request gets the stored response;
+a repeat of a request that is still running waits for its result instead
+of running the turn (and its LLM calls) again. Failed turns are not cached,
+so they can be retried with the same key.
+
+Only completed responses count towards IDEMPOTENCY_MAX_ENTRIES and expire;
+in-flight requests are never evicted, since their waiters and retries
+depend on them.
+
+The cache is per worker. Duplicates that reach another worker are caught by
+the session version check (409) instead.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """The key was already used for a different request on this session."""
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "future", "expires_at")
+
+    def __init__(self, fingerprint, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.expires_at = float("inf")  # set when the request completes
+
+
+class IdempotencyCache:
+    """Per-session idempotency keys with a TTL and in-flight coalescing."""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_S, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Completed entries, oldest first, so expiry and capacity eviction
+        # both pop from the front; in-flight ones are kept apart
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._running: dict[tuple[str, str], _Entry] = {}
+        self.stats = {"executed": 0, "replayed": 0, "waited": 0}
+
+    async def run(self, session_id: str, key: str, fingerprint, compute: Callable[[], Awaitable]) -> tuple[object, bool]:
+        """
+        Return (result, replayed). `compute` runs at most once per live key;
+        `fingerprint` identifies the request so a reused key can be detected.
+        """
+        cache_key = (session_id, key)
+        while True:
+            self._evict(time.monotonic())
+            entry = self._running.get(cache_key) or self._entries.get(cache_key)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReusedError(
+                    "Idempotency-Key was already used for a different request on this session"
+                )
+            self.stats["waited" if not entry.future.done() else "replayed"] += 1
+            try:
+                return await asyncio.shield(entry.future), True
+            except asyncio.CancelledError:
+                if not entry.future.cancelled():
+                    raise  # we were cancelled ourselves
+                # The original request was cancelled: run it here instead
+
+        entry = _Entry(fingerprint, asyncio.get_running_loop().create_future())
+        self._running[cache_key] = entry
+        self.stats["executed"] += 1
+        try:
+            result = await compute()
+        except BaseException as e:
+            if self._running.get(cache_key) is entry:
+                del self._running[cache_key]
+            if isinstance(e, asyncio.CancelledError):
+                entry.future.cancel()
+            else:
+                entry.future.set_exception(e)
+                # Mark retrieved so a failure nobody waited for doesn't warn
+                entry.future.exception()
+            raise
+
+        entry.future.set_result(result)
+        entry.expires_at = time.monotonic() + self.ttl
+        if self._running.get(cache_key) is entry:
+            del self._running[cache_key]
+            self._entries[cache_key] = entry
+        self._evict(time.monotonic())
+        return result, False
+
+    def _evict(self, now: float) -> None:
+        # Entries complete with the same TTL, so expiry order is FIFO
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.expires_at > now:
+                break
+            self._entries.popitem(last=False)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def metrics(self) -> dict:
+        return {"entries": len(self._entries), "running": len(self._running), **self.stats}
+
+
+# =========================
+# Process-wide cache
+# =========================
+_cache: Optional[IdempotencyCache] = None
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    """Return the process-wide idempotency cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = IdempotencyCache()
+    return _cache
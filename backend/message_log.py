@@ -0,0 +1,238 @@
+# backend/message_log.py
+
+"""
+Append-only message history for the stateless session mode.
+
+Messages are stored by absolute position in the call (the same numbering
+as client cursors and src/memory.py), so the live window of a state is
+read(session_id, archived_message_count).
+
+append() only succeeds at the current end of the log, which makes it the
+version check of stateless mode: a turn computed from an outdated token
+fails with MessageLogConflictError.
+
+Backends (MESSAGE_LOG=sqlite|memory):
+- SQLiteMessageLog (default): MESSAGE_LOG_PATH, shared by every worker on
+  the host.
+- MemoryMessageLog: process-local, for tests and single-worker runs.
+
+Logs of sessions without a new message for MESSAGE_LOG_RETENTION_S are
+removed by sweep().
+
+SQLiteMessageLog blocks on file I/O and on other workers' write locks
+(`blocking`), so async callers run its calls in a worker thread.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+MESSAGE_LOG_RETENTION_S = float(os.getenv("MESSAGE_LOG_RETENTION_S", os.getenv("SESSION_IDLE_TTL_S", "1800")))
+
+DEFAULT_PATH = os.path.join(".data", "messages.sqlite3")
+
+
+class MessageLogConflictError(RuntimeError):
+    """The log is not at the position the append was computed from."""
+
+
+class MessageLog:
+    """Interface shared by message log backends."""
+
+    # Calls may wait on disk or on another worker's lock
+    blocking = False
+
+    def __init__(self, retention: float):
+        self.retention = retention
+
+    def append(self, session_id: str, start: int, messages: list[dict]) -> int:
+        """
+        Append messages at position `start`, which must be the current end
+        of the log. Returns the new length.
+        """
+        raise NotImplementedError
+
+    def read(self, session_id: str, start: int = 0, end: Optional[int] = None) -> list[dict]:
+        """Messages [start:end] by absolute position."""
+        raise NotImplementedError
+
+    def length(self, session_id: str) -> int:
+        """Number of messages logged for the session (0 if unknown)."""
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Remove logs idle for longer than the retention. Returns how many."""
+        raise NotImplementedError
+
+
+class MemoryMessageLog(MessageLog):
+    """Process-local lists."""
+
+    def __init__(self, retention: float = MESSAGE_LOG_RETENTION_S):
+        super().__init__(retention)
+        self._lock = threading.Lock()
+        # session_id -> (messages, updated_at)
+        self._logs: dict[str, tuple[list[dict], float]] = {}
+
+    def append(self, session_id: str, start: int, messages: list[dict]) -> int:
+        with self._lock:
+            log = self._logs.get(session_id, ([], 0.0))[0]
+            if len(log) != start:
+                raise MessageLogConflictError(f"Message log of {session_id} is at {len(log)}, not {start}")
+            log.extend(dict(message) for message in messages)
+            self._logs[session_id] = (log, time.time())
+            return len(log)
+
+    def read(self, session_id: str, start: int = 0, end: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            log = self._logs.get(session_id, ([], 0.0))[0]
+            return [dict(message) for message in log[start:end]]
+
+    def length(self, session_id: str) -> int:
+        with self._lock:
+            return len(self._logs.get(session_id, ([], 0.0))[0])
+
+    def sweep(self) -> int:
+        cutoff = time.time() - self.retention
+        with self._lock:
+            idle = [session_id for session_id, (_, updated_at) in self._logs.items() if updated_at <= cutoff]
+            for session_id in idle:
+                del self._logs[session_id]
+        return len(idle)
+
+
+class SQLiteMessageLog(MessageLog):
+    """
+    One row per message in a local SQLite file (WAL mode), plus one row
+    per session holding its length. Appends compare-and-swap the length.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str = DEFAULT_PATH, retention: float = MESSAGE_LOG_RETENTION_S):
+        super().__init__(retention)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS message_logs ("
+            " session_id TEXT PRIMARY KEY,"
+            " length INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " session_id TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (session_id, position)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS message_logs_updated_at ON message_logs (updated_at)")
+
+    def append(self, session_id: str, start: int, messages: list[dict]) -> int:
+        now = time.time()
+        rows = [
+            (session_id, position, json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+            for position, message in enumerate(messages, start=start)
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                moved = self._conn.execute(
+                    "UPDATE message_logs SET length = ?, updated_at = ? WHERE session_id = ? AND length = ?",
+                    (start + len(rows), now, session_id, start),
+                ).rowcount
+                if not moved and start == 0:
+                    moved = self._conn.execute(
+                        "INSERT OR IGNORE INTO message_logs (session_id, length, updated_at) VALUES (?, ?, ?)",
+                        (session_id, len(rows), now),
+                    ).rowcount
+                if not moved:
+                    raise MessageLogConflictError(f"Message log of {session_id} is not at {start}")
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, position, data) VALUES (?, ?, ?)", rows
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return start + len(rows)
+
+    def read(self, session_id: str, start: int = 0, end: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE session_id = ? AND position >= ? AND position < ?"
+                " ORDER BY position",
+                (session_id, max(0, start), end if end is not None else 2**62),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def length(self, session_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT length FROM message_logs WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def sweep(self) -> int:
+        cutoff = time.time() - self.retention
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM messages WHERE session_id IN"
+                    " (SELECT session_id FROM message_logs WHERE updated_at <= ?)",
+                    (cutoff,),
+                )
+                removed = self._conn.execute(
+                    "DELETE FROM message_logs WHERE updated_at <= ?", (cutoff,)
+                ).rowcount
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# =========================
+# Process-wide log
+# =========================
+_log: Optional[MessageLog] = None
+
+
+def create_message_log() -> MessageLog:
+    """Build the log selected by MESSAGE_LOG / MESSAGE_LOG_PATH."""
+    backend = os.getenv("MESSAGE_LOG", "sqlite")
+    if backend == "memory":
+        return MemoryMessageLog()
+    if backend == "sqlite":
+        return SQLiteMessageLog(os.getenv("MESSAGE_LOG_PATH", DEFAULT_PATH))
+    raise ValueError(f"Unknown MESSAGE_LOG backend: {backend}")
+
+
+def get_message_log() -> MessageLog:
+    """Return the process-wide message log, creating it on first use."""
+    global _log
+    if _log is None:
+        _log = create_message_log()
+    return _log
+
+
+def set_message_log(log: MessageLog) -> None:
+    """Replace the process-wide log (tests, benchmarks)."""
+    global _log
+    _log = log
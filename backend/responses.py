@@ -0,0 +1,34 @@
+# backend/responses.py
+
+"""
+Fast JSON responses.
+Uses orjson when installed, otherwise a compact stdlib json encoding.
+Returning these directly also skips response_model re-validation.
+"""
+
+import json
+from typing import Any, Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """Build a JSON Response without going through pydantic."""
+    return Response(
+        content=dumps(content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
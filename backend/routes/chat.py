@@ -5,9 +5,15 @@ Chat endpoint for web-based agent.
 Handles user input and invokes LangGraph agent.
 """
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Optional
+
+import asyncio
+import os
+import time
+import uuid
 
 import sys
 from pathlib import Path
@@ -16,17 +22,64 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.graph import app
-from backend.session_store import get_session, create_session, update_session
+from src.graph import app, RECURSION_LIMIT, trace_turn
+from src.crm import CRMError, get_crm_client, get_customer_with_loan_async
+from src.deadline import turn_deadline
+from src.timing import TurnTimings, record_timing, timed, turn_timings
+from src.profiling import label_profile, profiled
+from src.utils.log import get_logger, log_context
+from src.state import build_initial_state, create_initial_state_async
+from src.nodes.greeting import greeting_node
+from src.memory import ArchiveReader, get_full_transcript, get_messages_range, message_count
+from backend.session_store import (
+    SessionConflictError,
+    call_store,
+    create_session_async,
+    create_sessions_bulk,
+    get_session,
+    get_session_versioned,
+    session_archive_reader,
+    session_lock,
+    update_session,
+)
+from backend.responses import dumps, json_response
+from backend.turn_pool import TurnQueueFullError, TurnRejectedError, get_turn_pool
+from backend.idempotency import (
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    IdempotencyKeyReusedError,
+    get_idempotency_cache,
+)
+from backend.message_log import MessageLogConflictError, get_message_log
+from backend.state_token import CRM_FIELDS, StateTokenError, issue_token, read_token
 
 
 router = APIRouter()
+logger = get_logger(__name__)
+
+
+# State fields the client renders; delta responses only carry the changed ones
+CLIENT_FIELDS = ("stage", "awaiting_user", "offered_plans", "is_complete")
+
+# "server": sessions live in the session store. "stateless": the client
+# carries a signed state token and messages go to the message log, so any
+# worker can serve any turn (see backend/state_token.py).
+SESSION_MODE = os.getenv("SESSION_MODE", "server")
+
+# Server-Timing header on /chat and /init responses (see src/timing.py)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
 
 
 class ChatRequest(BaseModel):
     """Request model for /chat endpoint."""
     session_id: str
     user_input: str
+    # Number of messages the client already has. When set, the response
+    # only carries messages after it plus the changed state fields.
+    cursor: Optional[int] = Field(None, ge=0)
+    # Stateless mode: the token from the previous response
+    state_token: Optional[str] = None
+    # Add the Server-Timing breakdown to the body as `timings`
+    timings: bool = False
 
 
 class ChatResponse(BaseModel):
@@ -36,30 +89,183 @@ class ChatResponse(BaseModel):
     awaiting_user: bool
     offered_plans: list[dict]
     is_complete: bool
+    cursor: int
+    state_token: Optional[str] = None
+
+
+class DeltaChatResponse(BaseModel):
+    """Response model for /chat endpoint when the request carries a cursor."""
+    messages: list[dict]
+    changes: dict
+    cursor: int
+    state_token: Optional[str] = None
+
+
+async def offload(fn, *args):
+    """
+    Await fn(*args), a call that reads or writes this mode's session
+    backend (the message log when stateless, the session store otherwise),
+    off the event loop if the backend blocks (see call_store()).
+    """
+    if SESSION_MODE != "stateless":
+        return await call_store(fn, *args)
+    if get_message_log().blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def archive_reader(session_id: str) -> ArchiveReader:
+    """Where a session's archived messages are read from in this mode."""
+    if SESSION_MODE == "stateless":
+        log = get_message_log()
+        return lambda start, end: log.read(session_id, start, end)
+    return session_archive_reader(session_id)
+
 
+def build_full_response(session_id: str, state: dict) -> dict:
+    """Full client view of a session: whole transcript plus client fields."""
+    return {
+        "messages": get_full_transcript(state, archive_reader(session_id)),
+        "stage": state.get("stage", "unknown"),
+        "awaiting_user": state.get("awaiting_user", False),
+        "offered_plans": state.get("offered_plans", []),
+        "is_complete": state.get("is_complete", False),
+        "cursor": message_count(state),
+    }
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+
+def build_delta_response(session_id: str, previous: dict, state: dict, cursor: int) -> dict:
+    """Messages after `cursor` and the client fields that changed this turn."""
+    return {
+        "messages": get_messages_range(state, cursor, read_archive=archive_reader(session_id)),
+        "changes": {
+            field: state.get(field)
+            for field in CLIENT_FIELDS
+            if state.get(field) != previous.get(field)
+        },
+        "cursor": message_count(state),
+    }
+
+
+def timed_response(body: dict, timings: TurnTimings, include_timings: bool = False) -> Response:
+    """
+    JSON response with a Server-Timing header. With include_timings the
+    breakdown is also added to the body (without the serialization step,
+    which happens after).
+    """
+    if include_timings:
+        body["timings"] = timings.to_list()
+    with timed("serialize"):
+        content = dumps(body)
+    headers = None
+    if SERVER_TIMING:
+        # Timing-Allow-Origin lets the frontend's origin read the header
+        headers = {"Server-Timing": timings.header(), "Timing-Allow-Origin": "*"}
+    return Response(content=content, headers=headers, media_type="application/json")
+
+
+def busy_error(e: TurnRejectedError) -> HTTPException:
+    """429 when the turn queue is full, 503 when the wait would be too long."""
+    logger.warning("Turn rejected: %s (retry after %ss)", e, e.retry_after)
+    return HTTPException(
+        status_code=429 if isinstance(e, TurnQueueFullError) else 503,
+        detail="Server is busy. Please retry shortly.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+@router.post("/chat", response_model=ChatResponse | DeltaChatResponse)
+async def chat(
+    request: ChatRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     """
     Handle user chat input.
     
+    With an Idempotency-Key header, a retry of the same request returns the
+    stored response (marked Idempotent-Replayed: true), or waits for it if
+    the original is still running, instead of running the turn again.
+    
     Flow:
-    1. Get or create session
-    2. Add user message to state
-    3. Update state with user input
-    4. Invoke LangGraph
-    5. Return response
+    1. Take the session's turn lock (turns of one session run one at a time)
+       and a slot in the turn pool (429/503 with Retry-After when overloaded)
+    2. Get session state and its version
+    3. Add user message to state
+    4. Update state with user input
+    5. Invoke LangGraph (awaited, so other sessions keep running)
+    6. Save, unless another worker saved this session meanwhile (409)
+    7. Return response (full, or a delta when the request has a cursor)
     """
+    async def respond() -> Response:
+        with turn_timings() as timings, profiled("chat", request.session_id):
+            if SESSION_MODE == "stateless":
+                body = await stateless_chat(request)
+            else:
+                previous, updated_state = await process_turn(request.session_id, request.user_input)
+                # Both may read the session's archive
+                if request.cursor is not None:
+                    body = await offload(
+                        build_delta_response, request.session_id, previous, updated_state, request.cursor
+                    )
+                else:
+                    body = await offload(build_full_response, request.session_id, updated_state)
+            return timed_response(body, timings, request.timings)
+    
+    if not idempotency_key:
+        return await respond()
+    
+    if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
     
-    session_id = request.session_id
-    user_input = request.user_input.strip()
+    async def respond_cached() -> tuple[int, bytes]:
+        response = await respond()
+        return response.status_code, response.body
+    
+    try:
+        (status_code, body), replayed = await get_idempotency_cache().run(
+            request.session_id,
+            idempotency_key,
+            (request.user_input.strip(), request.cursor),
+            respond_cached,
+        )
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+async def process_turn(session_id: str, user_input: str, run_turn=None):
+    """
+    Run one user turn (steps 1-6 above). Shared by /chat and the WebSocket.
+    `run_turn(session_id, user_input)` does the work, run_chat_turn by
+    default. Returns its result, (client fields before the turn, updated
+    state) for run_chat_turn; errors are raised as HTTPException.
+    """
+    user_input = user_input.strip()
     
     # Validate input
     if not user_input:
         raise HTTPException(status_code=400, detail="user_input cannot be empty")
     
+    # The deadline starts before the lock and queue waits, so time spent
+    # waiting comes out of the budget left for LLM calls
+    with turn_deadline(), log_context(session_id=session_id):
+        waiting = time.perf_counter()
+        async with session_lock(session_id):
+            record_timing("lock", (time.perf_counter() - waiting) * 1000)
+            try:
+                async with get_turn_pool().slot():
+                    return await (run_turn or run_chat_turn)(session_id, user_input)
+            except TurnRejectedError as e:
+                raise busy_error(e)
+
+
+async def run_chat_turn(session_id: str, user_input: str) -> tuple[dict, dict]:
+    """One turn on a session. Caller holds session_lock(session_id)."""
     # Get session state
-    state = get_session(session_id)
+    with timed("session-load"):
+        state, version = await call_store(get_session_versioned, session_id)
     
     # If session doesn't exist, this is an error (frontend should create session first)
     if not state:
@@ -68,6 +274,36 @@ async def chat(request: ChatRequest):
             detail=f"Session {session_id} not found. Please initialize session first."
         )
     
+    previous, updated_state = await advance_state(session_id, state, user_input)
+    
+    try:
+        # Update session store with new state. The turn was computed from
+        # `version`; if another worker saved a turn since, this one is
+        # rejected rather than overwriting it. Re-running it is left to the
+        # client, since the other write may have been this same message.
+        with timed("session-save"):
+            await call_store(update_session, session_id, updated_state, version)
+        return previous, updated_state
+        
+    except SessionConflictError as e:
+        logger.warning("Conflicting update: %s", e)
+        raise HTTPException(
+            status_code=409,
+            detail="Session was updated by another request. Reload the session and retry."
+        )
+    except Exception as e:
+        logger.exception("Saving session failed")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing chat: {str(e)}"
+        )
+
+
+async def advance_state(session_id: str, state: dict, user_input: str) -> tuple[dict, dict]:
+    """
+    Apply the user's message to `state` and run the graph.
+    Returns (client fields before the turn, updated state).
+    """
     # Check if call is already complete
     if state.get("is_complete"):
         raise HTTPException(
@@ -81,6 +317,9 @@ async def chat(request: ChatRequest):
         # We'll allow it but log a warning
         pass
     
+    # Client fields before the turn, to compute delta responses
+    previous = {field: state.get(field) for field in CLIENT_FIELDS}
+    
     # Add user message to state
     state["messages"].append({
         "role": "user",
@@ -94,41 +333,112 @@ async def chat(request: ChatRequest):
     try:
         # Invoke LangGraph agent
         # The graph will process the input and update state
-        config = {"recursion_limit": 25}
-        updated_state = app.invoke(state, config)
-        
-        # Update session store with new state
-        update_session(session_id, updated_state)
-        
-        # Extract response data
-        messages = updated_state.get("messages", [])
-        stage = updated_state.get("stage", "unknown")
-        awaiting_user = updated_state.get("awaiting_user", False)
-        offered_plans = updated_state.get("offered_plans", [])
-        is_complete = updated_state.get("is_complete", False)
-        
-        return ChatResponse(
-            messages=messages,
-            stage=stage,
-            awaiting_user=awaiting_user,
-            offered_plans=offered_plans,
-            is_complete=is_complete
-        )
+        config = {"recursion_limit": RECURSION_LIMIT}
+        stage = state.get("stage")
+        label_profile(stage=stage)
+        with trace_turn(session_id), profiled("invoke", session_id, stage):
+            updated_state = await app.ainvoke(state, config)
+        return previous, updated_state
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"[ERROR] Chat endpoint error: {e}")
-        print(error_trace)
+        logger.exception("Chat turn failed")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing chat: {str(e)}"
         )
 
 
+# =========================
+# Stateless mode
+# =========================
+async def stateless_chat(request: ChatRequest) -> dict:
+    """/chat in stateless mode: same turn, state from and to a token."""
+    if not request.state_token:
+        raise HTTPException(status_code=400, detail="state_token is required in stateless mode")
+
+    async def run_turn(session_id: str, user_input: str):
+        return await run_stateless_turn(session_id, user_input, request.state_token)
+
+    previous, updated_state, token = await process_turn(request.session_id, request.user_input, run_turn)
+    return await offload(
+        build_stateless_response, request.session_id, updated_state, token, previous, request.cursor
+    )
+
+
+async def run_stateless_turn(session_id: str, user_input: str, token: str) -> tuple[dict, dict, str]:
+    """
+    One turn from a state token. The message log's length is the version:
+    a token for an older point of the conversation is rejected (409), and
+    so is a turn whose append races another one.
+    """
+    try:
+        with timed("session-load", "token"):
+            state, count = read_token(session_id, token)
+    except StateTokenError as e:
+        logger.warning("Rejected state token: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid or expired state token")
+
+    log = get_message_log()
+    archived = state.get("archived_message_count", 0)
+    with timed("session-load", "message log"):
+        state["messages"] = await offload(log.read, session_id, archived)
+    if archived + len(state["messages"]) != count:
+        raise HTTPException(
+            status_code=409,
+            detail="State token is out of date. Use the token from the latest response."
+        )
+
+    # Customer and loan fields are not in the token
+    try:
+        with timed("crm"):
+            fresh = build_initial_state(await get_customer_with_loan_async(state["customer_phone"]))
+    except CRMError as e:
+        logger.error("CRM lookup failed: %s", e)
+        raise HTTPException(status_code=502, detail="Customer lookup failed. Please retry.")
+    if not fresh:
+        raise HTTPException(status_code=404, detail="Customer for this session no longer exists")
+    state.update({field: fresh[field] for field in CRM_FIELDS})
+
+    previous, updated_state = await advance_state(session_id, state, user_input)
+
+    # Only messages after `count` are new; compaction may have moved the window
+    new_messages = updated_state["messages"][max(0, count - updated_state.get("archived_message_count", 0)):]
+    try:
+        with timed("session-save", "message log"):
+            total = await offload(log.append, session_id, count, new_messages)
+    except MessageLogConflictError as e:
+        logger.warning("Conflicting update: %s", e)
+        raise HTTPException(
+            status_code=409,
+            detail="Session was updated by another request. Reload the session and retry."
+        )
+    with timed("session-save", "token"):
+        token = issue_token(session_id, updated_state, total)
+    return previous, updated_state, token
+
+
+def start_stateless_session(state: dict) -> str:
+    """Log a new session's first messages. Returns its session ID."""
+    session_id = str(uuid.uuid4())
+    get_message_log().append(session_id, 0, state["messages"])
+    return session_id
+
+
+def build_stateless_response(session_id: str, state: dict, token: str, previous: Optional[dict] = None, cursor: Optional[int] = None) -> dict:
+    """Full or delta response plus the next state token."""
+    if cursor is None:
+        body = build_full_response(session_id, state)
+    else:
+        body = build_delta_response(session_id, previous, state, cursor)
+    body["state_token"] = token
+    return body
+
+
 class InitRequest(BaseModel):
     """Request model for /init endpoint."""
     phone: str
+    # Add the Server-Timing breakdown to the body as `timings`
+    timings: bool = False
 
 
 @router.post("/init")
@@ -142,36 +452,180 @@ async def init_session(request: InitRequest):
     if not phone:
         raise HTTPException(status_code=400, detail="phone cannot be empty")
     
-    session_id, state = create_session(phone)
+    with turn_timings() as timings:
+        try:
+            if SESSION_MODE == "stateless":
+                with timed("crm"):
+                    session_id, state = str(uuid.uuid4()), await create_initial_state_async(phone)
+            else:
+                with timed("crm"):
+                    session_id, state = await create_session_async(phone)
+        except CRMError as e:
+            logger.error("CRM lookup failed: %s", e)
+            raise HTTPException(status_code=502, detail="Customer lookup failed. Please retry.")
     
-    if not state:
+        if not state:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Customer with phone {phone} not found"
+            )
+    
+        # Invoke graph to get initial greeting
+        try:
+            config = {"recursion_limit": RECURSION_LIMIT}
+            with turn_deadline(), log_context(session_id=session_id):
+                async with get_turn_pool().slot():
+                    with trace_turn(session_id), profiled("invoke", session_id, state.get("stage")):
+                        initial_state = await app.ainvoke(state, config)
+        
+            if SESSION_MODE == "stateless":
+                with timed("session-save"):
+                    total = await offload(get_message_log().append, session_id, 0, initial_state["messages"])
+                    token = issue_token(session_id, initial_state, total)
+                return timed_response({
+                    "session_id": session_id,
+                    **await offload(build_stateless_response, session_id, initial_state, token),
+                }, timings, request.timings)
+        
+            with timed("session-save"):
+                await call_store(update_session, session_id, initial_state)
+        
+            # Return session info
+            return timed_response({
+                "session_id": session_id,
+                **await offload(build_full_response, session_id, initial_state),
+            }, timings, request.timings)
+        except TurnRejectedError as e:
+            raise busy_error(e)
+        except Exception as e:
+            logger.exception("Init session failed", extra={"session_id": session_id})
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error initializing session: {str(e)}"
+            )
+
+
+
+# Bulk initialization limits: phones per request, and phones looked up,
+# greeted and stored per batch (one CRM call and one store write each)
+INIT_BATCH_MAX_PHONES = 10_000
+INIT_BATCH_CHUNK_SIZE = 500
+
+
+class InitBatchRequest(BaseModel):
+    """Request model for /init/batch endpoint."""
+    phones: list[str]
+
+
+@router.post("/init/batch")
+async def init_sessions_batch(request: InitBatchRequest):
+    """
+    Initialize sessions for many phone numbers (outbound campaigns).
+    
+    Customers are looked up in bulk and greeted with greeting_node directly:
+    a new session always goes init -> greeting -> wait for user, so no graph
+    run is needed. Streams one NDJSON line per phone, in request order:
+      {"phone", "session_id", <same fields as /init>}
+      {"phone", "status": 404 | 502, "error"}
+    """
+    phones = [phone.strip() for phone in request.phones]
+    
+    if not phones:
+        raise HTTPException(status_code=400, detail="phones cannot be empty")
+    if len(phones) > INIT_BATCH_MAX_PHONES:
         raise HTTPException(
-            status_code=404,
-            detail=f"Customer with phone {phone} not found"
+            status_code=413,
+            detail=f"At most {INIT_BATCH_MAX_PHONES} phones per request"
         )
     
-    # Invoke graph to get initial greeting
-    try:
-        config = {"recursion_limit": 25}
-        initial_state = app.invoke(state, config)
-        update_session(session_id, initial_state)
+    return StreamingResponse(stream_init_batch(phones), media_type="application/x-ndjson")
+
+
+async def stream_init_batch(phones: list[str]) -> AsyncIterator[bytes]:
+    """Yield NDJSON lines for `phones`, one chunk of INIT_BATCH_CHUNK_SIZE at a time."""
+    crm = get_crm_client()
+    
+    for start in range(0, len(phones), INIT_BATCH_CHUNK_SIZE):
+        chunk = phones[start:start + INIT_BATCH_CHUNK_SIZE]
+        
+        try:
+            found = await crm.get_many(chunk)
+        except CRMError as e:
+            logger.error("CRM bulk lookup failed: %s", e)
+            yield b"".join(
+                dumps({"phone": phone, "status": 502, "error": "Customer lookup failed"}) + b"\n"
+                for phone in chunk
+            )
+            continue
         
-        # Return session info
-        return {
+        states = []
+        for phone in chunk:
+            state = build_initial_state(found.get(phone))
+            if state is not None:
+                state.update(greeting_node(state))
+            states.append(state)
+        
+        live_states = [state for state in states if state is not None]
+        if SESSION_MODE == "stateless":
+            session_ids = iter(await offload(lambda: [start_stateless_session(state) for state in live_states]))
+        else:
+            session_ids = iter(await call_store(create_sessions_bulk, live_states))
+        
+        lines = []
+        for phone, state in zip(chunk, states):
+            if state is None:
+                line = {"phone": phone, "status": 404, "error": "Customer not found"}
+            else:
+                session_id = next(session_ids)
+                line = {"phone": phone, "session_id": session_id, **build_full_response(session_id, state)}
+                if SESSION_MODE == "stateless":
+                    line["state_token"] = issue_token(session_id, state, message_count(state))
+            lines.append(dumps(line) + b"\n")
+        yield b"".join(lines)
+
+
+@router.get("/sessions/{session_id}/messages")
+async def get_session_messages(
+    session_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Page through a session's transcript by absolute message position.
+    """
+    if SESSION_MODE == "stateless":
+        log = get_message_log()
+        total = await offload(log.length, session_id)
+        if not total:
+            raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+        return json_response({
             "session_id": session_id,
-            "messages": initial_state.get("messages", []),
-            "stage": initial_state.get("stage", "init"),
-            "awaiting_user": initial_state.get("awaiting_user", False),
-            "offered_plans": initial_state.get("offered_plans", []),
-            "is_complete": initial_state.get("is_complete", False)
-        }
-    except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"[ERROR] Init session error: {e}")
-        print(error_trace)
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "messages": await offload(log.read, session_id, offset, offset + limit),
+        })
+    
+    def read_page() -> tuple[Optional[dict], list[dict]]:
+        state = get_session(session_id)
+        if not state:
+            return None, []
+        return state, get_messages_range(
+            state, offset, offset + limit, read_archive=session_archive_reader(session_id)
+        )
+    
+    state, messages = await call_store(read_page)
+    
+    if not state:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error initializing session: {str(e)}"
+            status_code=404,
+            detail=f"Session {session_id} not found"
         )
-
+    
+    return json_response({
+        "session_id": session_id,
+        "total": message_count(state),
+        "offset": offset,
+        "limit": limit,
+        "messages": messages,
+    })
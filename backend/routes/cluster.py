@@ -0,0 +1,77 @@
+# backend/routes/cluster.py
+
+"""
+Cluster endpoints: ring membership and session handoff between nodes.
+Always mounted; they answer 404 unless CLUSTER_NODES and CLUSTER_SELF are
+set (backend/routing.py).
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from pydantic import BaseModel
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.routing import Cluster, check_secret, get_cluster
+
+
+router = APIRouter()
+
+
+class NodesRequest(BaseModel):
+    nodes: list[str]
+
+
+def _require_cluster(secret: Optional[str]) -> Cluster:
+    cluster = get_cluster()
+    if cluster is None:
+        raise HTTPException(status_code=404, detail="This backend is not part of a cluster")
+    if not check_secret(secret):
+        raise HTTPException(status_code=403, detail="Missing or wrong X-Cluster-Secret")
+    return cluster
+
+
+@router.get("/cluster")
+async def get_cluster_info():
+    """Ring membership of this node and its routing/handoff counters."""
+    cluster = get_cluster()
+    if cluster is None:
+        raise HTTPException(status_code=404, detail="This backend is not part of a cluster")
+    return cluster.metrics()
+
+
+@router.put("/cluster/nodes")
+async def set_cluster_nodes(request: NodesRequest, x_cluster_secret: Optional[str] = Header(None)):
+    """
+    Change the membership. Send the same list to every node; each one
+    hands the sessions it no longer owns to their new owners.
+    """
+    cluster = _require_cluster(x_cluster_secret)
+    if not request.nodes:
+        raise HTTPException(status_code=400, detail="A cluster needs at least one node")
+    await cluster.set_nodes(request.nodes)
+    return cluster.metrics()
+
+
+@router.post("/cluster/sessions")
+async def receive_sessions(request: Request, x_cluster_secret: Optional[str] = Header(None)):
+    """Restore sessions pushed by another node (snapshot layout)."""
+    cluster = _require_cluster(x_cluster_secret)
+    try:
+        restored = cluster.receive(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Bad session handoff: {e}")
+    return {"restored": restored}
+
+
+@router.post("/cluster/sessions/{session_id}/take")
+async def take_session(session_id: str, x_cluster_secret: Optional[str] = Header(None)):
+    """Give up a session to the node that now owns it."""
+    cluster = _require_cluster(x_cluster_secret)
+    return Response(content=await cluster.take_local(session_id), media_type="application/octet-stream")
@@ -0,0 +1,158 @@
+# backend/routes/debug.py
+
+"""
+Debug endpoints for inspecting graph execution.
+Traces are only recorded when the backend runs with GRAPH_TRACE=1.
+Session journals are only kept with SESSION_STORE=journal, and reading
+them needs PROFILE_ADMIN_TOKEN; customer and loan fields are left out.
+Profiling settings and files can be read and changed at runtime with
+PROFILE_ADMIN_TOKEN.
+"""
+
+import asyncio
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.graph import TRACER
+from src.profiling import get_profiler
+from backend.session_store import JournalSessionStore, get_session_store
+from backend.state_token import CRM_FIELDS
+
+
+router = APIRouter()
+
+# Required (as X-Admin-Token) to read journals and to change or download
+# profiles; unset disables
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+
+
+def _require_tracer():
+    if TRACER is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Graph tracing is disabled. Restart the backend with GRAPH_TRACE=1."
+        )
+    return TRACER
+
+
+@router.get("/debug/traces/{session_id}")
+async def get_session_traces(session_id: str):
+    """
+    Return the recorded turns for a session: node sequence,
+    per-node wall time, state keys written and recursion depth.
+    """
+    tracer = _require_tracer()
+    traces = tracer.get_traces(session_id)
+    
+    if traces is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No traces recorded for session {session_id}"
+        )
+    
+    return {
+        "session_id": session_id,
+        "recursion_limit": tracer.recursion_limit,
+        "turns": traces,
+    }
+
+
+@router.get("/debug/nodes")
+async def get_node_stats():
+    """Aggregate node timings across all traced turns, hottest first."""
+    tracer = _require_tracer()
+    return {"nodes": tracer.node_stats()}
+
+
+@router.get("/debug/journal/{session_id}")
+async def get_session_journal(session_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Return a session's turn journal: one event per saved turn with the
+    user input and either a full state snapshot or the state delta.
+    CRM fields (date of birth, loan details, ...) are stripped.
+    """
+    require_admin(x_admin_token)
+    store = get_session_store()
+    if not isinstance(store, JournalSessionStore):
+        raise HTTPException(
+            status_code=404,
+            detail="Session journal is disabled. Restart the backend with SESSION_STORE=journal."
+        )
+
+    events = await asyncio.to_thread(store.events, session_id)
+    if not events:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No journal recorded for session {session_id}"
+        )
+
+    return {"session_id": session_id, "events": [_redact_event(event) for event in events]}
+
+
+def _redact_event(event: dict) -> dict:
+    """Drop CRM fields from a journal event's state or delta."""
+    if "state" in event:
+        event["state"] = {k: v for k, v in event["state"].items() if k not in CRM_FIELDS}
+    delta = event.get("delta")
+    if delta and "set" in delta:
+        delta["set"] = {k: v for k, v in delta["set"].items() if k not in CRM_FIELDS}
+    return event
+
+
+class ProfilingRequest(BaseModel):
+    """Fields left out keep their current value."""
+    sample_rate: Optional[float] = None
+    targets: Optional[str] = None
+    memory: Optional[bool] = None
+
+
+def require_admin(token: Optional[str]) -> None:
+    """403 unless `token` (the X-Admin-Token header) is PROFILE_ADMIN_TOKEN."""
+    if not PROFILE_ADMIN_TOKEN or token is None or not hmac.compare_digest(token, PROFILE_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Missing or wrong X-Admin-Token")
+
+
+@router.get("/debug/profiling")
+async def get_profiling(x_admin_token: Optional[str] = Header(None)):
+    """Profiler settings and counters, and the newest profiles written."""
+    require_admin(x_admin_token)
+    profiler = get_profiler()
+    return {**profiler.settings(), "files": profiler.files()}
+
+
+@router.put("/debug/profiling")
+async def set_profiling(request: ProfilingRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Turn sampling on or off without a restart, e.g.
+    {"sample_rate": 0.05, "targets": "chat", "memory": false}.
+    """
+    require_admin(x_admin_token)
+    profiler = get_profiler()
+    try:
+        profiler.configure(request.sample_rate, request.targets, request.memory)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.settings()
+
+
+@router.get("/debug/profiling/{name}")
+async def download_profile(name: str, x_admin_token: Optional[str] = Header(None)):
+    """Download a profile (.prof), snapshot (.tracemalloc) or memory summary (.memory.txt)."""
+    require_admin(x_admin_token)
+    directory = get_profiler().directory
+    path = os.path.join(directory, os.path.basename(name))
+    if not name.endswith((".prof", ".tracemalloc", ".memory.txt")) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"No profile named {name}")
+    return FileResponse(path, filename=os.path.basename(name))
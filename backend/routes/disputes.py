@@ -0,0 +1,53 @@
+# backend/routes/disputes.py
+
+"""
+Dispute search for ops teams.
+Dispute reasons are indexed as closing_node saves them (see src/search.py).
+Results carry customer IDs and dispute reasons, so searching needs PROFILE_ADMIN_TOKEN.
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.routes.debug import require_admin
+from src.data import search_disputes
+from src.search import query_terms
+
+
+router = APIRouter()
+
+
+@router.get("/disputes/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=500),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Ranked (BM25), paginated search over dispute reasons.
+    A dispute matches when its reason contains every query word.
+    """
+    require_admin(x_admin_token)
+    if not query_terms(q):
+        raise HTTPException(status_code=400, detail="Query has no searchable words")
+
+    # SQLite FTS queries block; keep them off the event loop
+    total, results = await asyncio.to_thread(search_disputes, q, offset, limit)
+
+    return {
+        "query": q,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "results": results,
+    }
@@ -0,0 +1,40 @@
+# backend/routes/metrics.py
+
+"""
+Operational metrics for the backend process.
+"""
+
+from fastapi import APIRouter
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.deadline import deadline_metrics
+from src.utils.log import log_metrics
+from backend.session_store import session_metrics
+from backend.turn_pool import get_turn_pool
+from backend.idempotency import get_idempotency_cache
+
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Session store size, evictions and bytes in use; turn pool
+    concurrency, queue depth, wait times and rejections; idempotency
+    cache size, replays and coalesced waits; turn latency percentiles
+    and LLM fallbacks by call and reason; log records queued and dropped.
+    """
+    return {
+        "sessions": session_metrics(),
+        "turns": get_turn_pool().metrics(),
+        "idempotency": get_idempotency_cache().metrics(),
+        "deadlines": deadline_metrics(),
+        "logging": log_metrics(),
+    }
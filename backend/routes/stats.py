@@ -0,0 +1,41 @@
+# backend/routes/stats.py
+
+"""
+Outcome analytics for dashboards.
+Aggregates follow the shared record store (see src/analytics.py).
+"""
+
+import asyncio
+
+from fastapi import APIRouter
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.analytics import get_outcome_stats, rebuild_from_store
+from backend.responses import json_response
+
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def get_stats():
+    """
+    Calls by outcome and payment status, daily rollups, PTP amounts by
+    promised date and the verification-failure rate.
+    """
+    # Catching up reads the record store; keep it off the event loop
+    stats = await asyncio.to_thread(get_outcome_stats)
+    return json_response(stats.snapshot())
+
+
+@router.post("/stats/rebuild")
+async def rebuild_stats():
+    """Recompute the aggregates from the record store (batch backfill)."""
+    stats = await asyncio.to_thread(rebuild_from_store)
+    return json_response(stats.snapshot())
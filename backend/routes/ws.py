@@ -0,0 +1,150 @@
+# backend/routes/ws.py
+
+"""
+WebSocket chat channel: /api/ws/{session_id}
+
+One connection carries a whole conversation. Turns go through the same
+process_turn() as /api/chat, so locking, admission control, versioning and
+error statuses are identical.
+
+Client -> server:
+    {"type": "user_message", "content": "..."}
+    {"type": "ping"}
+
+Server -> client:
+    {"type": "session", "session_id": ..., <full /api/init-style view>}  on connect
+    {"type": "message_delta", "index": n, "text": "..."}                  assistant text chunks
+    {"type": "message", "index": n, "message": {...}}                     message complete
+                                                                          (user turns are echoed)
+    {"type": "stage", "stage": "..."}                                     stage changed
+    {"type": "plans", "offered_plans": [...]}                             plans offered
+    {"type": "turn_complete", "changes": {...}, "cursor": n}              end of turn
+    {"type": "error", "status": 409, "detail": "...", "retry_after": n}   turn rejected
+    {"type": "pong"}
+
+`index` is the message's absolute position in the transcript (the same
+numbering as the cursor).
+
+message_delta is not token streaming: nodes produce whole replies, so the
+chunks are the finished reply split at word boundaries once the turn has
+run. They let a client render progressively; the first chunk arrives no
+sooner than a /api/chat response would.
+"""
+
+import json
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.memory import message_count
+from backend.session_store import call_store, get_session
+from backend.routes.chat import SESSION_MODE, build_delta_response, build_full_response, process_turn
+from backend.responses import dumps
+
+
+router = APIRouter()
+
+# Assistant text is pushed in chunks of about this many characters
+STREAM_CHUNK_CHARS = 48
+
+# Close codes (4000-4999 are application codes)
+CLOSE_SESSION_NOT_FOUND = 4404
+CLOSE_UNSUPPORTED = 4400
+
+
+def chunk_text(text: str, size: int = STREAM_CHUNK_CHARS) -> list[str]:
+    """Split text into chunks of roughly `size` characters at word boundaries."""
+    chunks, current = [], ""
+    for word in text.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if current and len(candidate) > size:
+            chunks.append(current + " ")
+            current = word
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def send(websocket: WebSocket, event: dict) -> None:
+    await websocket.send_text(dumps(event).decode("utf-8"))
+
+
+async def push_turn(websocket: WebSocket, session_id: str, previous: dict, state: dict, cursor: int) -> int:
+    """Push the events for everything after `cursor`. Returns the new cursor."""
+    delta = await call_store(build_delta_response, session_id, previous, state, cursor)
+
+    for index, message in enumerate(delta["messages"], start=cursor):
+        if message.get("role") == "assistant":
+            for chunk in chunk_text(message.get("content", "")):
+                await send(websocket, {"type": "message_delta", "index": index, "text": chunk})
+        await send(websocket, {"type": "message", "index": index, "message": message})
+
+    changes = delta["changes"]
+    if "stage" in changes:
+        await send(websocket, {"type": "stage", "stage": changes["stage"]})
+    if changes.get("offered_plans"):
+        await send(websocket, {"type": "plans", "offered_plans": changes["offered_plans"]})
+
+    await send(websocket, {"type": "turn_complete", "changes": changes, "cursor": delta["cursor"]})
+    return delta["cursor"]
+
+
+@router.websocket("/ws/{session_id}")
+async def chat_socket(websocket: WebSocket, session_id: str):
+    """Bidirectional chat for an initialized session (see /api/init)."""
+    await websocket.accept()
+
+    if SESSION_MODE == "stateless":
+        await send(websocket, {"type": "error", "status": 400, "detail": "WebSocket chat needs server-side sessions"})
+        await websocket.close(code=CLOSE_UNSUPPORTED)
+        return
+
+    state = await call_store(get_session, session_id)
+    if not state:
+        await send(websocket, {"type": "error", "status": 404, "detail": f"Session {session_id} not found"})
+        await websocket.close(code=CLOSE_SESSION_NOT_FOUND)
+        return
+
+    view = await call_store(build_full_response, session_id, state)
+    await send(websocket, {"type": "session", "session_id": session_id, **view})
+    cursor = message_count(state)
+
+    try:
+        while True:
+            try:
+                event = json.loads(await websocket.receive_text())
+                kind = event.get("type")
+            except (ValueError, AttributeError):
+                await send(websocket, {"type": "error", "status": 400, "detail": "Events must be JSON objects"})
+                continue
+
+            if kind == "ping":
+                await send(websocket, {"type": "pong"})
+                continue
+            if kind != "user_message":
+                await send(websocket, {"type": "error", "status": 400, "detail": f"Unknown event type {kind!r}"})
+                continue
+
+            try:
+                previous, state = await process_turn(session_id, str(event.get("content", "")))
+            except HTTPException as e:
+                error = {"type": "error", "status": e.status_code, "detail": e.detail}
+                if e.headers and "Retry-After" in e.headers:
+                    error["retry_after"] = int(e.headers["Retry-After"])
+                await send(websocket, error)
+                continue
+
+            cursor = await push_turn(websocket, session_id, previous, state, cursor)
+            if state.get("is_complete"):
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,400 @@
+# backend/routing.py
+
+"""
+Session routing across several backend nodes.
+
+With the memory session store, a session lives in one process, so its
+turns must reach that process. Set CLUSTER_NODES to every node's base URL
+(one worker per node) and CLUSTER_SELF to this node's. Then:
+
+- A consistent-hash ring (backend/hash_ring.py) maps each session_id to
+  its owning node.
+- SessionRoutingMiddleware proxies HTTP requests for a session owned by
+  another node to that node. Session IDs are read from the path
+  (/api/sessions/{id}/..., /api/debug/...) or the /api/chat body.
+  WebSocket connections for another node's session are refused, and the
+  client falls back to HTTP, which is routed.
+- New sessions get IDs that hash to the node creating them, so a session
+  never has to move at creation.
+
+When the membership changes (PUT /api/cluster/nodes on every node), each
+node pushes the sessions it no longer owns to their new owners. A request
+that reaches the new owner first pulls its session from the previous
+owner. Both moves take the session's turn lock on the old node, so a turn
+in progress finishes before its session moves. After CLUSTER_HANDOFF_WINDOW_S
+the previous ring is forgotten.
+
+Node-to-node calls carry X-Cluster-Secret (CLUSTER_SECRET). A proxied
+request carries X-Cluster-Forwarded, an HMAC of its method and path under
+CLUSTER_SECRET, and is served where it lands. Without a valid signature
+the header is dropped and the request is routed as usual.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import time
+import uuid
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from typing import Optional
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.hash_ring import DEFAULT_VNODES, HashRing
+from backend.session_store import get_session_store, session_lock, set_session_id_factory
+from backend.snapshot import dump_snapshot, read_snapshot
+from src.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+CLUSTER_NODES = [node.strip().rstrip("/") for node in os.getenv("CLUSTER_NODES", "").split(",") if node.strip()]
+CLUSTER_SELF = os.getenv("CLUSTER_SELF", "").rstrip("/")
+CLUSTER_VNODES = int(os.getenv("CLUSTER_VNODES", str(DEFAULT_VNODES)))
+CLUSTER_SECRET = os.getenv("CLUSTER_SECRET", "")
+CLUSTER_FORWARD_TIMEOUT_S = float(os.getenv("CLUSTER_FORWARD_TIMEOUT_S", "30"))
+CLUSTER_HANDOFF_WINDOW_S = float(os.getenv("CLUSTER_HANDOFF_WINDOW_S", "300"))
+# Sessions per handoff request
+CLUSTER_HANDOFF_BATCH = 200
+
+FORWARDED_HEADER = "x-cluster-forwarded"
+SECRET_HEADER = "x-cluster-secret"
+
+# Requests that name their session in the path, and ones that carry it in
+# a JSON body
+_SESSION_PATH = re.compile(r"^/api/(?:ws|sessions|debug/traces|debug/journal)/([^/]+)")
+_SESSION_BODY_PATHS = frozenset({"/api/chat"})
+
+# Close code for a WebSocket whose session lives on another node
+CLOSE_WRONG_NODE = 4307
+
+_HOP_BY_HOP = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailers", b"transfer-encoding", b"upgrade", b"host", b"content-length",
+})
+
+
+def session_id_from_path(path: str) -> Optional[str]:
+    match = _SESSION_PATH.match(path)
+    return match.group(1) if match else None
+
+
+def session_id_from_body(body: bytes) -> Optional[str]:
+    try:
+        session_id = json.loads(body).get("session_id")
+    except (ValueError, AttributeError):
+        return None
+    return session_id if isinstance(session_id, str) else None
+
+
+def check_secret(provided: Optional[str]) -> bool:
+    """True if a node-to-node request carries the cluster secret."""
+    return bool(CLUSTER_SECRET) and provided is not None and hmac.compare_digest(provided, CLUSTER_SECRET)
+
+
+def sign_forward(method: str, path: str) -> str:
+    """X-Cluster-Forwarded value for a request proxied to its owner."""
+    message = f"{method} {path}".encode("utf-8")
+    return hmac.new(CLUSTER_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def check_forwarded(scope: dict) -> bool:
+    """True if the request was proxied here by another node."""
+    value = _header(scope, FORWARDED_HEADER)
+    if not CLUSTER_SECRET or value is None:
+        return False
+    expected = sign_forward(scope.get("method", ""), scope["path"])
+    return hmac.compare_digest(value.decode("latin-1"), expected)
+
+
+def encode_sessions(entries: list) -> bytes:
+    buffer = io.BytesIO()
+    dump_snapshot(buffer, entries)
+    return buffer.getvalue()
+
+
+def decode_sessions(body: bytes) -> list:
+    return read_snapshot(memoryview(body))[1]
+
+
+class Cluster:
+    """This node's view of the cluster: the ring, and handoff between nodes."""
+
+    def __init__(self, self_url: str, nodes: list[str], vnodes: int = CLUSTER_VNODES):
+        self.self_url = self_url
+        self.vnodes = vnodes
+        self.ring = HashRing(nodes, vnodes)
+        # Ring before the last membership change, for pulls on a miss
+        self.previous: Optional[HashRing] = None
+        self._previous_until = 0.0
+        self._client = None
+        self._push_task: Optional[asyncio.Task] = None
+        self.counters = {"local": 0, "forwarded": 0, "refused": 0, "pulled": 0, "pushed": 0, "received": 0}
+
+    def owner(self, session_id: str) -> str:
+        return self.ring.node_for(session_id) or self.self_url
+
+    def owned_session_id(self) -> str:
+        """A random session ID that this node owns."""
+        for _ in range(100 * max(1, len(self.ring.nodes))):
+            session_id = str(uuid.uuid4())
+            if self.owner(session_id) == self.self_url:
+                return session_id
+        return str(uuid.uuid4())  # not on the ring: any ID will do
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(timeout=CLUSTER_FORWARD_TIMEOUT_S)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---------- proxying ----------
+
+    async def forward(self, node: str, scope: dict, body: bytes) -> tuple[int, list, bytes]:
+        """Replay an HTTP request on `node`. Returns (status, headers, body)."""
+        import httpx
+
+        url = node + scope["path"]
+        if scope.get("query_string"):
+            url += "?" + scope["query_string"].decode("latin-1")
+        headers = [(k, v) for k, v in scope["headers"] if k.lower() not in _HOP_BY_HOP]
+        headers.append((FORWARDED_HEADER.encode(), sign_forward(scope["method"], scope["path"]).encode()))
+
+        try:
+            response = await self._http().request(scope["method"], url, headers=headers, content=body)
+        except httpx.HTTPError as e:
+            logger.error("Forwarding to %s failed: %s", node, e)
+            detail = json.dumps({"detail": "Session owner is unavailable. Please retry."}).encode()
+            return 503, [(b"content-type", b"application/json"), (b"retry-after", b"1")], detail
+
+        self.counters["forwarded"] += 1
+        response_headers = [
+            (k.encode("latin-1"), v.encode("latin-1"))
+            for k, v in response.headers.multi_items()
+            if k.lower().encode("latin-1") not in _HOP_BY_HOP and k.lower() != "content-encoding"
+        ]
+        return response.status_code, response_headers, response.content
+
+    # ---------- membership and handoff ----------
+
+    async def set_nodes(self, nodes: list[str]) -> None:
+        """Switch to a new membership and start pushing moved sessions."""
+        nodes = [node.rstrip("/") for node in nodes]
+        logger.info("Membership: %s -> %s", self.ring.nodes, sorted(nodes))
+        self.previous = self.ring
+        self._previous_until = time.monotonic() + CLUSTER_HANDOFF_WINDOW_S
+        self.ring = HashRing(nodes, self.vnodes)
+        self._push_task = asyncio.create_task(self.push_moved())
+        self._push_task.add_done_callback(_log_push_failure)
+
+    async def push_moved(self) -> int:
+        """Hand every local session owned elsewhere to its owner."""
+        by_owner: dict[str, list[str]] = defaultdict(list)
+        for session_id in get_session_store().session_ids():
+            owner = self.owner(session_id)
+            if owner != self.self_url:
+                by_owner[owner].append(session_id)
+
+        pushed = 0
+        for owner, session_ids in by_owner.items():
+            for start in range(0, len(session_ids), CLUSTER_HANDOFF_BATCH):
+                pushed += await self._push(owner, session_ids[start:start + CLUSTER_HANDOFF_BATCH])
+        if pushed:
+            logger.info("Handed off %d sessions", pushed)
+        return pushed
+
+    async def _push(self, owner: str, session_ids: list[str]) -> int:
+        import httpx
+
+        store = get_session_store()
+        async with AsyncExitStack() as locks:
+            # Turns in progress finish first; new ones wait, then find the
+            # session gone and are routed by the new ring on retry
+            for session_id in session_ids:
+                await locks.enter_async_context(session_lock(session_id))
+            entries = store.take(session_ids)
+            if not entries:
+                return 0
+            try:
+                response = await self._http().post(
+                    f"{owner}/api/cluster/sessions",
+                    content=encode_sessions(entries),
+                    headers={SECRET_HEADER: CLUSTER_SECRET, "content-type": "application/octet-stream"},
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                # Keep them here; a later membership change or pull moves them
+                logger.error("Handoff to %s failed: %s", owner, e)
+                store.restore(entries)
+                return 0
+        self.counters["pushed"] += len(entries)
+        return len(entries)
+
+    async def take_local(self, session_id: str) -> bytes:
+        """Remove a session for another node (answer to a pull)."""
+        async with session_lock(session_id):
+            return encode_sessions(get_session_store().take([session_id]))
+
+    def receive(self, body: bytes) -> int:
+        """Restore sessions handed over by another node."""
+        restored = get_session_store().restore(decode_sessions(body))
+        self.counters["received"] += restored
+        return restored
+
+    async def ensure_local(self, session_id: str) -> None:
+        """
+        Pull a session this node now owns from its previous owner, if it
+        is not here yet.
+        """
+        if self.previous is None:
+            return
+        if time.monotonic() > self._previous_until:
+            self.previous = None
+            return
+        previous_owner = self.previous.node_for(session_id)
+        if previous_owner in (None, self.self_url):
+            return
+
+        import httpx
+
+        store = get_session_store()
+        async with session_lock(session_id):
+            if store.exists(session_id):
+                return
+            try:
+                response = await self._http().post(
+                    f"{previous_owner}/api/cluster/sessions/{session_id}/take",
+                    headers={SECRET_HEADER: CLUSTER_SECRET},
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.error("Pulling %s from %s failed: %s", session_id, previous_owner, e)
+                return
+            self.counters["pulled"] += store.restore(decode_sessions(response.content))
+
+    def metrics(self) -> dict:
+        return {
+            "self": self.self_url,
+            "nodes": self.ring.nodes,
+            "vnodes": self.vnodes,
+            "handoff_in_progress": self.previous is not None,
+            **self.counters,
+        }
+
+
+class SessionRoutingMiddleware:
+    """ASGI middleware sending each session's requests to its owning node."""
+
+    def __init__(self, app, cluster: "Cluster"):
+        self.app = app
+        self.cluster = cluster
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        if _header(scope, FORWARDED_HEADER) is not None:
+            if check_forwarded(scope):
+                return await self.app(scope, receive, send)
+            # Not from a peer: ignore the claim and route the request
+            forwarded = FORWARDED_HEADER.encode("latin-1")
+            scope = {**scope, "headers": [(k, v) for k, v in scope["headers"] if k.lower() != forwarded]}
+
+        session_id = session_id_from_path(scope["path"])
+        body = None
+        if session_id is None and scope["type"] == "http" and scope["method"] == "POST" \
+                and scope["path"] in _SESSION_BODY_PATHS:
+            body = await _read_body(receive)
+            session_id = session_id_from_body(body)
+            receive = _replay(body)
+        if session_id is None:
+            return await self.app(scope, receive, send)
+
+        cluster = self.cluster
+        owner = cluster.owner(session_id)
+        if owner == cluster.self_url:
+            cluster.counters["local"] += 1
+            await cluster.ensure_local(session_id)
+            return await self.app(scope, receive, send)
+
+        if scope["type"] == "websocket":
+            cluster.counters["refused"] += 1
+            await send({"type": "websocket.close", "code": CLOSE_WRONG_NODE})
+            return
+
+        if body is None:
+            body = await _read_body(receive)
+        status, headers, content = await cluster.forward(owner, scope, body)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
+
+
+def _log_push_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Handing off moved sessions failed", exc_info=task.exception())
+
+
+def _header(scope: dict, name: str) -> Optional[bytes]:
+    raw = name.encode("latin-1")
+    for key, value in scope.get("headers", ()):
+        if key.lower() == raw:
+            return value
+    return None
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+# =========================
+# Process-wide cluster
+# =========================
+_cluster: Optional[Cluster] = None
+
+
+def get_cluster() -> Optional[Cluster]:
+    """
+    This node's Cluster, or None when CLUSTER_NODES / CLUSTER_SELF are not
+    set (single node). Creating it makes new session IDs hash to this node.
+    """
+    global _cluster
+    if _cluster is None and CLUSTER_NODES and CLUSTER_SELF:
+        _cluster = Cluster(CLUSTER_SELF, CLUSTER_NODES)
+        set_session_id_factory(_cluster.owned_session_id)
+    return _cluster
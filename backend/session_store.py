@@ -3,16 +3,1023 @@
 """
 Session management for web-based agent.
 Stores session_id → CallState mapping.
+
+Backends (SESSION_STORE=memory|sqlite|journal):
+- MemorySessionStore (default): per-worker LRU of compact states with an
+  idle TTL, bounded by SESSION_MAX_ENTRIES.
+- SQLiteSessionStore: encoded states in a local SQLite file
+  (SESSION_STORE_PATH) that several workers on one host can share.
+- JournalSessionStore: like SQLiteSessionStore, but each turn is appended
+  as an event (user input + state delta), with a full snapshot every
+  SESSION_SNAPSHOT_EVERY events. The journal doubles as an audit log.
+
+Sessions expire after SESSION_IDLE_TTL_S without an update, or after
+SESSION_COMPLETED_TTL_S once the call is complete. Expired sessions are
+removed by a heap-ordered sweep (see sweep()), which the backend also runs
+periodically (see backend/app.py).
+
+The memory backend can be snapshotted to disk and restored after a
+restart (see backend/snapshot.py); restored sessions stay encoded in the
+snapshot file until first accessed.
+
+Each session also has a transcript archive: the messages history
+compaction folded out of its state (see src/memory.py). update_session()
+moves a turn's `pending_archive` there in the same write as the state, and
+the archive goes when the session is deleted or expires (for the journal
+backend, when its events pass the retention period). The memory backend
+keeps only the newest SESSION_ARCHIVE_MAX_MESSAGES per session and counts
+them in its bytes, so a long call cannot grow a worker without bound. Snapshots and
+cluster handoff carry it along with the state.
+
+The SQLite backends block on file I/O (and on other workers' write locks),
+so async code reaches the store through call_store(), which runs their
+calls in a worker thread.
+
+Concurrent turns on one session are serialized by session_lock() within a
+worker. Across workers, every write bumps the session's version, and a
+write made against an outdated version raises SessionConflictError.
 """
 
-from typing import Optional
+import asyncio
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
 import uuid
-from src.state import CallState, create_initial_state
+import weakref
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from src.state import CallState, create_initial_state, create_initial_state_async
+from src.codec import (
+    CompactCallState,
+    apply_delta,
+    decode_delta,
+    decode_state,
+    encode_delta,
+    encode_state,
+    estimate_messages_size,
+    estimate_size,
+    state_delta,
+)
+
+
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", "1800"))
+SESSION_COMPLETED_TTL_S = float(os.getenv("SESSION_COMPLETED_TTL_S", "300"))
+SESSION_SWEEP_INTERVAL_S = float(os.getenv("SESSION_SWEEP_INTERVAL_S", "30"))
+# Journal backend: events between full snapshots, how long the journal of
+# an expired session is kept for audit, and sessions cached per worker
+SESSION_SNAPSHOT_EVERY = int(os.getenv("SESSION_SNAPSHOT_EVERY", "20"))
+SESSION_JOURNAL_RETENTION_S = float(os.getenv("SESSION_JOURNAL_RETENTION_S", str(7 * 24 * 3600)))
+SESSION_JOURNAL_CACHE = int(os.getenv("SESSION_JOURNAL_CACHE", "1000"))
+# Memory backend: archived messages kept per session (older ones are dropped)
+SESSION_ARCHIVE_MAX_MESSAGES = int(os.getenv("SESSION_ARCHIVE_MAX_MESSAGES", "200"))
+
+DEFAULT_PATH = os.path.join(".data", "sessions.sqlite3")
+DEFAULT_JOURNAL_PATH = os.path.join(".data", "session_journal.sqlite3")
+
+
+# One session in a snapshot or handoff: (session_id, encoded state, seconds
+# to expiry, version, archived messages by position, None where dropped)
+SessionEntry = tuple[str, bytes, float, int, list[Optional[dict]]]
+
+
+class SessionConflictError(RuntimeError):
+    """Raised when a session changed (or expired) since it was read."""
+
+
+class SessionStore:
+    """Interface shared by session store backends."""
+
+    # Calls may wait on disk or on another worker's lock (see call_store())
+    blocking = False
+
+    def __init__(self, max_entries: int, idle_ttl: float, completed_ttl: float):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.completed_ttl = completed_ttl
+        self.evictions = {"idle": 0, "capacity": 0}
+
+    def _ttl(self, state: CallState) -> float:
+        return self.completed_ttl if state.get("is_complete") else self.idle_ttl
+
+    def get(self, session_id: str) -> Optional[CallState]:
+        """Return a fresh state dict, or None if unknown or expired."""
+        return self.get_versioned(session_id)[0]
+
+    def get_versioned(self, session_id: str) -> tuple[Optional[CallState], int]:
+        """Return (state, version); (None, 0) if unknown or expired."""
+        raise NotImplementedError
+
+    def set(
+        self,
+        session_id: str,
+        state: CallState,
+        expected_version: Optional[int] = None,
+        archive: Optional[list[dict]] = None,
+    ) -> int:
+        """
+        Store a state, restart its TTL and return the new version.
+        With expected_version, raise SessionConflictError unless the stored
+        version still matches. `archive` (messages compaction folded out of
+        the state) is appended to the session's archive in the same write.
+        """
+        raise NotImplementedError
+
+    def archived(self, session_id: str, start: int = 0, end: Optional[int] = None) -> list[dict]:
+        """Archived messages [start:end] of a session, by absolute position."""
+        raise NotImplementedError
+
+    def set_many(self, items: list[tuple[str, CallState]]) -> None:
+        """Store several new sessions at once (bulk initialization)."""
+        for session_id, state in items:
+            self.set(session_id, state)
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def exists(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def sweep(self) -> int:
+        """Remove expired sessions. Returns how many were removed."""
+        raise NotImplementedError
+
+    def metrics(self) -> dict:
+        """Size, evictions and bytes in use."""
+        raise NotImplementedError
+
+    def snapshot_entries(self) -> Optional[list[SessionEntry]]:
+        """
+        Live sessions as SessionEntry tuples, least recently used first.
+        None if the backend is durable on its own and needs no snapshot.
+        """
+        return None
+
+    def restore(self, entries: list[SessionEntry]) -> int:
+        """
+        Load snapshot_entries() output. Returns how many were restored.
+        Durable backends ignore snapshots.
+        """
+        return 0
+
+    def session_ids(self) -> list[str]:
+        """IDs of sessions held by this worker, for handoff to other nodes."""
+        return []
+
+    def take(self, session_ids: list[str]) -> list[SessionEntry]:
+        """
+        Remove sessions and return them as SessionEntry tuples, so
+        another node can restore() them. Shared backends hand off nothing.
+        """
+        return []
+
+
+class _Archive:
+    """
+    A memory-store session's archived messages, newest `limit` only.
+    `start` is the position of the first one kept; `size` their bytes.
+    """
+
+    __slots__ = ("start", "messages", "size")
+
+    def __init__(self, start: int = 0):
+        self.start = start
+        self.messages: list[dict] = []
+        self.size = 0
+
+    @classmethod
+    def from_entry(cls, messages: list[Optional[dict]], limit: int) -> "_Archive":
+        dropped = 0
+        while dropped < len(messages) and messages[dropped] is None:
+            dropped += 1
+        archive = cls(dropped)
+        archive.extend(messages[dropped:], limit)
+        return archive
+
+    def extend(self, messages: list[dict], limit: int) -> int:
+        """Append messages and drop the oldest past `limit`. Returns the change in bytes."""
+        before = self.size
+        self.messages.extend(dict(message) for message in messages)
+        self.size += estimate_messages_size(messages)
+        excess = len(self.messages) - limit
+        if excess > 0:
+            self.size -= estimate_messages_size(self.messages[:excess])
+            del self.messages[:excess]
+            self.start += excess
+        return self.size - before
+
+    def read(self, start: int, end: Optional[int]) -> list[dict]:
+        """Kept messages in [start:end] by absolute position."""
+        stop = len(self.messages) if end is None else max(0, end - self.start)
+        return self.messages[max(0, start - self.start):stop]
+
+    def entry(self) -> list[Optional[dict]]:
+        return [None] * self.start + self.messages
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Per-worker LRU of CompactCallState.
+
+    Entries sit in an OrderedDict in access order (for capacity eviction)
+    and an expiry min-heap (for TTL eviction). Heap items are not removed
+    when a session is touched; the sweep skips items whose expiry no longer
+    matches the entry, and the heap is rebuilt when stale items pile up.
+
+    Restored sessions are held "cold": still encoded, usually as views into
+    the memory-mapped snapshot file. A cold session is decoded into the LRU
+    on first access, and cold sessions are evicted before hot ones.
+
+    Each session keeps its newest `archive_limit` archived messages; reads
+    of older positions return only what is kept.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        idle_ttl: float = SESSION_IDLE_TTL_S,
+        completed_ttl: float = SESSION_COMPLETED_TTL_S,
+        archive_limit: int = SESSION_ARCHIVE_MAX_MESSAGES,
+    ):
+        super().__init__(max_entries, idle_ttl, completed_ttl)
+        self.archive_limit = archive_limit
+        self._lock = threading.Lock()
+        # session_id -> (compact state, encoded size, expires_at, version)
+        self._entries: OrderedDict[str, tuple[CompactCallState, int, float, int]] = OrderedDict()
+        self._expiry: list[tuple[float, str]] = []
+        # session_id -> (encoded state, expires_at, version), oldest first
+        self._cold: dict[str, tuple[bytes, float, int]] = {}
+        # session_id -> archived messages, for hot and cold sessions alike
+        self._archives: dict[str, _Archive] = {}
+        # Encoded states and archived messages
+        self._bytes = 0
+        # Bumped on every change, so unchanged stores can skip snapshots
+        self.generation = 0
+
+    def get_versioned(self, session_id: str) -> tuple[Optional[CallState], int]:
+        with self._lock:
+            entry = self._live_entry(session_id, time.monotonic())
+            if entry is None:
+                return None, 0
+            self._entries.move_to_end(session_id)
+            return entry[0].to_dict(), entry[3]
+
+    def _live_entry(self, session_id: str, now: float):
+        entry = self._entries.get(session_id)
+        if entry is None and session_id in self._cold:
+            entry = self._warm(session_id)
+        if entry is not None and entry[2] <= now:
+            self._remove(session_id)
+            self.evictions["idle"] += 1
+            return None
+        return entry
+
+    def _warm(self, session_id: str):
+        """Decode a cold session into the LRU (its heap item stays valid)."""
+        data, expires_at, version = self._cold.pop(session_id)
+        entry = (CompactCallState.from_dict(decode_state(data)), len(data), expires_at, version)
+        self._entries[session_id] = entry
+        return entry
+
+    def set(
+        self,
+        session_id: str,
+        state: CallState,
+        expected_version: Optional[int] = None,
+        archive: Optional[list[dict]] = None,
+    ) -> int:
+        compact = CompactCallState.from_dict(state)
+        size = estimate_size(state)
+        now = time.monotonic()
+        expires_at = now + self._ttl(state)
+        with self._lock:
+            old = self._live_entry(session_id, now)
+            version = old[3] if old is not None else 0
+            if expected_version is not None and expected_version != version:
+                raise SessionConflictError(
+                    f"Session {session_id} is at version {version}, expected {expected_version}"
+                )
+            if old is not None:
+                self._remove(session_id, drop_archive=False)
+            version += 1
+            self._entries[session_id] = (compact, size, expires_at, version)
+            if archive:
+                self._bytes += self._archives.setdefault(session_id, _Archive()).extend(archive, self.archive_limit)
+            self._bytes += size
+            heapq.heappush(self._expiry, (expires_at, session_id))
+
+            self.generation += 1
+
+            self._sweep_locked(now)
+            self._evict_to_capacity()
+            if len(self._expiry) > 2 * (len(self._entries) + len(self._cold)) + 64:
+                self._expiry = [(e[2], sid) for sid, e in self._entries.items()]
+                self._expiry += [(e[1], sid) for sid, e in self._cold.items()]
+                heapq.heapify(self._expiry)
+            return version
+
+    def _evict_to_capacity(self) -> None:
+        while len(self._entries) + len(self._cold) > self.max_entries:
+            # Cold sessions haven't been touched since the restart
+            oldest = next(iter(self._cold or self._entries))
+            self._remove(oldest)
+            self.evictions["capacity"] += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._entries or session_id in self._cold:
+                self._remove(session_id)
+
+    def _remove(self, session_id: str, drop_archive: bool = True) -> None:
+        entry = self._entries.pop(session_id, None)
+        self._bytes -= entry[1] if entry is not None else len(self._cold.pop(session_id)[0])
+        if drop_archive:
+            archive = self._archives.pop(session_id, None)
+            if archive is not None:
+                self._bytes -= archive.size
+        self.generation += 1
+
+    def archived(self, session_id: str, start: int = 0, end: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            archive = self._archives.get(session_id)
+            messages = archive.read(start, end) if archive is not None else []
+        return [dict(message) for message in messages]
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._sweep_locked(time.monotonic())
+
+    def _sweep_locked(self, now: float) -> int:
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, session_id = heapq.heappop(self._expiry)
+            entry = self._entries.get(session_id)
+            cold = self._cold.get(session_id)
+            if (entry is not None and entry[2] == expires_at) or (cold is not None and cold[1] == expires_at):
+                self._remove(session_id)
+                removed += 1
+        self.evictions["idle"] += removed
+        return removed
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._entries) + len(self._cold),
+                "cold": len(self._cold),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "evictions": dict(self.evictions),
+            }
+
+    def snapshot_entries(self) -> list[SessionEntry]:
+        now = time.monotonic()
+        with self._lock:
+            items = [(sid, data, expires_at, version) for sid, (data, expires_at, version) in self._cold.items()]
+            items += [(sid, compact, expires_at, version) for sid, (compact, _, expires_at, version) in self._entries.items()]
+            archives = {sid: archive.entry() for sid, archive in self._archives.items()}
+        # Encode outside the lock; stored compact states are never mutated
+        return [
+            (
+                sid,
+                encode_state(value) if isinstance(value, CompactCallState) else value,
+                expires_at - now,
+                version,
+                archives.get(sid, []),
+            )
+            for sid, value, expires_at, version in items
+            if expires_at > now
+        ]
+
+    def session_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._cold) + list(self._entries)
+
+    def take(self, session_ids: list[str]) -> list[SessionEntry]:
+        now = time.monotonic()
+        taken = []
+        with self._lock:
+            for session_id in session_ids:
+                entry = self._entries.get(session_id)
+                cold = self._cold.get(session_id)
+                archive = self._archives[session_id].entry() if session_id in self._archives else []
+                if entry is not None and entry[2] > now:
+                    taken.append((session_id, entry[0], entry[2] - now, entry[3], archive))
+                elif cold is not None and cold[1] > now:
+                    taken.append((session_id, bytes(cold[0]), cold[1] - now, cold[2], archive))
+                if entry is not None or cold is not None:
+                    self._remove(session_id)
+        return [
+            (sid, encode_state(value) if isinstance(value, CompactCallState) else value, ttl, version, archive)
+            for sid, value, ttl, version, archive in taken
+        ]
+
+    def restore(self, entries: list[SessionEntry]) -> int:
+        now = time.monotonic()
+        restored = 0
+        with self._lock:
+            for session_id, data, ttl, version, archive in entries:
+                if ttl <= 0 or session_id in self._entries or session_id in self._cold:
+                    continue
+                expires_at = now + ttl
+                self._cold[session_id] = (data, expires_at, version)
+                if archive:
+                    self._archives[session_id] = _Archive.from_entry(archive, self.archive_limit)
+                    self._bytes += self._archives[session_id].size
+                self._bytes += len(data)
+                heapq.heappush(self._expiry, (expires_at, session_id))
+                restored += 1
+            self.generation += 1
+            # Entries come oldest first, so the newest ones are kept
+            self._evict_to_capacity()
+        return restored
+
+
+# Archive table of the SQLite-based backends
+_ARCHIVE_TABLE = (
+    "CREATE TABLE IF NOT EXISTS session_archive ("
+    " session_id TEXT NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " data TEXT NOT NULL,"
+    " PRIMARY KEY (session_id, position)) WITHOUT ROWID"
+)
+
+
+def _append_archive(conn: sqlite3.Connection, session_id: str, state: CallState, archive: list[dict]) -> None:
+    """Insert `archive`, which ends where the state's archive count does."""
+    start = state.get("archived_message_count", 0) - len(archive)
+    conn.executemany(
+        "INSERT OR REPLACE INTO session_archive (session_id, position, data) VALUES (?, ?, ?)",
+        [
+            (session_id, position, json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+            for position, message in enumerate(archive, start=start)
+        ],
+    )
+
+
+def _read_archive(conn: sqlite3.Connection, session_id: str, start: int, end: Optional[int]) -> list[dict]:
+    rows = conn.execute(
+        "SELECT data FROM session_archive WHERE session_id = ? AND position >= ? AND position < ?"
+        " ORDER BY position",
+        (session_id, max(0, start), end if end is not None else 2**62),
+    ).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Encoded states (src.codec) in a local SQLite file in WAL mode, so
+    several workers on one host see the same sessions. Expiry uses wall
+    clock time, since it is compared across processes.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        idle_ttl: float = SESSION_IDLE_TTL_S,
+        completed_ttl: float = SESSION_COMPLETED_TTL_S,
+    ):
+        super().__init__(max_entries, idle_ttl, completed_ttl)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute(_ARCHIVE_TABLE)
+
+    def get_versioned(self, session_id: str) -> tuple[Optional[CallState], int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, version FROM sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return (decode_state(row[0]), row[1]) if row else (None, 0)
+
+    def set(
+        self,
+        session_id: str,
+        state: CallState,
+        expected_version: Optional[int] = None,
+        archive: Optional[list[dict]] = None,
+    ) -> int:
+        now = time.time()
+        data = encode_state(state)
+        expires_at = now + self._ttl(state)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._write(session_id, data, now, expires_at, expected_version)
+                if version is not None and archive:
+                    _append_archive(self._conn, session_id, state, archive)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        if version is None:
+            raise SessionConflictError(f"Session {session_id} changed since version {expected_version}")
+        return version
+
+    def _write(
+        self, session_id: str, data: bytes, now: float, expires_at: float, expected_version: Optional[int]
+    ) -> Optional[int]:
+        """Write the row (lock held, in a transaction). Returns the new version, None on conflict."""
+        if expected_version is None:
+            # Unconditional write: take the next version, whatever it is
+            return self._conn.execute(
+                "INSERT INTO sessions (session_id, data, updated_at, expires_at, version)"
+                " VALUES (?, ?, ?, ?, 1)"
+                " ON CONFLICT(session_id) DO UPDATE SET"
+                "  data = excluded.data, updated_at = excluded.updated_at,"
+                "  expires_at = excluded.expires_at,"
+                "  version = CASE WHEN sessions.expires_at > excluded.updated_at"
+                "   THEN sessions.version + 1 ELSE 1 END"
+                " RETURNING version",
+                (session_id, data, now, expires_at),
+            ).fetchone()[0]
+
+        if expected_version == 0:
+            # New session (or one that expired): no live row may exist
+            expired = self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ? AND expires_at <= ?", (session_id, now)
+            ).rowcount
+            if expired:
+                self._conn.execute("DELETE FROM session_archive WHERE session_id = ?", (session_id,))
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, data, updated_at, expires_at, version)"
+                " VALUES (?, ?, ?, ?, 1)",
+                (session_id, data, now, expires_at),
+            ).rowcount
+            return 1 if inserted else None
+
+        # Compare-and-swap on the version, atomic across workers
+        updated = self._conn.execute(
+            "UPDATE sessions SET data = ?, updated_at = ?, expires_at = ?, version = version + 1"
+            " WHERE session_id = ? AND version = ? AND expires_at > ?",
+            (data, now, expires_at, session_id, expected_version, now),
+        ).rowcount
+        return expected_version + 1 if updated else None
 
+    def set_many(self, items: list[tuple[str, CallState]]) -> None:
+        now = time.time()
+        rows = [(session_id, encode_state(state), now, now + self._ttl(state)) for session_id, state in items]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (session_id, data, updated_at, expires_at, version)"
+                    " VALUES (?, ?, ?, ?, 1)",
+                    rows,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
 
-# In-memory session store
-# In production, this would be Redis or a database
-_sessions: dict[str, CallState] = {}
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_archive WHERE session_id = ?", (session_id,))
+
+    def archived(self, session_id: str, start: int = 0, end: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            return _read_archive(self._conn, session_id, start, end)
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def sweep(self) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._conn.execute(
+                    "DELETE FROM sessions WHERE expires_at <= ? RETURNING session_id", (time.time(),)
+                ).fetchall()
+                expired = len(removed)
+                # Capacity is enforced here rather than on every write, since
+                # counting rows on each turn would cost more than the bound saves
+                excess = self._conn.execute("SELECT count(*) FROM sessions").fetchone()[0] - self.max_entries
+                evicted = 0
+                if excess > 0:
+                    evicted_rows = self._conn.execute(
+                        "DELETE FROM sessions WHERE session_id IN"
+                        " (SELECT session_id FROM sessions ORDER BY updated_at LIMIT ?)"
+                        " RETURNING session_id",
+                        (excess,),
+                    ).fetchall()
+                    evicted = len(evicted_rows)
+                    removed += evicted_rows
+                self._conn.executemany("DELETE FROM session_archive WHERE session_id = ?", removed)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        self.evictions["idle"] += expired
+        self.evictions["capacity"] += evicted
+        return expired + evicted
+
+    def metrics(self) -> dict:
+        with self._lock:
+            size, total_bytes = self._conn.execute(
+                "SELECT count(*), coalesce(sum(length(data)), 0) FROM sessions WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "size": size,
+            "max_entries": self.max_entries,
+            "bytes": total_bytes,
+            # Evictions performed by this worker's sweeps
+            "evictions": dict(self.evictions),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JournalSessionStore(SessionStore):
+    """
+    Event-sourced sessions in a local SQLite file (WAL mode).
+
+    Each write appends one row to session_events: a full snapshot of the
+    state every `snapshot_every` events (and whenever the previous state
+    isn't at hand), otherwise the delta from the previous version plus the
+    turn's user input. Version = event sequence number, and session_heads
+    holds each live session's version, latest snapshot and expiry. Reads
+    replay the events since the latest snapshot; a per-worker cache of
+    recent states makes that the exception rather than the rule.
+
+    Events of expired sessions are kept for `retention` seconds so a
+    conversation can still be audited or analysed offline (see events()).
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = DEFAULT_JOURNAL_PATH,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        idle_ttl: float = SESSION_IDLE_TTL_S,
+        completed_ttl: float = SESSION_COMPLETED_TTL_S,
+        snapshot_every: int = SESSION_SNAPSHOT_EVERY,
+        retention: float = SESSION_JOURNAL_RETENTION_S,
+        cache_size: int = SESSION_JOURNAL_CACHE,
+    ):
+        super().__init__(max_entries, idle_ttl, completed_ttl)
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.retention = retention
+        self.cache_size = cache_size
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # session_id -> (version, encoded state), most recently used last.
+        # Encoded, so callers mutating a state can't alter what later
+        # deltas are computed against.
+        self._cache: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+        self.counters = {"snapshots": 0, "deltas": 0, "replayed_events": 0, "cache_hits": 0}
+
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_events ("
+            " session_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " kind TEXT NOT NULL,"  # 'snapshot' or 'delta'
+            " user_input TEXT,"
+            " data BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_heads ("
+            " session_id TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " snapshot_seq INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS session_heads_expires_at ON session_heads (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS session_heads_updated_at ON session_heads (updated_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS session_events_created_at ON session_events (created_at)")
+        self._conn.execute(_ARCHIVE_TABLE)
+
+    def get_versioned(self, session_id: str) -> tuple[Optional[CallState], int]:
+        with self._lock:
+            head = self._conn.execute(
+                "SELECT version, snapshot_seq FROM session_heads WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+            if head is None:
+                return None, 0
+            version, snapshot_seq = head
+            cached = self._cache.get(session_id)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(session_id)
+                self.counters["cache_hits"] += 1
+                return decode_state(cached[1]), version
+
+            # Another worker wrote it, or it isn't cached: replay the tail
+            rows = self._conn.execute(
+                "SELECT seq, kind, data FROM session_events"
+                " WHERE session_id = ? AND seq >= ? AND seq <= ? ORDER BY seq",
+                (session_id, snapshot_seq, version),
+            ).fetchall()
+            state = self._replay(rows)
+            self.counters["replayed_events"] += len(rows)
+            self._remember(session_id, version, encode_state(state))
+            return state, version
+
+    @staticmethod
+    def _replay(rows) -> CallState:
+        state = None
+        for _, kind, data in rows:
+            if kind == "snapshot":
+                state = decode_state(data)
+            else:
+                apply_delta(state, decode_delta(data))
+        return state
+
+    def _remember(self, session_id: str, version: int, data: bytes) -> None:
+        self._cache[session_id] = (version, data)
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def set(
+        self,
+        session_id: str,
+        state: CallState,
+        expected_version: Optional[int] = None,
+        archive: Optional[list[dict]] = None,
+    ) -> int:
+        now = time.time()
+        expires_at = now + self._ttl(state)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                head = self._conn.execute(
+                    "SELECT version, snapshot_seq, expires_at FROM session_heads WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()
+                live = head is not None and head[2] > now
+                current = head[0] if live else 0
+                if expected_version is not None and expected_version != current:
+                    raise SessionConflictError(
+                        f"Session {session_id} is at version {current}, expected {expected_version}"
+                    )
+
+                if head is not None:
+                    seq = head[0] + 1
+                else:
+                    # Sequence numbers never repeat, even across expiry
+                    seq = self._conn.execute(
+                        "SELECT coalesce(max(seq), 0) + 1 FROM session_events WHERE session_id = ?",
+                        (session_id,),
+                    ).fetchone()[0]
+
+                encoded = encode_state(state)
+                kind, data = "snapshot", encoded
+                cached = self._cache.get(session_id)
+                if live and cached is not None and cached[0] == current and seq - head[1] < self.snapshot_every:
+                    delta = state_delta(decode_state(cached[1]), state)
+                    if delta is not None:
+                        kind, data = "delta", encode_delta(delta)
+                snapshot_seq = seq if kind == "snapshot" else head[1]
+
+                self._conn.execute(
+                    "INSERT INTO session_events (session_id, seq, kind, user_input, data, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, seq, kind, state.get("last_user_input"), data, now),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO session_heads (session_id, version, snapshot_seq, updated_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (session_id, seq, snapshot_seq, now, expires_at),
+                )
+                if archive:
+                    _append_archive(self._conn, session_id, state, archive)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self.counters["snapshots" if kind == "snapshot" else "deltas"] += 1
+            self._remember(session_id, seq, encoded)
+            return seq
+
+    def set_many(self, items: list[tuple[str, CallState]]) -> None:
+        # New sessions: one snapshot event and head each, in one transaction
+        now = time.time()
+        events, heads = [], []
+        for session_id, state in items:
+            events.append((session_id, 1, "snapshot", state.get("last_user_input"), encode_state(state), now))
+            heads.append((session_id, 1, 1, now, now + self._ttl(state)))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO session_events (session_id, seq, kind, user_input, data, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    events,
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO session_heads (session_id, version, snapshot_seq, updated_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    heads,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self.counters["snapshots"] += len(events)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM session_heads WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_events WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_archive WHERE session_id = ?", (session_id,))
+            self._cache.pop(session_id, None)
+
+    def archived(self, session_id: str, start: int = 0, end: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            return _read_archive(self._conn, session_id, start, end)
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM session_heads WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def events(self, session_id: str) -> list[dict]:
+        """
+        The session's journal, oldest first: seq, kind, user_input,
+        created_at and either the full "state" or the "delta".
+        Available until the retention period ends, even after expiry.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, kind, user_input, data, created_at FROM session_events"
+                " WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        return [
+            {
+                "seq": seq,
+                "kind": kind,
+                "user_input": user_input,
+                "created_at": created_at,
+                **({"state": decode_state(data)} if kind == "snapshot" else {"delta": decode_delta(data)}),
+            }
+            for seq, kind, user_input, data, created_at in rows
+        ]
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = self._conn.execute("DELETE FROM session_heads WHERE expires_at <= ?", (now,)).rowcount
+            excess = self._conn.execute("SELECT count(*) FROM session_heads").fetchone()[0] - self.max_entries
+            evicted = 0
+            if excess > 0:
+                evicted = self._conn.execute(
+                    "DELETE FROM session_heads WHERE session_id IN"
+                    " (SELECT session_id FROM session_heads ORDER BY updated_at LIMIT ?)",
+                    (excess,),
+                ).rowcount
+            # Past retention, events of sessions that are no longer live go;
+            # live sessions keep everything from their latest snapshot on
+            pruned = {
+                row[0] for row in self._conn.execute(
+                    "DELETE FROM session_events WHERE created_at <= ? AND ("
+                    " session_id NOT IN (SELECT session_id FROM session_heads)"
+                    " OR seq < (SELECT snapshot_seq FROM session_heads h"
+                    "           WHERE h.session_id = session_events.session_id))"
+                    " RETURNING session_id",
+                    (now - self.retention,),
+                )
+            }
+            # The archive goes with the session's last event
+            self._conn.executemany(
+                "DELETE FROM session_archive WHERE session_id = ?"
+                " AND NOT EXISTS (SELECT 1 FROM session_events WHERE session_id = ?)",
+                [(session_id, session_id) for session_id in pruned],
+            )
+            if expired or evicted:
+                live = {row[0] for row in self._conn.execute("SELECT session_id FROM session_heads")}
+                for session_id in [sid for sid in self._cache if sid not in live]:
+                    del self._cache[session_id]
+        self.evictions["idle"] += expired
+        self.evictions["capacity"] += evicted
+        return expired + evicted
+
+    def metrics(self) -> dict:
+        with self._lock:
+            size = self._conn.execute(
+                "SELECT count(*) FROM session_heads WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+            events, total_bytes = self._conn.execute(
+                "SELECT count(*), coalesce(sum(length(data)), 0) FROM session_events"
+            ).fetchone()
+        return {
+            "backend": "journal",
+            "size": size,
+            "max_entries": self.max_entries,
+            "events": events,
+            "bytes": total_bytes,
+            "cached": len(self._cache),
+            # Evictions performed by this worker's sweeps
+            "evictions": dict(self.evictions),
+            **self.counters,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# =========================
+# Process-wide store
+# =========================
+_store: Optional[SessionStore] = None
+
+
+def create_session_store() -> SessionStore:
+    """Build the store selected by SESSION_STORE / SESSION_STORE_PATH."""
+    backend = os.getenv("SESSION_STORE", "memory")
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_STORE_PATH", DEFAULT_PATH))
+    if backend == "journal":
+        return JournalSessionStore(os.getenv("SESSION_STORE_PATH", DEFAULT_JOURNAL_PATH))
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store, creating it on first use."""
+    global _store
+    if _store is None:
+        _store = create_session_store()
+    return _store
+
+
+def set_session_store(store: SessionStore) -> None:
+    """Replace the process-wide store (tests, benchmarks)."""
+    global _store
+    _store = store
+
+
+def _random_session_id() -> str:
+    return str(uuid.uuid4())
+
+
+_session_id_factory: Callable[[], str] = _random_session_id
+
+
+def new_session_id() -> str:
+    """ID for a new session (see set_session_id_factory)."""
+    return _session_id_factory()
+
+
+def set_session_id_factory(factory: Optional[Callable[[], str]]) -> None:
+    """
+    Replace how new session IDs are made, e.g. so they hash to this node
+    (backend/routing.py). None restores random UUIDs.
+    """
+    global _session_id_factory
+    _session_id_factory = factory or _random_session_id
 
 
 def create_session(phone: str) -> tuple[str, Optional[CallState]]:
@@ -20,33 +1027,113 @@ def create_session(phone: str) -> tuple[str, Optional[CallState]]:
     Create a new session for a given phone number.
     Returns (session_id, CallState) or (session_id, None) if customer not found.
     """
-    session_id = str(uuid.uuid4())
-    
+    session_id = new_session_id()
+
     state = create_initial_state(phone)
     if not state:
         return session_id, None
-    
-    _sessions[session_id] = state
+
+    get_session_store().set(session_id, state)
     return session_id, state
 
 
+async def create_session_async(phone: str) -> tuple[str, Optional[CallState]]:
+    """
+    Like create_session(), but looks the customer up through the async
+    CRM client so a slow CRM doesn't block the event loop.
+    """
+    session_id = new_session_id()
+
+    state = await create_initial_state_async(phone)
+    if not state:
+        return session_id, None
+
+    await call_store(get_session_store().set, session_id, state)
+    return session_id, state
+
+
+def create_sessions_bulk(states: list[CallState]) -> list[str]:
+    """
+    Store already-built initial states as new sessions in one batch.
+    Returns their session IDs, in order.
+    """
+    items = [(new_session_id(), state) for state in states]
+    get_session_store().set_many(items)
+    return [session_id for session_id, _ in items]
+
+
+async def call_store(fn: Callable, *args):
+    """
+    Await fn(*args), a call that reaches the session store. Runs it in a
+    worker thread if the store blocks, so a write lock held by another
+    worker stalls this one request rather than the whole event loop.
+    """
+    if get_session_store().blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
 def get_session(session_id: str) -> Optional[CallState]:
-    """Get session state by session_id."""
-    return _sessions.get(session_id)
+    """
+    Get session state by session_id.
+    Returns a fresh dict the caller may mutate freely.
+    """
+    return get_session_store().get(session_id)
 
 
-def update_session(session_id: str, state: CallState) -> None:
-    """Update session state."""
-    _sessions[session_id] = state
+def get_session_versioned(session_id: str) -> tuple[Optional[CallState], int]:
+    """Get (state, version), for a later update_session(expected_version=...)."""
+    return get_session_store().get_versioned(session_id)
+
+
+def update_session(session_id: str, state: CallState, expected_version: Optional[int] = None) -> int:
+    """
+    Update session state. Returns the new version.
+    Messages compaction folded out of the state (`pending_archive`) move
+    to the session's archive.
+    Raises SessionConflictError if expected_version is given and stale.
+    """
+    archive = state.pop("pending_archive", None)
+    return get_session_store().set(session_id, state, expected_version, archive)
+
+
+def session_archive_reader(session_id: str) -> Callable[[int, Optional[int]], list[dict]]:
+    """Reads the session's archived messages (src.memory.ArchiveReader)."""
+    store = get_session_store()
+    return lambda start, end: store.archived(session_id, start, end)
 
 
 def delete_session(session_id: str) -> None:
     """Delete a session."""
-    if session_id in _sessions:
-        del _sessions[session_id]
+    get_session_store().delete(session_id)
 
 
 def session_exists(session_id: str) -> bool:
     """Check if session exists."""
-    return session_id in _sessions
+    return get_session_store().exists(session_id)
+
+
+# Per-session turn locks for this worker. Entries disappear once no
+# coroutine holds or waits on the lock, so idle sessions cost nothing.
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def session_lock(session_id: str) -> asyncio.Lock:
+    """
+    Lock serializing turns of one session within this worker.
+    Different sessions get different locks, so they still run in parallel.
+    """
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _session_locks[session_id] = lock
+    return lock
+
+
+def sweep_sessions() -> int:
+    """Remove expired sessions."""
+    return get_session_store().sweep()
+
 
+def session_metrics() -> dict:
+    return get_session_store().metrics()
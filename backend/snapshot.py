@@ -0,0 +1,300 @@
+# backend/snapshot.py
+
+"""
+Crash-safe snapshots of in-memory sessions and records.
+
+The memory session store and memory record store lose everything when a
+worker restarts. write_snapshot() saves both to SNAPSHOT_PATH, and the
+backend calls it every SNAPSHOT_INTERVAL_S and on shutdown (see
+backend/app.py). load_snapshot() restores them at startup. Durable
+backends (SQLite) are skipped.
+
+Memory stores are per worker, so each worker snapshots to its own file.
+At startup a worker claims the first free slot: SNAPSHOT_PATH itself, then
+snapshot.1.bin, snapshot.2.bin, ... The claim is an exclusive lock on a
+".lock" file beside the snapshot, released when the worker exits, so after
+a restart every slot is restored by exactly one worker.
+
+Writes are atomic: the snapshot goes to a temporary file in the same
+directory, is fsynced, then renamed over the old one, so a crash mid-write
+leaves the previous snapshot intact.
+
+Loading is lazy. The file is memory-mapped and only its session index is
+read; each session stays encoded in the mapping until it is first
+accessed. Records are parsed on the record store's first use. Startup
+time therefore barely depends on how many sessions were saved.
+
+File layout (v2, little-endian):
+    b"SNAP" | u8 version | f64 written_at (wall clock) | u32 session count
+    | u64 records offset | u64 records length
+    then per session, least recently used first:
+        u16 id length + utf-8 id | f64 seconds to expiry | u64 version
+        | u32 state length + encoded state (src.codec)
+        | u32 archive length + archived messages as a JSON list (may be empty)
+    then the records, as one JSON object {kind: [record, ...]}.
+v1 files (no archive) are still read.
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: a single slot
+    fcntl = None
+
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.records import get_record_store
+from backend.session_store import SessionEntry, get_session_store
+
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(".data", "snapshot.bin"))
+SNAPSHOT_INTERVAL_S = float(os.getenv("SNAPSHOT_INTERVAL_S", "60"))
+
+MAGIC = b"SNAP"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sBdIQQ")
+_U16 = struct.Struct("<H")
+_ENTRY = struct.Struct("<dQI")
+_U32 = struct.Struct("<I")
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is not valid."""
+
+
+# Session store generation and record count at the last snapshot, so a
+# periodic snapshot of an unchanged process is skipped
+_last_written: Optional[tuple] = None
+
+
+# =========================
+# Per-worker snapshot slots
+# =========================
+# (path, lock file descriptor) of the slot this worker holds
+_slot: Optional[tuple[str, int]] = None
+
+
+def slot_path(base: str, slot: int) -> str:
+    """Snapshot file of a slot: `base` for slot 0, base.<slot>.<ext> after."""
+    if slot == 0:
+        return base
+    root, ext = os.path.splitext(base)
+    return f"{root}.{slot}{ext}"
+
+
+def claim_slot(base: str) -> tuple[str, int]:
+    """
+    Lock the first snapshot slot no other process holds.
+    Returns (path, lock fd); the lock lasts until the fd is closed.
+    """
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+    slot = 0
+    while True:
+        path = slot_path(base, slot)
+        fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return path, fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return path, fd
+        except BlockingIOError:
+            os.close(fd)
+            slot += 1
+
+
+def snapshot_path() -> str:
+    """This worker's snapshot file, claimed on first use."""
+    global _slot
+    if _slot is None:
+        _slot = claim_slot(SNAPSHOT_PATH)
+    return _slot[0]
+
+
+def write_snapshot(path: Optional[str] = None, force: bool = False) -> Optional[dict]:
+    """
+    Atomically write the in-memory sessions and records to `path`
+    (default: this worker's snapshot slot).
+    Returns counts, or None if nothing needed saving.
+    """
+    global _last_written
+    session_store = get_session_store()
+    record_store = get_record_store()
+
+    records = record_store.snapshot_records()
+    marker = (
+        getattr(session_store, "generation", None),
+        None if records is None else sum(len(kind_records) for kind_records in records.values()),
+    )
+    if not force and marker == _last_written:
+        return None
+
+    sessions = session_store.snapshot_entries()
+    if sessions is None and records is None:
+        return None
+
+    path = path or snapshot_path()
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            size = dump_snapshot(f, sessions or [], records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+    _last_written = marker
+    return {
+        "sessions": len(sessions or ()),
+        "records": sum(len(kind_records) for kind_records in (records or {}).values()),
+        "bytes": size,
+    }
+
+
+def dump_snapshot(f, sessions: list[SessionEntry], records: Optional[dict] = None) -> int:
+    """
+    Write sessions (SessionStore.snapshot_entries() tuples) and records in
+    the snapshot layout to a seekable binary file. Returns the size.
+    Also used to hand sessions to another node (backend/routing.py).
+    """
+    start = f.tell()
+    f.write(b"\0" * _HEADER.size)  # patched once offsets are known
+    for session_id, data, ttl, version, archive in sessions:
+        raw_id = session_id.encode("utf-8")
+        f.write(_U16.pack(len(raw_id)))
+        f.write(raw_id)
+        f.write(_ENTRY.pack(ttl, version, len(data)))
+        f.write(data)
+        raw_archive = json.dumps(archive, separators=(",", ":"), ensure_ascii=False).encode("utf-8") if archive else b""
+        f.write(_U32.pack(len(raw_archive)))
+        f.write(raw_archive)
+
+    records_offset = f.tell() - start
+    raw_records = json.dumps(records, separators=(",", ":"), ensure_ascii=False).encode("utf-8") if records else b""
+    f.write(raw_records)
+    end = f.tell()
+
+    f.seek(start)
+    f.write(_HEADER.pack(MAGIC, VERSION, time.time(), len(sessions), records_offset, len(raw_records)))
+    f.seek(end)
+    return end - start
+
+
+def load_snapshot(path: Optional[str] = None) -> Optional[dict]:
+    """
+    Restore sessions and records from `path` (default: this worker's
+    snapshot slot) into the process-wide stores.
+    Returns counts, or None if there is no snapshot.
+    """
+    global _last_written
+    path = path or snapshot_path()
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            # The mapping outlives the file object; restored sessions are
+            # views into it until they are first accessed
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+    written_at, sessions, load_records = read_snapshot(memoryview(buffer))
+    # Time spent down counts against the sessions' TTLs
+    downtime = max(0.0, time.time() - written_at)
+    sessions = [
+        (session_id, data, ttl - downtime, version, archive)
+        for session_id, data, ttl, version, archive in sessions
+    ]
+
+    session_store = get_session_store()
+    restored = session_store.restore(sessions)
+    get_record_store().restore(load_records)
+
+    _last_written = (getattr(session_store, "generation", None), None)
+    return {"sessions": restored, "age_s": round(downtime, 3)}
+
+
+def read_snapshot(view: memoryview):
+    """
+    Parse the session index of a snapshot.
+    Returns (written_at, [(session_id, state view, ttl, version, archive)],
+    load_records) where load_records() parses the records section when
+    called.
+    """
+    if len(view) < _HEADER.size:
+        raise SnapshotError("Truncated snapshot")
+    magic, version, written_at, count, records_offset, records_length = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot file")
+    if version not in (1, VERSION):
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+    if records_offset + records_length > len(view):
+        raise SnapshotError("Truncated snapshot")
+
+    sessions = []
+    pos = _HEADER.size
+    try:
+        for _ in range(count):
+            (id_length,) = _U16.unpack_from(view, pos)
+            pos += 2
+            session_id = str(view[pos:pos + id_length], "utf-8")
+            pos += id_length
+            ttl, session_version, length = _ENTRY.unpack_from(view, pos)
+            pos += _ENTRY.size
+            if pos + length > records_offset:
+                raise SnapshotError("Session entry runs past the records section")
+            data = view[pos:pos + length]
+            pos += length
+            archive = []
+            if version >= 2:
+                (archive_length,) = _U32.unpack_from(view, pos)
+                pos += _U32.size
+                if pos + archive_length > records_offset:
+                    raise SnapshotError("Session archive runs past the records section")
+                if archive_length:
+                    archive = json.loads(bytes(view[pos:pos + archive_length]))
+                pos += archive_length
+            sessions.append((session_id, data, ttl, session_version, archive))
+    except (struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}") from e
+
+    def load_records() -> dict:
+        if not records_length:
+            return {}
+        return json.loads(bytes(view[records_offset:records_offset + records_length]))
+
+    return written_at, sessions, load_records
+
+
+def _fsync_directory(directory: str) -> None:
+    # Make the rename itself durable (not supported on every platform)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
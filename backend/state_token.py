@@ -0,0 +1,110 @@
+# backend/state_token.py
+
+"""
+Signed, compressed state tokens for the stateless session mode.
+
+In SESSION_MODE=stateless the server keeps no CallState between turns.
+Instead, /api/init and /api/chat return a state token holding everything
+but the messages (which go to the message log, backend/message_log.py),
+and the client sends it back with the next turn. Any worker can serve any
+turn.
+
+Tokens are signed, not encrypted, so they carry no customer or loan data
+from the CRM (the date of birth is the verification answer). Those fields
+are looked up again from customer_phone on each turn, through the cached
+CRM client.
+
+Layout, base64url without padding:
+    u8 version | f64 issued_at | u32 message count
+    | zlib(encode_state(fields)) | HMAC-SHA256 over session_id + the above
+
+The message count ties a token to one point of the conversation: an older
+token no longer matches the message log and is rejected as stale.
+
+Keys come from STATE_TOKEN_SECRET (comma-separated to rotate: the first
+signs, all verify). Tokens expire after STATE_TOKEN_TTL_S.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import struct
+import time
+import zlib
+
+from src.codec import CodecError, decode_state, encode_state
+from src.state import CallState
+
+
+STATE_TOKEN_TTL_S = float(os.getenv("STATE_TOKEN_TTL_S", os.getenv("SESSION_IDLE_TTL_S", "1800")))
+
+VERSION = 1
+
+# Looked up from the CRM on each turn instead of riding in the token
+CRM_FIELDS = (
+    "customer_id",
+    "customer_name",
+    "customer_dob",
+    "loan_id",
+    "loan_type",
+    "outstanding_amount",
+    "days_past_due",
+)
+# Messages, archived ones included, are in the message log
+_EXCLUDED = frozenset(CRM_FIELDS + ("messages", "pending_archive"))
+
+_HEADER = struct.Struct("<BdI")
+_MAC_SIZE = hashlib.sha256().digest_size
+
+
+class StateTokenError(ValueError):
+    """The token is malformed, forged, expired or for another session."""
+
+
+def _secrets() -> list[bytes]:
+    secrets = [s.strip() for s in os.getenv("STATE_TOKEN_SECRET", "").split(",") if s.strip()]
+    if not secrets:
+        raise RuntimeError("STATE_TOKEN_SECRET must be set to use stateless sessions")
+    return [s.encode("utf-8") for s in secrets]
+
+
+def _sign(secret: bytes, session_id: str, payload: bytes) -> bytes:
+    return hmac.new(secret, session_id.encode("utf-8") + b"\0" + payload, hashlib.sha256).digest()
+
+
+def issue_token(session_id: str, state: CallState, message_count: int) -> str:
+    """Sign the state (minus messages and CRM fields) for `session_id`."""
+    fields = {key: value for key, value in state.items() if key not in _EXCLUDED}
+    payload = _HEADER.pack(VERSION, time.time(), message_count) + zlib.compress(encode_state(fields))
+    token = payload + _sign(_secrets()[0], session_id, payload)
+    return base64.urlsafe_b64encode(token).rstrip(b"=").decode("ascii")
+
+
+def read_token(session_id: str, token: str, ttl: float = STATE_TOKEN_TTL_S) -> tuple[CallState, int]:
+    """
+    Verify a token and return (state without messages and CRM fields,
+    message count). Raises StateTokenError.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise StateTokenError("State token is not valid base64") from None
+    if len(raw) < _HEADER.size + _MAC_SIZE:
+        raise StateTokenError("State token is truncated")
+
+    payload, mac = raw[:-_MAC_SIZE], raw[-_MAC_SIZE:]
+    if not any(hmac.compare_digest(mac, _sign(secret, session_id, payload)) for secret in _secrets()):
+        raise StateTokenError("State token signature does not match")
+
+    version, issued_at, message_count = _HEADER.unpack_from(payload, 0)
+    if version != VERSION:
+        raise StateTokenError(f"Unsupported state token version {version}")
+    if time.time() - issued_at > ttl:
+        raise StateTokenError("State token has expired")
+    try:
+        state = decode_state(zlib.decompress(payload[_HEADER.size:]))
+    except (zlib.error, CodecError) as e:
+        raise StateTokenError(f"State token payload is corrupt: {e}") from None
+    return state, message_count
@@ -0,0 +1,172 @@
+# backend/turn_pool.py
+
+"""
+Admission control for graph turns.
+
+At most TURN_MAX_CONCURRENCY turns run at once; others wait in a FIFO
+queue of at most TURN_MAX_QUEUE. A turn is rejected instead of queued when
+the queue is full, or when the expected wait (queue position x average turn
+time / concurrency) exceeds TURN_MAX_WAIT_S. A queued turn that still
+hasn't started after TURN_MAX_WAIT_S gives up. Inside a turn deadline
+(src/deadline.py) the wait is further capped at the time the turn has left.
+Under a spike, admitted turns keep a bounded latency and the excess is
+shed immediately.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from src.deadline import remaining
+from src.timing import record_timing
+
+
+TURN_MAX_CONCURRENCY = int(os.getenv("TURN_MAX_CONCURRENCY", "32"))
+TURN_MAX_QUEUE = int(os.getenv("TURN_MAX_QUEUE", "128"))
+TURN_MAX_WAIT_S = float(os.getenv("TURN_MAX_WAIT_S", "10"))
+
+
+class TurnRejectedError(RuntimeError):
+    """A turn was not admitted. `retry_after` is a hint in whole seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TurnQueueFullError(TurnRejectedError):
+    """The queue is at capacity."""
+
+
+class TurnWaitTimeoutError(TurnRejectedError):
+    """The turn could not start within the maximum wait."""
+
+
+class TurnPool:
+    """FIFO semaphore with a bounded queue, a maximum wait and metrics."""
+
+    def __init__(
+        self,
+        max_concurrency: int = TURN_MAX_CONCURRENCY,
+        max_queue: int = TURN_MAX_QUEUE,
+        max_wait: float = TURN_MAX_WAIT_S,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._running = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Moving averages of turn duration and queue wait, in seconds
+        self._avg_turn = 0.0
+        self._avg_wait = 0.0
+        self._max_wait_seen = 0.0
+        self.counters = {"admitted": 0, "rejected_full": 0, "rejected_wait": 0, "timed_out": 0}
+
+    def estimated_wait(self, position: int) -> float:
+        """Expected seconds before the turn at queue `position` (1-based) starts."""
+        return math.ceil(position / self.max_concurrency) * self._avg_turn
+
+    def _wait_limit(self) -> float:
+        """The longest a turn may queue: max_wait, or less if its deadline is closer."""
+        left = remaining()
+        if left is None:
+            return self.max_wait
+        return max(0.0, min(self.max_wait, left))
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait(len(self._waiters) + 1)))
+
+    async def acquire(self) -> float:
+        """Wait for a slot, or raise TurnRejectedError. Returns the seconds waited."""
+        if self._running < self.max_concurrency and not self._waiters:
+            self._running += 1
+            self._admitted(0.0)
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            self.counters["rejected_full"] += 1
+            raise TurnQueueFullError("Turn queue is full", self._retry_after())
+
+        wait_limit = self._wait_limit()
+        if self.estimated_wait(len(self._waiters) + 1) > wait_limit:
+            self.counters["rejected_wait"] += 1
+            raise TurnWaitTimeoutError("Expected wait exceeds the limit", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, wait_limit)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            elif future in self._waiters:
+                # release() may already have popped it, as a done future
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.counters["timed_out"] += 1
+                raise TurnWaitTimeoutError("Timed out waiting for a turn slot", self._retry_after()) from None
+            raise
+        # release() handed its slot to us, so _running is unchanged
+        waited = time.monotonic() - started
+        self._admitted(waited)
+        return waited
+
+    def release(self) -> None:
+        """Free a slot, handing it to the oldest waiter if there is one."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    def _admitted(self, waited: float) -> None:
+        self.counters["admitted"] += 1
+        self._avg_wait = 0.9 * self._avg_wait + 0.1 * waited
+        self._max_wait_seen = max(self._max_wait_seen, waited)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Run the body in a turn slot (raises TurnRejectedError if not admitted)."""
+        waited = await self.acquire()
+        record_timing("queue", waited * 1000)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._avg_turn = elapsed if self._avg_turn == 0 else 0.9 * self._avg_turn + 0.1 * elapsed
+            self.release()
+
+    def metrics(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "avg_wait_s": round(self._avg_wait, 4),
+            "max_wait_seen_s": round(self._max_wait_seen, 4),
+            "avg_turn_s": round(self._avg_turn, 4),
+            **self.counters,
+        }
+
+
+# =========================
+# Process-wide pool
+# =========================
+_pool: Optional[TurnPool] = None
+
+
+def get_turn_pool() -> TurnPool:
+    """Return the process-wide turn pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = TurnPool()
+    return _pool
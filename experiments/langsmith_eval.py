@@ -1,6 +1,7 @@
 # experiments/langsmith_eval.py
 
 from dotenv import load_dotenv
+import asyncio
 import os
 import sys
 
@@ -11,7 +12,7 @@ load_dotenv()
 
 from langsmith.evaluation import evaluate
 from src.state import create_initial_state
-from src.graph import app
+from src.graph import app, RECURSION_LIMIT
 
 
 def run_agent(inputs: dict) -> dict:
@@ -34,10 +35,10 @@ def run_agent(inputs: dict) -> dict:
 
     try:
         # Use invoke instead of stream for cleaner state management
-        config = {"recursion_limit": 25}
+        config = {"recursion_limit": RECURSION_LIMIT}
         
         # Step 1: Greeting
-        state = app.invoke(state, config)
+        state = asyncio.run(app.ainvoke(state, config))
         
         # Step 2: Respond to greeting
         if "greeting" in user_responses and state.get("awaiting_user"):
@@ -47,7 +48,7 @@ def run_agent(inputs: dict) -> dict:
             })
             state["last_user_input"] = user_responses["greeting"]
             state["awaiting_user"] = False
-            state = app.invoke(state, config)
+            state = asyncio.run(app.ainvoke(state, config))
         
         # Step 3: Handle verification
         if "verification_attempts" in user_responses:
@@ -62,7 +63,7 @@ def run_agent(inputs: dict) -> dict:
                     })
                     state["last_user_input"] = attempt
                     state["awaiting_user"] = False
-                    state = app.invoke(state, config)
+                    state = asyncio.run(app.ainvoke(state, config))
         
         elif "verification" in user_responses:
             # Single verification attempt (successful)
@@ -73,7 +74,7 @@ def run_agent(inputs: dict) -> dict:
                 })
                 state["last_user_input"] = user_responses["verification"]
                 state["awaiting_user"] = False
-                state = app.invoke(state, config)
+                state = asyncio.run(app.ainvoke(state, config))
         
         # Step 4: Handle disclosure response
         if "disclosure" in user_responses and not state.get("is_complete"):
@@ -84,7 +85,7 @@ def run_agent(inputs: dict) -> dict:
                 })
                 state["last_user_input"] = user_responses["disclosure"]
                 state["awaiting_user"] = False
-                state = app.invoke(state, config)
+                state = asyncio.run(app.ainvoke(state, config))
         
         # Step 5: Handle negotiation response (if applicable)
         if "negotiation" in user_responses and not state.get("is_complete"):
@@ -95,7 +96,7 @@ def run_agent(inputs: dict) -> dict:
                 })
                 state["last_user_input"] = user_responses["negotiation"]
                 state["awaiting_user"] = False
-                state = app.invoke(state, config)
+                state = asyncio.run(app.ainvoke(state, config))
         
         # Return final state outputs
         return {
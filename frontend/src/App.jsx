@@ -1,7 +1,7 @@
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import ChatWindow from "./components/chatwindow";
 import UserInput from "./components/userinput";
-import { startChat, sendChatMessage } from "./api/chatapi";
+import { startChat, sendChatMessage, openChatSocket } from "./api/chatapi";
 
 function App() {
   const [phone, setPhone] = useState("");
@@ -9,6 +9,51 @@ function App() {
   const [callState, setCallState] = useState(null);
   const [loading, setLoading] = useState(false);
   const [started, setStarted] = useState(false);
+  const socketRef = useRef(null);
+
+  // Keep a WebSocket open for the session; turns fall back to HTTP without it.
+  // A stateless backend (responses carry a state_token) only speaks HTTP.
+  useEffect(() => {
+    if (!sessionId || callState?.state_token) return;
+    const socket = openChatSocket(sessionId, handleSocketEvent);
+    socketRef.current = socket;
+    return () => {
+      socketRef.current = null;
+      socket.close();
+    };
+  }, [sessionId]);
+
+  function handleSocketEvent(event) {
+    switch (event.type) {
+      case "message_delta":
+        // Grow the assistant message at `index` as chunks arrive
+        // (the client holds the whole transcript, so index = array position)
+        setCallState((prev) => {
+          const messages = [...prev.messages];
+          const current = messages[event.index]?.content ?? "";
+          messages[event.index] = { role: "assistant", content: current + event.text };
+          return { ...prev, messages };
+        });
+        break;
+      case "message":
+        setCallState((prev) => {
+          const messages = [...prev.messages];
+          messages[event.index] = event.message;
+          return { ...prev, messages };
+        });
+        break;
+      case "turn_complete":
+        setCallState((prev) => ({ ...prev, ...event.changes, cursor: event.cursor }));
+        setLoading(false);
+        break;
+      case "error":
+        console.error("Turn error:", event.detail);
+        setLoading(false);
+        break;
+      default:
+        break;
+    }
+  }
 
   async function initChat() {
     if (!phone) return alert("Please enter your phone number");
@@ -28,9 +73,16 @@ function App() {
   async function handleSend(input) {
     if (!callState?.awaiting_user) return;
     setLoading(true);
+    if (socketRef.current?.send(input)) return; // completes on turn_complete
     try {
-      const data = await sendChatMessage(sessionId, input);
-      setCallState(data);
+      const data = await sendChatMessage(sessionId, input, callState.cursor, callState.state_token);
+      setCallState((prev) => ({
+        ...prev,
+        ...data.changes,
+        messages: [...prev.messages, ...data.messages],
+        cursor: data.cursor,
+        state_token: data.state_token,
+      }));
     } catch (err) {
       console.error("Send error:", err);
     }
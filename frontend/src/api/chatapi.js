@@ -24,18 +24,24 @@ export async function startChat(phone) {
 }
 
 /**
- * Send a user message to the backend and get updated state
+ * Send a user message to the backend and get the changes since `cursor`
  * @param {string} sessionId - Current chat session ID
  * @param {string} userInput - User's message
+ * @param {number} cursor - Number of messages the client already has
+ * @param {string} [stateToken] - Token from the previous response (stateless backends)
  */
-export async function sendChatMessage(sessionId, userInput) {
+export async function sendChatMessage(sessionId, userInput, cursor, stateToken) {
   if (!sessionId) throw new Error("Session ID is required");
   if (!userInput) throw new Error("User input cannot be empty");
 
   const res = await fetch(`${BASE_URL}/chat`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ session_id: sessionId, user_input: userInput })
+    headers: {
+      "Content-Type": "application/json",
+      // Lets the backend recognize retries of this turn and replay the result
+      "Idempotency-Key": crypto.randomUUID(),
+    },
+    body: JSON.stringify({ session_id: sessionId, user_input: userInput, cursor, state_token: stateToken })
   });
 
   if (!res.ok) {
@@ -43,5 +49,32 @@ export async function sendChatMessage(sessionId, userInput) {
     throw new Error(`Failed to send message: ${text}`);
   }
 
-  return res.json(); // returns updated state
+  return res.json(); // returns { messages (new only), changes, cursor, state_token? }
+}
+
+/**
+ * Open the WebSocket chat channel for a session.
+ * Events are documented in backend/routes/ws.py.
+ * @param {string} sessionId - Current chat session ID
+ * @param {(event: object) => void} onEvent - Called for every server event
+ * @returns {{ send: (userInput: string) => boolean, close: () => void }}
+ */
+export function openChatSocket(sessionId, onEvent) {
+  const url = `${BASE_URL.replace(/^http/, "ws")}/ws/${sessionId}`;
+  const socket = new WebSocket(url);
+
+  socket.onmessage = (msg) => onEvent(JSON.parse(msg.data));
+  socket.onerror = (err) => console.error("WebSocket error:", err);
+
+  return {
+    // Returns false when the socket isn't open, so callers can fall back to HTTP
+    send(userInput) {
+      if (socket.readyState !== WebSocket.OPEN) return false;
+      socket.send(JSON.stringify({ type: "user_message", content: userInput }));
+      return true;
+    },
+    close() {
+      socket.close();
+    },
+  };
 }
@@ -1,7 +1,10 @@
 # main.py
 
+import asyncio
+
 from src.state import create_initial_state
-from src.graph import app
+from src.graph import app, RECURSION_LIMIT
+from src.utils.log import configure_logging
 
 
 def main():
@@ -41,7 +44,7 @@ def main():
             print(f"[DEBUG] Before invoke - Stage: {stage}, Awaiting: {awaiting}, Payment: {payment_status}")
             
             # Invoke the graph
-            state = app.invoke(state, config={"recursion_limit": 25})
+            state = asyncio.run(app.ainvoke(state, config={"recursion_limit": RECURSION_LIMIT}))
             
             # Debug after invoke
             print(f"[DEBUG] After invoke - Stage: {state.get('stage')}, Awaiting: {state.get('awaiting_user')}, Payment: {state.get('payment_status')}")
@@ -103,4 +106,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Readable node logs alongside the conversation
+    configure_logging(fmt="text")
     main()
\ No newline at end of file
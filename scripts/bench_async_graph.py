@@ -0,0 +1,142 @@
+# scripts/bench_async_graph.py
+
+"""
+Load benchmark for async graph execution against a mock LLM.
+
+Runs many concurrent conversations through `app.ainvoke` on a single event
+loop (i.e. what one uvicorn worker does). Every Gemini call is replaced by a
+mock model that sleeps for a configurable latency, so the numbers show how
+well LLM waits overlap across conversations.
+
+Usage:
+    python scripts/bench_async_graph.py --conversations 500 --llm-latency-ms 300
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.state import create_initial_state
+from src.graph import app, RECURSION_LIMIT
+from src.utils import llm
+
+
+CUSTOMERS = [
+    ("+919876543210", "15-03-1985"),
+    ("+919876543211", "22-07-1990"),
+    ("+919876543212", "05-11-1988"),
+]
+
+# Turn 3 is ambiguous for the rule classifier (goes to Gemini) and also
+# triggers Gemini plan generation; turn 4 asks Gemini for a free-form reply.
+USER_TURNS = [
+    "Yes",
+    None,  # DOB, filled per customer
+    "Hmm, I need to figure out how to handle this",
+    "I need to think about it",
+]
+
+
+class MockGeminiModel:
+    """Stands in for genai.GenerativeModel with a fixed response latency."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _response(self, prompt: str):
+        if "Classification:" in prompt:
+            text = "willing"
+        elif "payment plans" in prompt:
+            text = (
+                '[{"name": "3-Month Installment", "description": "Pay ₹15,000 per month for 3 months"},'
+                ' {"name": "6-Month Installment", "description": "Pay ₹7,500 per month for 6 months"}]'
+            )
+        else:
+            text = "I understand. Take your time, and let me know which plan and date work best for you."
+        part = SimpleNamespace(text=text)
+        candidate = SimpleNamespace(finish_reason="STOP", content=SimpleNamespace(parts=[part]))
+        return SimpleNamespace(candidates=[candidate], text=text)
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        return self._response(prompt)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        return self._response(prompt)
+
+
+async def run_conversation(index: int, turn_latencies: list) -> None:
+    phone, dob = CUSTOMERS[index % len(CUSTOMERS)]
+    config = {"recursion_limit": RECURSION_LIMIT}
+
+    state = create_initial_state(phone)
+    state = await app.ainvoke(state, config)
+
+    for user_input in USER_TURNS:
+        if state.get("is_complete"):
+            break
+        user_input = user_input or dob
+        state["messages"].append({"role": "user", "content": user_input})
+        state["last_user_input"] = user_input
+        state["awaiting_user"] = False
+
+        started = time.perf_counter()
+        state = await app.ainvoke(state, config)
+        turn_latencies.append(time.perf_counter() - started)
+
+
+async def run_level(conversations: int) -> dict:
+    turn_latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_conversation(i, turn_latencies) for i in range(conversations)))
+    elapsed = time.perf_counter() - started
+
+    turn_latencies.sort()
+    return {
+        "conversations": conversations,
+        "elapsed_s": elapsed,
+        "turns_per_s": len(turn_latencies) / elapsed,
+        "p50_ms": statistics.median(turn_latencies) * 1000,
+        "p95_ms": turn_latencies[int(len(turn_latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=500, help="max concurrent conversations")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="mock Gemini latency per call")
+    args = parser.parse_args()
+
+    model = MockGeminiModel(args.llm_latency_ms / 1000)
+    llm._model_cache = model
+
+    levels = sorted({1, 10, 100, args.conversations})
+    results = []
+    # Nodes print per turn; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for level in levels:
+            results.append(asyncio.run(run_level(level)))
+
+    print(f"Mock LLM latency: {args.llm_latency_ms:.0f} ms, LLM calls: {model.calls}")
+    print(f"{'concurrent':>10} {'elapsed s':>10} {'turns/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for r in results:
+        print(
+            f"{r['conversations']:>10} {r['elapsed_s']:>10.2f} {r['turns_per_s']:>10.1f} "
+            f"{r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
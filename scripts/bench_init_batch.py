@@ -0,0 +1,111 @@
+# scripts/bench_init_batch.py
+
+"""
+Throughput of /api/init/batch vs one /api/init per phone.
+
+Builds a synthetic customer book with --phones accounts, points the backend
+at it (CUSTOMER_BOOK_PATH) and, in-process:
+  - streams one /api/init/batch request for all phones, reporting time to
+    first line, total time and sessions/s
+  - runs /api/init for a --compare sample with --concurrency in flight and
+    extrapolates to the full list
+
+Usage:
+    python scripts/bench_init_batch.py --phones 10000 --compare 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.customer_book import build_book
+
+
+def synthetic_accounts(count: int):
+    for i in range(count):
+        customer = {
+            "id": f"CUST{i:07d}",
+            "name": f"Customer {i} Kumar",
+            "dob": "15-03-1985",
+            "phone": f"+9190{i:08d}",
+        }
+        loan = {
+            "id": f"LN{i:07d}",
+            "type": "Personal Loan",
+            "principal": 100000,
+            "outstanding": 45000 + i % 1000,
+            "emi": 5000,
+            "due_date": "2024-12-01",
+            "days_past_due": 30,
+        }
+        yield customer, loan
+
+
+async def run(phones: list[str], compare: int, concurrency: int) -> None:
+    import httpx
+    from backend.app import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        first_line = None
+        ok = errors = 0
+        async with client.stream("POST", "/api/init/batch", json={"phones": phones}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                if first_line is None:
+                    first_line = time.perf_counter() - started
+                if "session_id" in json.loads(line):
+                    ok += 1
+                else:
+                    errors += 1
+        batch_s = time.perf_counter() - started
+        print(f"/api/init/batch: {ok} sessions ({errors} errors) in {batch_s:.2f}s "
+              f"({ok / batch_s:,.0f}/s), first line after {first_line * 1000:.0f} ms")
+
+        sample = phones[:compare]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def init_one(phone):
+            async with semaphore:
+                response = await client.post("/api/init", json={"phone": phone})
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(init_one(phone) for phone in sample))
+        single_s = time.perf_counter() - started
+        rate = len(sample) / single_s
+        print(f"/api/init x {len(sample)}: {single_s:.2f}s ({rate:,.0f}/s), "
+              f"~{len(phones) / rate:.1f}s for {len(phones)} phones")
+        print(f"speedup: {(len(phones) / rate) / batch_s:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phones", type=int, default=10_000)
+    parser.add_argument("--compare", type=int, default=500, help="Phones to run through /api/init one by one")
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        book_path = os.path.join(tmp, "customer_book.bin")
+        build_book(synthetic_accounts(args.phones), book_path)
+        # Must be set before the backend (and src.data) is imported
+        os.environ["CUSTOMER_BOOK_PATH"] = book_path
+        os.environ.setdefault("RECORD_STORE", "memory")
+        os.environ.setdefault("SESSION_MAX_ENTRIES", str(args.phones + args.compare))
+
+        phones = [f"+9190{i:08d}" for i in range(args.phones)]
+        asyncio.run(run(phones, args.compare, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# scripts/bench_init_crm.py
+
+"""
+/api/init throughput against a slow CRM.
+
+Starts scripts/stub_crm.py with the given latency, points the backend at it
+via CRM_BASE_URL and drives concurrent /api/init calls in-process. Because
+the CRM lookup is awaited, the event loop keeps serving other sessions while
+a lookup is on the wire, and repeat phones are served from the cache.
+
+Usage:
+    python scripts/bench_init_crm.py --requests 2000 --concurrency 200 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+PHONES = ["+919876543210", "+919876543211", "+919876543212", "+910000000000"]
+
+
+def start_stub(port: int, latency_ms: float) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(project_root, "scripts", "stub_crm.py"),
+         "--port", str(port), "--latency-ms", str(latency_ms)],
+    )
+    import httpx
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("Stub CRM did not start")
+
+
+async def run(requests: int, concurrency: int) -> None:
+    import httpx
+    from backend.app import app
+    from src.crm import get_crm_client, close_crm_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: dict[int, int] = {}
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/init", json={"phone": PHONES[i % len(PHONES)]})
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{requests} inits in {elapsed:.2f}s ({requests / elapsed:,.0f}/s)")
+    print(f"  p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    print(f"  statuses: {statuses}")
+    print(f"  cache: {getattr(get_crm_client(), 'stats', {})}")
+    await close_crm_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=9077)
+    parser.add_argument("--no-cache", action="store_true", help="Expire cache entries immediately")
+    args = parser.parse_args()
+
+    os.environ["CRM_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("RECORD_STORE", "memory")
+    if args.no_cache:
+        os.environ["CRM_CACHE_TTL_S"] = os.environ["CRM_NEGATIVE_TTL_S"] = "0"
+
+    stub = start_stub(args.port, args.latency_ms)
+    try:
+        asyncio.run(run(args.requests, args.concurrency))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# scripts/bench_logging.py
+
+"""
+Turn latency with logging enabled.
+
+Runs the async graph benchmark (scripts/bench_async_graph.py, mock LLM) under
+several logging setups, all writing to the same sink:
+
+  sync-debug   every DEBUG line formatted and written on the calling
+               thread (what the old print() calls did)
+  queue-debug  src/utils/log.py at DEBUG: queued, written by the listener
+  queue-info   src/utils/log.py at INFO (the default)
+  queue-sample src/utils/log.py at DEBUG with LOG_DEBUG_SAMPLE=0.05
+
+--micro skips the graph and times single log calls from many threads, to
+show the per-call cost on the caller and its tail.
+
+Usage:
+    python scripts/bench_logging.py --conversations 200 --llm-latency-ms 50
+    python scripts/bench_logging.py --micro --sink /tmp/bench.log
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.utils import log
+
+
+MODES = ("sync-debug", "queue-debug", "queue-info", "queue-sample")
+
+
+def configure(mode: str, stream) -> None:
+    """Set up the "src"/"backend" loggers for one benchmark mode."""
+    log.shutdown_logging()
+    if mode == "sync-debug":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(log.JsonFormatter())
+        for name in log.LOGGERS:
+            logger = logging.getLogger(name)
+            logger.handlers = [handler]
+            logger.setLevel("DEBUG")
+            logger.propagate = False
+        return
+    log.LOG_DEBUG_SAMPLE = 0.05 if mode == "queue-sample" else 1.0
+    log.configure_logging(level="INFO" if mode == "queue-info" else "DEBUG", fmt="json", stream=stream)
+
+
+def run_graph(args, stream) -> list[dict]:
+    from bench_async_graph import MockGeminiModel, run_level
+    from src.utils import llm
+
+    llm._model_cache = MockGeminiModel(args.llm_latency_ms / 1000)
+    results = []
+    for mode in MODES:
+        configure(mode, stream)
+        result = asyncio.run(run_level(args.conversations))
+        log.shutdown_logging()
+        results.append({"mode": mode, **result})
+    return results
+
+
+def run_micro(args, stream) -> list[dict]:
+    results = []
+    for mode in MODES:
+        configure(mode, stream)
+        logger = log.get_logger("src.bench")
+        timings = [[] for _ in range(args.threads)]
+
+        def worker(out: list) -> None:
+            with log.log_context(session_id="bench"):
+                for i in range(args.calls):
+                    started = time.perf_counter()
+                    logger.debug("Checking plan %d: %r / %r", i, "3-month installment", "pay 15,000 per month")
+                    out.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(out,)) for out in timings]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        log.shutdown_logging()
+
+        calls = sorted(t for out in timings for t in out)
+        results.append({
+            "mode": mode,
+            "elapsed_s": elapsed,
+            "p50_us": statistics.median(calls) * 1e6,
+            "p99_us": calls[int(len(calls) * 0.99) - 1] * 1e6,
+            "dropped": log._handler.dropped if mode != "sync-debug" and log._handler else 0,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=200, help="concurrent conversations")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="mock Gemini latency per call")
+    parser.add_argument("--micro", action="store_true", help="time single log calls instead of graph turns")
+    parser.add_argument("--threads", type=int, default=8, help="--micro: logging threads")
+    parser.add_argument("--calls", type=int, default=20000, help="--micro: log calls per thread")
+    parser.add_argument("--sink", help="file the log lines go to (default: a temp file)")
+    args = parser.parse_args()
+
+    sink = args.sink or os.path.join(tempfile.gettempdir(), "bench_logging.log")
+    with open(sink, "w", encoding="utf-8") as stream:
+        results = run_micro(args, stream) if args.micro else run_graph(args, stream)
+    print(f"Log lines written to {sink} ({os.path.getsize(sink) / 1e6:.1f} MB)")
+
+    if args.micro:
+        print(f"{args.threads} threads x {args.calls} DEBUG calls")
+        print(f"{'mode':>13} {'elapsed s':>10} {'p50 us':>8} {'p99 us':>8} {'dropped':>8}")
+        for r in results:
+            print(f"{r['mode']:>13} {r['elapsed_s']:>10.2f} {r['p50_us']:>8.1f} {r['p99_us']:>8.1f} {r['dropped']:>8}")
+        return
+
+    print(f"{args.conversations} concurrent conversations, mock LLM latency {args.llm_latency_ms:.0f} ms")
+    print(f"{'mode':>13} {'turns/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for r in results:
+        print(f"{r['mode']:>13} {r['turns_per_s']:>10.1f} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
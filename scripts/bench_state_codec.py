@@ -0,0 +1,117 @@
+# scripts/bench_state_codec.py
+
+"""
+Memory-per-session and encode/decode throughput for CallState forms.
+
+Builds realistic 50-turn sessions (100 messages, offered plans, PTP
+fields) and compares:
+  - plain dict (what session_store used to hold)
+  - CompactCallState (slotted, interned, tuple messages)
+  - encode_state() bytes
+plus codec throughput against json and pickle.
+
+Usage:
+    python scripts/bench_state_codec.py --sessions 2000
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.state import create_initial_state
+from src.codec import CompactCallState, encode_state, decode_state
+
+
+PHONES = ["+919876543210", "+919876543211", "+919876543212"]
+
+
+def build_session(index: int, turns: int = 50) -> dict:
+    state = create_initial_state(PHONES[index % len(PHONES)])
+    for turn in range(turns):
+        state["messages"].append({
+            "role": "assistant",
+            "content": f"Turn {turn}: could you confirm which payment plan and date work for you, {state['customer_name']}?",
+        })
+        state["messages"].append({
+            "role": "user",
+            "content": f"Let me think about option {turn % 3 + 1}, maybe I can pay on the {turn % 28 + 1}th.",
+        })
+    state["stage"] = "negotiation"
+    state["payment_status"] = "willing"
+    state["turn_count"] = turns
+    state["has_greeted"] = state["has_disclosed"] = state["is_verified"] = True
+    state["offered_plans"] = [
+        {"name": "Immediate Settlement", "description": "Pay ₹42,750 (5% discount) in full within 7 days"},
+        {"name": "3-Month Installment", "description": "Pay ₹15,000 per month for 3 months"},
+        {"name": "6-Month Installment", "description": "Pay ₹7,500 per month for 6 months"},
+    ]
+    return state
+
+
+def measure_memory(build, count: int) -> float:
+    """Average bytes retained per session for objects produced by build()."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    held = [build(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del held
+    return total / count
+
+
+def measure_throughput(encode, decode, states: list) -> tuple[float, float, float]:
+    started = time.perf_counter()
+    blobs = [encode(state) for state in states]
+    encode_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for blob in blobs:
+        decode(blob)
+    decode_s = time.perf_counter() - started
+
+    avg_size = sum(len(blob) for blob in blobs) / len(blobs)
+    return len(states) / encode_s, len(states) / decode_s, avg_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    templates = [build_session(i, args.turns) for i in range(len(PHONES))]
+
+    def copy_session(i):
+        return json.loads(json.dumps(templates[i % len(templates)]))
+
+    print(f"Memory per {args.turns}-turn session ({args.sessions} sessions):")
+    dict_bytes = measure_memory(copy_session, args.sessions)
+    compact_bytes = measure_memory(lambda i: CompactCallState.from_dict(copy_session(i)), args.sessions)
+    encoded_bytes = measure_memory(lambda i: encode_state(copy_session(i)), args.sessions)
+    print(f"  dict              {dict_bytes:>10,.0f} B")
+    print(f"  CompactCallState  {compact_bytes:>10,.0f} B  ({compact_bytes / dict_bytes:.0%} of dict)")
+    print(f"  encoded bytes     {encoded_bytes:>10,.0f} B  ({encoded_bytes / dict_bytes:.0%} of dict)")
+
+    states = [copy_session(i) for i in range(args.sessions)]
+    codecs = {
+        "binary codec": (encode_state, decode_state),
+        "json": (lambda s: json.dumps(s).encode(), json.loads),
+        "pickle": (lambda s: pickle.dumps(s, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+    }
+    print("\nCodec throughput:")
+    print(f"  {'codec':<14} {'encode/s':>10} {'decode/s':>10} {'avg bytes':>10}")
+    for name, (encode, decode) in codecs.items():
+        enc_rate, dec_rate, size = measure_throughput(encode, decode, states)
+        print(f"  {name:<14} {enc_rate:>10,.0f} {dec_rate:>10,.0f} {size:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
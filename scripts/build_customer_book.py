@@ -0,0 +1,82 @@
+# scripts/build_customer_book.py
+
+"""
+Compile a customer + loan export into a memory-mapped customer book.
+
+Input is a CSV export with one row per account:
+    customer_id,name,dob,phone,loan_id,loan_type,principal,outstanding,emi,due_date,days_past_due
+Loan columns may be empty for customers without a loan. Without --csv,
+the mock data in src/data.py is compiled.
+
+Usage:
+    python scripts/build_customer_book.py --csv accounts.csv --out data/customer_book.bin
+    CUSTOMER_BOOK_PATH=data/customer_book.bin uvicorn backend.app:app
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.customer_book import build_book, CustomerBook
+from src.data import CUSTOMERS, LOANS
+
+
+def _number(value: str):
+    if value in ("", None):
+        return None
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def read_csv(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            customer = {
+                "id": row["customer_id"],
+                "name": row["name"],
+                "dob": row["dob"],
+                "phone": row["phone"],
+            }
+            loan = None
+            if row.get("loan_id"):
+                loan = {
+                    "id": row["loan_id"],
+                    "type": row["loan_type"],
+                    "principal": _number(row["principal"]),
+                    "outstanding": _number(row["outstanding"]),
+                    "emi": _number(row["emi"]),
+                    "due_date": row["due_date"],
+                    "days_past_due": int(row["days_past_due"] or 0),
+                }
+            yield customer, loan
+
+
+def read_mock_data():
+    for customer in CUSTOMERS.values():
+        yield customer, LOANS.get(customer["id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="account export (defaults to the mock data)")
+    parser.add_argument("--out", required=True, help="output snapshot path")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records = read_csv(args.csv) if args.csv else read_mock_data()
+    rows = build_book(records, args.out)
+    elapsed = time.perf_counter() - started
+
+    book = CustomerBook(args.out)
+    size = os.path.getsize(args.out)
+    print(f"✅ Wrote {rows:,} accounts to {args.out} ({size:,} bytes) in {elapsed:.2f}s")
+    book.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# scripts/stub_crm.py
+
+"""
+Local stub CRM for latency testing.
+
+Serves GET /customers/{phone} and POST /customers/lookup (bulk) from
+src/data.py (mock data, or the mmap book when CUSTOMER_BOOK_PATH is set)
+after an artificial delay, in the shape HttpCRMClient expects.
+
+Usage:
+    python scripts/stub_crm.py --port 9000 --latency-ms 200 --jitter-ms 50
+    CRM_BASE_URL=http://localhost:9000 uvicorn backend.app:app
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from fastapi import Body, FastAPI, HTTPException
+
+from src.data import get_customer_with_loan
+
+
+def create_app(latency_ms: float = 0.0, jitter_ms: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Stub CRM")
+    app.state.requests = 0
+
+    @app.get("/customers/{phone}")
+    async def get_customer(phone: str):
+        app.state.requests += 1
+        delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        data = get_customer_with_loan(phone)
+        if not data:
+            raise HTTPException(status_code=404, detail=f"Unknown phone {phone}")
+        return data
+
+    @app.post("/customers/lookup")
+    async def lookup_customers(phones: list[str] = Body(..., embed=True)):
+        app.state.requests += 1
+        delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        return {"results": {phone: get_customer_with_loan(phone) for phone in phones}}
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("CRM_STUB_LATENCY_MS", "100")))
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
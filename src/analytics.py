@@ -0,0 +1,249 @@
+# src/analytics.py
+
+"""
+Outcome analytics for dashboards.
+
+Counters and daily rollups of committed call records and PTPs:
+  - calls by call outcome and by payment status
+  - calls per day, by outcome
+  - PTP count and amount, by promised payment date
+  - verification-failure rate
+
+The record store is the source of truth, and with SQLite it is shared by
+every worker. Before each read the counters fold in the records committed
+since the previous one (RecordStore.changes()), by any worker, so all
+workers report the same numbers and a read never scans the whole store.
+
+rebuild() recomputes everything from the record store in one pass; it uses
+NumPy group-bys when NumPy is installed.
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from src.records import get_record_store
+from src.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+VERIFICATION_FAILED = "verification_failed"
+UNKNOWN_DAY = "unknown"
+
+# Record kinds the stats are computed from
+STATS_KINDS = ("call", "ptp")
+
+
+def record_day(record: dict) -> str:
+    """The YYYY-MM-DD bucket of a record's recorded_at timestamp."""
+    recorded_at = record.get("recorded_at")
+    return recorded_at[:10] if recorded_at else UNKNOWN_DAY
+
+
+class OutcomeStats:
+    """
+    Pre-aggregated outcome counters. Thread-safe.
+    `cursor` is the record store position the counters are current to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.calls_total = 0
+        self.by_outcome: Counter = Counter()
+        self.by_payment_status: Counter = Counter()
+        self.calls_by_day: dict[str, Counter] = {}
+        self.ptp_total = 0
+        self.ptp_amount_total = 0.0
+        self.ptp_by_date: dict[str, list] = {}  # promised date -> [count, amount]
+        self.cursor = 0
+        self._version = 0
+        self._snapshot: Optional[tuple[int, dict]] = None
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def _add_call(self, record: dict) -> None:
+        outcome = record.get("outcome") or "unknown"
+        self.calls_total += 1
+        self.by_outcome[outcome] += 1
+        self.by_payment_status[record.get("payment_status") or "unknown"] += 1
+        self.calls_by_day.setdefault(record_day(record), Counter())[outcome] += 1
+
+    def _add_ptp(self, record: dict) -> None:
+        amount = float(record.get("amount") or 0)
+        self.ptp_total += 1
+        self.ptp_amount_total += amount
+        bucket = self.ptp_by_date.setdefault(record.get("date") or UNKNOWN_DAY, [0, 0.0])
+        bucket[0] += 1
+        bucket[1] += amount
+
+    def catch_up(self, store) -> int:
+        """Fold in records committed to `store` since `cursor`. Returns how many."""
+        with self._lock:
+            self.cursor, changes = store.changes(STATS_KINDS, self.cursor)
+            for kind, record in changes:
+                if kind == "call":
+                    self._add_call(record)
+                else:
+                    self._add_ptp(record)
+            if changes:
+                self._version += 1
+        return len(changes)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        """
+        Current aggregates as a JSON-ready dict.
+        Built once per change and reused, so repeated reads cost O(1).
+        """
+        with self._lock:
+            if self._snapshot is not None and self._snapshot[0] == self._version:
+                return self._snapshot[1]
+            failed = self.by_outcome.get(VERIFICATION_FAILED, 0)
+            result = {
+                "calls_total": self.calls_total,
+                "by_outcome": dict(self.by_outcome),
+                "by_payment_status": dict(self.by_payment_status),
+                "verification_failure_rate": failed / self.calls_total if self.calls_total else 0.0,
+                "calls_by_day": {day: dict(counts) for day, counts in sorted(self.calls_by_day.items())},
+                "ptp": {
+                    "count": self.ptp_total,
+                    "amount_total": self.ptp_amount_total,
+                    "by_date": {
+                        date: {"count": count, "amount": amount}
+                        for date, (count, amount) in sorted(self.ptp_by_date.items())
+                    },
+                },
+            }
+            self._snapshot = (self._version, result)
+            return result
+
+    # ------------------------------------------------------------------
+    # Backfill
+    # ------------------------------------------------------------------
+
+    def rebuild(self, calls: list[dict], ptps: list[dict], cursor: int = 0) -> None:
+        """
+        Replace all aggregates with ones computed from full record lists,
+        which cover the record store up to `cursor`.
+        """
+        with self._lock:
+            self._rebuild_locked(calls, ptps, cursor)
+
+    def rebuild_from(self, store) -> tuple[int, int]:
+        """
+        Recompute from every call and PTP in `store`. The lock is held from
+        the read to the swap, so records committed meanwhile are folded in
+        by the next catch_up(), neither lost nor counted twice.
+        Returns (calls, PTPs).
+        """
+        with self._lock:
+            cursor, changes = store.changes(STATS_KINDS)
+            calls = [record for kind, record in changes if kind == "call"]
+            ptps = [record for kind, record in changes if kind == "ptp"]
+            self._rebuild_locked(calls, ptps, cursor)
+        return len(calls), len(ptps)
+
+    def _rebuild_locked(self, calls: list[dict], ptps: list[dict], cursor: int) -> None:
+        group = _group_numpy if np is not None else _group_python
+
+        outcomes = [c.get("outcome") or "unknown" for c in calls]
+        statuses = [c.get("payment_status") or "unknown" for c in calls]
+        days = [record_day(c) for c in calls]
+        ptp_dates = [p.get("date") or UNKNOWN_DAY for p in ptps]
+        ptp_amounts = [float(p.get("amount") or 0) for p in ptps]
+
+        by_outcome = group(outcomes)
+        by_payment_status = group(statuses)
+        by_day_outcome = group([f"{day}|{outcome}" for day, outcome in zip(days, outcomes)])
+        ptp_counts = group(ptp_dates)
+        ptp_sums = group(ptp_dates, ptp_amounts)
+
+        calls_by_day: dict[str, Counter] = {}
+        for key, count in by_day_outcome.items():
+            day, outcome = key.split("|", 1)
+            calls_by_day.setdefault(day, Counter())[outcome] = count
+
+        version = self._version
+        self._reset()
+        self._version = version + 1
+        self.cursor = cursor
+        self.calls_total = len(calls)
+        self.by_outcome = Counter(by_outcome)
+        self.by_payment_status = Counter(by_payment_status)
+        self.calls_by_day = calls_by_day
+        self.ptp_total = len(ptps)
+        self.ptp_amount_total = float(sum(ptp_sums.values()))
+        self.ptp_by_date = {date: [ptp_counts[date], ptp_sums[date]] for date in ptp_counts}
+
+
+def _group_numpy(keys: list[str], weights: Optional[list[float]] = None) -> dict:
+    """Count (or sum weights) per key with a vectorized group-by."""
+    if not keys:
+        return {}
+    unique, inverse = np.unique(np.asarray(keys, dtype=str), return_inverse=True)
+    if weights is None:
+        totals = np.bincount(inverse, minlength=len(unique))
+        return {str(k): int(v) for k, v in zip(unique, totals)}
+    totals = np.bincount(inverse, weights=np.asarray(weights, dtype=np.float64), minlength=len(unique))
+    return {str(k): float(v) for k, v in zip(unique, totals)}
+
+
+def _group_python(keys: list[str], weights: Optional[list[float]] = None) -> dict:
+    if weights is None:
+        return dict(Counter(keys))
+    totals: dict[str, float] = {}
+    for key, weight in zip(keys, weights):
+        totals[key] = totals.get(key, 0.0) + weight
+    return totals
+
+
+# =========================
+# Process-wide stats
+# =========================
+_stats: Optional[OutcomeStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_outcome_stats() -> OutcomeStats:
+    """
+    Return the process-wide stats, backfilled from the record store on
+    first use and caught up with it on every call. Reads the store: call
+    it from a worker thread in async code.
+    """
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                stats = OutcomeStats()
+                rebuild_from_store(stats)
+                _stats = stats
+    _stats.catch_up(get_record_store())
+    return _stats
+
+
+def rebuild_from_store(stats: Optional[OutcomeStats] = None) -> OutcomeStats:
+    """Recompute aggregates from every call and PTP record in the store."""
+    stats = stats or get_outcome_stats()
+    started = time.perf_counter()
+    calls, ptps = stats.rebuild_from(get_record_store())
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Stats rebuilt from %d calls and %d PTPs in %.2fs (%s)",
+        calls, ptps, elapsed, "numpy" if np is not None else "python",
+    )
+    return stats
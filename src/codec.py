@@ -0,0 +1,407 @@
+# src/codec.py
+
+"""
+Compact in-memory form and versioned binary codec for CallState.
+
+- CompactCallState: slotted record with interned stage/status literals and
+  messages held as (role, content) tuples instead of dicts.
+- encode_state / decode_state: lossless binary encoding for external stores.
+- estimate_size / estimate_messages_size: encoded length without
+  building the blob.
+- state_delta / apply_delta: the change between two versions of a state,
+  as compact JSON, for the session journal.
+
+Binary layout (v2, little-endian):
+    b"CS" | u8 version | u64 absent mask | u64 none mask | u64 bool mask
+    then each present, non-None, non-bool field in schema order:
+        str   -> u32 length + utf-8
+        num   -> u8 tag ('i' or 'd') + i64 / f64, so ints stay ints
+        int   -> i64
+        msgs  -> u32 count + per message: u8 role code + str
+                 (role code 255 = message dict with extra keys, as JSON)
+        json  -> str of compact JSON
+    then a trailing JSON object holding keys outside the schema.
+"""
+
+import json
+import struct
+import sys
+from typing import Optional
+
+from src.state import CallState
+
+
+MAGIC = b"CS"
+VERSION = 2
+
+ROLES = ("assistant", "user", "system")
+_RAW_MESSAGE = 255
+
+# (field, kind) in encoding order. Append-only: new fields go in a new
+# schema version so older blobs stay decodable.
+SCHEMA_V1 = (
+    ("messages", "msgs"),
+    ("stage", "str"),
+    ("turn_count", "int"),
+    ("last_user_input", "str"),
+    ("awaiting_user", "bool"),
+    ("has_greeted", "bool"),
+    ("has_disclosed", "bool"),
+    ("customer_id", "str"),
+    ("customer_name", "str"),
+    ("customer_phone", "str"),
+    ("customer_dob", "str"),
+    ("loan_id", "str"),
+    ("loan_type", "str"),
+    ("outstanding_amount", "num"),
+    ("days_past_due", "int"),
+    ("verification_attempts", "int"),
+    ("is_verified", "bool"),
+    ("payment_status", "str"),
+    ("ptp_amount", "num"),
+    ("ptp_date", "str"),
+    ("ptp_id", "str"),
+    ("dispute_reason", "str"),
+    ("dispute_id", "str"),
+    ("offered_plans", "json"),
+    ("selected_plan", "json"),
+    ("turn_analysis", "json"),
+    ("call_outcome", "str"),
+    ("call_summary", "str"),
+    ("is_complete", "bool"),
+)
+
+# v2: bounded history (src/memory.py)
+SCHEMA_V2 = SCHEMA_V1 + (
+    ("call_id", "str"),
+    ("history_summary", "json"),
+    ("archived_message_count", "int"),
+)
+
+SCHEMAS = {1: SCHEMA_V1, 2: SCHEMA_V2}
+FIELDS = tuple(name for name, _ in SCHEMAS[VERSION])
+_FIELD_SET = frozenset(FIELDS)
+
+# Low-cardinality string fields worth interning so sessions share them
+_INTERNED_FIELDS = frozenset({"stage", "payment_status", "call_outcome", "loan_type"})
+
+_HEADER = struct.Struct("<2sBQQQ")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_I64 = struct.Struct("<q")
+_U8 = struct.Struct("<B")
+
+
+class CodecError(ValueError):
+    """Raised when a blob is not a valid encoded CallState."""
+
+
+# =========================
+# Compact in-memory form
+# =========================
+class CompactCallState:
+    """
+    Slotted, memory-lean representation of a CallState.
+    Keys that were absent from the source dict stay unset.
+    """
+
+    __slots__ = FIELDS + ("extras",)
+
+    @classmethod
+    def from_dict(cls, state: CallState) -> "CompactCallState":
+        compact = cls()
+        for name in FIELDS:
+            if name not in state:
+                continue
+            value = state[name]
+            if name == "messages":
+                value = tuple(_compact_message(msg) for msg in value)
+            elif name in _INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(compact, name, value)
+        extras = {key: value for key, value in state.items() if key not in _FIELD_SET}
+        compact.extras = extras or None
+        return compact
+
+    def to_dict(self) -> CallState:
+        state = {}
+        for name in FIELDS:
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+            if name == "messages":
+                value = [_expand_message(msg) for msg in value]
+            elif isinstance(value, (dict, list)):
+                # JSON fields (offered_plans, turn_analysis, ...): callers
+                # may mutate the dict they get back, never the stored copy
+                value = _copy_json(value)
+            state[name] = value
+        if self.extras:
+            state.update({key: _copy_json(value) for key, value in self.extras.items()})
+        return state
+
+
+def _compact_message(msg: dict):
+    if len(msg) == 2 and "role" in msg and "content" in msg:
+        return (sys.intern(msg["role"]), msg["content"])
+    # Unusual message shape: keep the dict itself
+    return dict(msg)
+
+
+def _expand_message(msg) -> dict:
+    if isinstance(msg, tuple):
+        return {"role": msg[0], "content": msg[1]}
+    return dict(msg)
+
+
+def _copy_json(value):
+    """Copy the containers of a JSON-shaped value; leaves are immutable."""
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+# =========================
+# Binary codec
+# =========================
+def encode_state(state: CallState) -> bytes:
+    """Encode a CallState dict (or CompactCallState) into bytes."""
+    if isinstance(state, CompactCallState):
+        state = state.to_dict()
+
+    absent_mask = none_mask = bool_mask = 0
+    body = bytearray()
+
+    for bit, (name, kind) in enumerate(SCHEMAS[VERSION]):
+        if name not in state:
+            absent_mask |= 1 << bit
+            continue
+        value = state[name]
+        if value is None:
+            none_mask |= 1 << bit
+        elif kind == "bool":
+            if value:
+                bool_mask |= 1 << bit
+        elif kind == "str":
+            _put_str(body, value)
+        elif kind == "num":
+            if isinstance(value, int):
+                body += b"i" + _I64.pack(value)
+            else:
+                body += b"d" + _F64.pack(value)
+        elif kind == "int":
+            body += _I64.pack(value)
+        elif kind == "msgs":
+            _put_messages(body, value)
+        else:
+            _put_str(body, json.dumps(value, separators=(",", ":"), ensure_ascii=False))
+
+    extras = {key: value for key, value in state.items() if key not in _FIELD_SET}
+    _put_str(body, json.dumps(extras, separators=(",", ":"), ensure_ascii=False) if extras else "")
+
+    return _HEADER.pack(MAGIC, VERSION, absent_mask, none_mask, bool_mask) + bytes(body)
+
+
+def estimate_size(state: CallState) -> int:
+    """
+    len(encode_state(state)), counting characters rather than UTF-8 bytes,
+    so exact for ASCII text. For memory accounting, where encoding every
+    state just to measure it would cost as much as storing it.
+    """
+    size = _HEADER.size
+    for name, kind in SCHEMAS[VERSION]:
+        value = state.get(name)
+        if value is None or kind == "bool":
+            continue
+        if kind == "str":
+            size += 4 + len(value)
+        elif kind == "num":
+            size += 9
+        elif kind == "int":
+            size += 8
+        elif kind == "msgs":
+            size += 4 + estimate_messages_size(value)
+        else:
+            size += 4 + len(json.dumps(value, separators=(",", ":"), ensure_ascii=False))
+    extras = {key: value for key, value in state.items() if key not in _FIELD_SET}
+    return size + 4 + (len(json.dumps(extras, separators=(",", ":"), ensure_ascii=False)) if extras else 0)
+
+
+def estimate_messages_size(messages: list[dict]) -> int:
+    """Encoded length of messages (without the count), as estimate_size()."""
+    size = 0
+    for msg in messages:
+        content = msg.get("content")
+        if len(msg) == 2 and msg.get("role") in ROLES and isinstance(content, str):
+            size += 5 + len(content)
+        else:
+            size += 5 + len(json.dumps(msg, separators=(",", ":"), ensure_ascii=False))
+    return size
+
+
+def decode_state(data: bytes) -> CallState:
+    """Decode bytes produced by encode_state() back into a CallState dict."""
+    view = memoryview(data)
+    if len(view) < _HEADER.size:
+        raise CodecError("Truncated CallState blob")
+
+    magic, version, absent_mask, none_mask, bool_mask = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise CodecError("Not an encoded CallState")
+    schema = SCHEMAS.get(version)
+    if schema is None:
+        raise CodecError(f"Unsupported CallState codec version {version}")
+
+    state = {}
+    pos = _HEADER.size
+    try:
+        for bit, (name, kind) in enumerate(schema):
+            flag = 1 << bit
+            if absent_mask & flag:
+                continue
+            if none_mask & flag:
+                state[name] = None
+            elif kind == "bool":
+                state[name] = bool(bool_mask & flag)
+            elif kind == "str":
+                value, pos = _get_str(view, pos)
+                state[name] = sys.intern(value) if name in _INTERNED_FIELDS else value
+            elif kind == "num":
+                number = _I64 if view[pos] == ord("i") else _F64
+                state[name] = number.unpack_from(view, pos + 1)[0]
+                pos += 9
+            elif kind == "int":
+                state[name] = _I64.unpack_from(view, pos)[0]
+                pos += 8
+            elif kind == "msgs":
+                state[name], pos = _get_messages(view, pos)
+            else:
+                raw, pos = _get_str(view, pos)
+                state[name] = json.loads(raw)
+
+        extras, pos = _get_str(view, pos)
+    except (struct.error, IndexError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise CodecError(f"Corrupt CallState blob: {e}") from e
+
+    if extras:
+        state.update(json.loads(extras))
+    return state
+
+
+def _put_str(buf: bytearray, value: str) -> None:
+    raw = value.encode("utf-8")
+    buf += _U32.pack(len(raw))
+    buf += raw
+
+
+def _get_str(view: memoryview, pos: int) -> tuple[str, int]:
+    (length,) = _U32.unpack_from(view, pos)
+    pos += 4
+    end = pos + length
+    if end > len(view):
+        raise struct.error("string runs past end of blob")
+    return str(view[pos:end], "utf-8"), end
+
+
+def _put_messages(buf: bytearray, messages: list) -> None:
+    buf += _U32.pack(len(messages))
+    for msg in messages:
+        if isinstance(msg, tuple):
+            msg = {"role": msg[0], "content": msg[1]}
+        role = msg.get("role")
+        if len(msg) == 2 and role in ROLES and isinstance(msg.get("content"), str):
+            buf += _U8.pack(ROLES.index(role))
+            _put_str(buf, msg["content"])
+        else:
+            buf += _U8.pack(_RAW_MESSAGE)
+            _put_str(buf, json.dumps(msg, separators=(",", ":"), ensure_ascii=False))
+
+
+def _get_messages(view: memoryview, pos: int) -> tuple[list, int]:
+    (count,) = _U32.unpack_from(view, pos)
+    pos += 4
+    messages = []
+    for _ in range(count):
+        code = view[pos]
+        pos += 1
+        content, pos = _get_str(view, pos)
+        if code == _RAW_MESSAGE:
+            messages.append(json.loads(content))
+        else:
+            messages.append({"role": ROLES[code], "content": content})
+    return messages, pos
+
+
+# =========================
+# State deltas
+# =========================
+_MISSING = object()
+
+
+def state_delta(old: CallState, new: CallState) -> Optional[dict]:
+    """
+    Describe how `new` differs from `old`:
+        {"set": {key: value}, "unset": [key],
+         "drop": n, "append": [message]}   messages dropped from the front
+                                           (history compaction) and added
+    Returns None if the messages changed in some other way, in which case
+    the caller stores the full state instead.
+    """
+    delta = {}
+    changed = {
+        key: value for key, value in new.items()
+        if key != "messages" and old.get(key, _MISSING) != value
+    }
+    if changed:
+        delta["set"] = changed
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta["unset"] = removed
+
+    old_messages, new_messages = old.get("messages", []), new.get("messages", [])
+    if ("messages" in old) != ("messages" in new):
+        return None
+    drop = _dropped_prefix(old_messages, new_messages)
+    if drop is None:
+        return None
+    if drop:
+        delta["drop"] = drop
+    appended = new_messages[len(old_messages) - drop:]
+    if appended:
+        delta["append"] = appended
+    return delta
+
+
+def _dropped_prefix(old: list, new: list) -> Optional[int]:
+    # Smallest n such that new starts with old[n:]; usually 0
+    for drop in range(len(old) + 1):
+        kept = len(old) - drop
+        if kept <= len(new) and old[drop:] == new[:kept]:
+            return drop
+    return None
+
+
+def apply_delta(state: CallState, delta: dict) -> CallState:
+    """Apply a state_delta() result to `state` in place and return it."""
+    for key in delta.get("unset", ()):
+        state.pop(key, None)
+    state.update(delta.get("set", {}))
+    if "drop" in delta or "append" in delta:
+        messages = state.get("messages", [])[delta.get("drop", 0):]
+        messages.extend(delta.get("append", ()))
+        state["messages"] = messages
+    return state
+
+
+def encode_delta(delta: dict) -> bytes:
+    return json.dumps(delta, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def decode_delta(data: bytes) -> dict:
+    try:
+        return json.loads(bytes(data))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise CodecError(f"Corrupt state delta: {e}") from e
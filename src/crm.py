@@ -0,0 +1,292 @@
+# src/crm.py
+
+"""
+Async CRM adapter behind customer/loan lookups.
+
+- LocalCRMClient: serves from src/data.py (mock dicts or the mmap book).
+- HttpCRMClient: talks to a CRM over HTTP with a pooled httpx client.
+  Expects GET {base_url}/customers/{phone} -> {"customer": ..., "loan": ...}
+  and 404 for unknown phones, and POST {base_url}/customers/lookup
+  {"phones": [...]} -> {"results": {phone: {...} | null}} for bulk lookups
+  (see scripts/stub_crm.py).
+- CachedCRMClient: TTL cache in front of any client, with negative caching
+  for unknown phones and request coalescing, so concurrent lookups of the
+  same phone share one upstream call. Phones that don't normalize to E.164
+  are unknown without a lookup.
+
+CRM_BASE_URL selects the HTTP client; otherwise the local data is used.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import quote
+
+from src.customer_book import normalize_phone
+from src.data import get_customer_with_loan
+
+
+class CRMError(RuntimeError):
+    """Raised when the CRM can't answer (network error, 5xx, bad payload)."""
+
+
+class CRMClient:
+    """Interface for async customer/loan lookups."""
+
+    async def get_customer_with_loan(self, phone: str) -> Optional[dict]:
+        """Return {"customer": ..., "loan": ...} or None if unknown."""
+        raise NotImplementedError
+
+    async def get_many(self, phones: list[str]) -> dict[str, Optional[dict]]:
+        """Bulk lookup: phone -> result (None if unknown), keyed as given."""
+        results = await asyncio.gather(*(self.get_customer_with_loan(phone) for phone in phones))
+        return dict(zip(phones, results))
+
+    async def close(self) -> None:
+        """Release connections."""
+
+
+class LocalCRMClient(CRMClient):
+    """Lookups against the in-process data (dicts or mmap book)."""
+
+    async def get_customer_with_loan(self, phone: str) -> Optional[dict]:
+        return get_customer_with_loan(phone)
+
+    async def get_many(self, phones: list[str]) -> dict[str, Optional[dict]]:
+        return {phone: get_customer_with_loan(phone) for phone in phones}
+
+
+class HttpCRMClient(CRMClient):
+    """HTTP CRM client with connection pooling and keep-alive."""
+
+    def __init__(self, base_url: str, timeout: float = 5.0, max_connections: int = 100):
+        import httpx
+
+        self._httpx = httpx
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def get_customer_with_loan(self, phone: str) -> Optional[dict]:
+        # Only well-formed numbers reach the URL, escaped as one path segment
+        phone = normalize_phone(phone)
+        if phone is None:
+            return None
+        try:
+            response = await self._client.get(f"/customers/{quote(phone, safe='')}")
+        except self._httpx.HTTPError as e:
+            raise CRMError(f"CRM request failed: {e}") from e
+
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise CRMError(f"CRM returned {response.status_code} for {phone}")
+
+        data = response.json()
+        if "customer" not in data:
+            raise CRMError(f"Unexpected CRM payload for {phone}")
+        return data
+
+    async def get_many(self, phones: list[str]) -> dict[str, Optional[dict]]:
+        try:
+            response = await self._client.post("/customers/lookup", json={"phones": phones})
+        except self._httpx.HTTPError as e:
+            raise CRMError(f"CRM bulk request failed: {e}") from e
+
+        if response.status_code != 200:
+            raise CRMError(f"CRM returned {response.status_code} for a bulk lookup of {len(phones)} phones")
+
+        results = response.json().get("results")
+        if not isinstance(results, dict):
+            raise CRMError("Unexpected CRM bulk payload")
+        return {phone: results.get(phone) for phone in phones}
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class CachedCRMClient(CRMClient):
+    """
+    TTL cache with negative caching and request coalescing.
+
+    Found accounts are cached for `ttl` seconds, unknown phones for
+    `negative_ttl`. Errors are not cached. Least recently used entries are
+    evicted beyond `max_entries`. If the caller that started a shared
+    lookup is cancelled, the callers waiting on it look the phone up again.
+    """
+
+    def __init__(
+        self,
+        inner: CRMClient,
+        ttl: float = 300.0,
+        negative_ttl: float = 60.0,
+        max_entries: int = 100_000,
+    ):
+        self.inner = inner
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, tuple[float, Optional[dict]]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0}
+
+    async def get_customer_with_loan(self, phone: str) -> Optional[dict]:
+        key = normalize_phone(phone)
+        if key is None:
+            return None
+
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                self.stats["hits" if value is not None else "negative_hits"] += 1
+                return value
+            del self._cache[key]
+
+        while key in self._in_flight:
+            in_flight = self._in_flight[key]
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise  # we were cancelled ourselves
+                # The caller that started the lookup was cancelled: redo it
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await self.inner.get_customer_with_loan(key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an un-awaited failure doesn't warn
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            self._store(key, value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    async def get_many(self, phones: list[str]) -> dict[str, Optional[dict]]:
+        """
+        Serve cached phones, wait on lookups already in flight and fetch
+        the rest from the inner client in one bulk call.
+        """
+        now = time.monotonic()
+        keys = {phone: normalize_phone(phone) for phone in phones}
+        found: dict[str, Optional[dict]] = {None: None}
+        waiting: dict[str, asyncio.Future] = {}
+        missing: list[str] = []
+
+        for key in dict.fromkeys(keys.values()):
+            if key is None:
+                continue
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self.stats["hits" if entry[1] is not None else "negative_hits"] += 1
+                found[key] = entry[1]
+            elif key in self._in_flight:
+                self.stats["coalesced"] += 1
+                waiting[key] = self._in_flight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            self.stats["misses"] += len(missing)
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._in_flight.update(futures)
+            try:
+                fetched = await self.inner.get_many(missing)
+            except BaseException as e:
+                for future in futures.values():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+                        future.exception()
+                raise
+            else:
+                for key, future in futures.items():
+                    future.set_result(fetched.get(key))
+                    self._store(key, fetched.get(key))
+                found.update(fetched)
+            finally:
+                for key in missing:
+                    del self._in_flight[key]
+
+        for key, future in waiting.items():
+            try:
+                found[key] = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                found[key] = await self.get_customer_with_loan(key)
+
+        return {phone: found.get(key) for phone, key in keys.items()}
+
+    def _store(self, key: str, value: Optional[dict]) -> None:
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._cache[key] = (time.monotonic() + ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, phone: str) -> None:
+        self._cache.pop(normalize_phone(phone), None)
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+# =========================
+# Process-wide client
+# =========================
+_client: Optional[CRMClient] = None
+
+
+def get_crm_client() -> CRMClient:
+    """Return the process-wide CRM client, creating it on first use."""
+    global _client
+    if _client is None:
+        base_url = os.getenv("CRM_BASE_URL")
+        if base_url:
+            _client = CachedCRMClient(
+                HttpCRMClient(
+                    base_url,
+                    timeout=float(os.getenv("CRM_TIMEOUT_S", "5")),
+                    max_connections=int(os.getenv("CRM_MAX_CONNECTIONS", "100")),
+                ),
+                ttl=float(os.getenv("CRM_CACHE_TTL_S", "300")),
+                negative_ttl=float(os.getenv("CRM_NEGATIVE_TTL_S", "60")),
+            )
+        else:
+            _client = LocalCRMClient()
+    return _client
+
+
+async def close_crm_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def get_customer_with_loan_async(phone: str) -> Optional[dict]:
+    """Async lookup through the configured CRM client."""
+    return await get_crm_client().get_customer_with_loan(phone)
@@ -0,0 +1,241 @@
+# src/customer_book.py
+
+"""
+Memory-mapped columnar customer/loan book.
+
+A build step (scripts/build_customer_book.py) compiles the customer and
+loan export into one read-only snapshot file:
+
+    header     b"CBOOK\\0" | u16 version | u32 column count | u64 row count
+    directory  per column: 24-byte name | u8 kind | u64 offset | u64 length
+    columns    phone_key: sorted u64 (E.164 digits), searched by bisect
+               numeric:   fixed-width f64 / i32 / u8 arrays, row-aligned
+               text:      u32 offsets (rows + 1) followed by a utf-8 heap
+
+Lookups touch only the pages they need, and every worker process that
+opens the same file shares those pages through the OS page cache.
+"""
+
+import bisect
+import mmap
+import os
+import re
+import struct
+from typing import Iterable, Optional
+
+
+MAGIC = b"CBOOK\0"
+VERSION = 1
+DEFAULT_COUNTRY_CODE = "91"
+
+_HEADER = struct.Struct("<6sHIQ")
+_DIR_ENTRY = struct.Struct("<24sBQQ")
+
+# Column kinds
+_KEY, _F64, _I32, _U8, _TEXT = range(5)
+_ARRAY_FORMATS = {_KEY: "Q", _F64: "d", _I32: "i", _U8: "B"}
+
+# (column, kind, source) where source is ("customer" | "loan", field)
+COLUMNS = (
+    ("customer_id", _TEXT, ("customer", "id")),
+    ("name", _TEXT, ("customer", "name")),
+    ("dob", _TEXT, ("customer", "dob")),
+    ("phone", _TEXT, ("customer", "phone")),
+    ("has_loan", _U8, None),
+    ("loan_id", _TEXT, ("loan", "id")),
+    ("loan_type", _TEXT, ("loan", "type")),
+    ("principal", _F64, ("loan", "principal")),
+    ("outstanding", _F64, ("loan", "outstanding")),
+    ("emi", _F64, ("loan", "emi")),
+    ("due_date", _TEXT, ("loan", "due_date")),
+    ("days_past_due", _I32, ("loan", "days_past_due")),
+)
+
+
+class CustomerBookError(ValueError):
+    """Raised for invalid book input or a corrupt snapshot file."""
+
+
+def normalize_phone(phone: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Normalize a phone number to E.164 (e.g. "+919876543210").
+    Bare 10-digit numbers get the default country code.
+    Returns None if the input can't be a valid E.164 number.
+    """
+    if not phone:
+        return None
+    raw = phone.strip()
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("00"):
+        digits = digits[2:]
+    elif not raw.startswith("+"):
+        if len(digits) == 11 and digits.startswith("0"):
+            digits = digits[1:]
+        if len(digits) == 10:
+            digits = default_country_code + digits
+    if not 8 <= len(digits) <= 15 or digits.startswith("0"):
+        return None
+    return "+" + digits
+
+
+def _phone_key(e164: str) -> int:
+    return int(e164[1:])
+
+
+# =========================
+# Build
+# =========================
+def build_book(records: Iterable[tuple[dict, Optional[dict]]], path: str) -> int:
+    """
+    Write a snapshot from (customer, loan) pairs. Returns the row count.
+    Writes to a temp file and renames, so readers never see a partial book.
+    """
+    rows = []
+    for customer, loan in records:
+        e164 = normalize_phone(customer["phone"])
+        if e164 is None:
+            raise CustomerBookError(f"Invalid phone for customer {customer.get('id')}: {customer['phone']!r}")
+        rows.append((_phone_key(e164), customer, loan))
+
+    rows.sort(key=lambda row: row[0])
+    for prev, cur in zip(rows, rows[1:]):
+        if prev[0] == cur[0]:
+            raise CustomerBookError(f"Duplicate phone +{cur[0]} ({prev[1]['id']}, {cur[1]['id']})")
+
+    columns = [("phone_key", _KEY, struct.pack(f"<{len(rows)}Q", *(row[0] for row in rows)))]
+    for name, kind, source in COLUMNS:
+        values = []
+        for _, customer, loan in rows:
+            if source is None:
+                values.append(1 if loan else 0)
+                continue
+            record = customer if source[0] == "customer" else loan
+            values.append(record.get(source[1]) if record else None)
+        columns.append((name, kind, _encode_column(kind, values)))
+
+    directory_size = _DIR_ENTRY.size * len(columns)
+    offset = _HEADER.size + directory_size
+    directory = bytearray()
+    for name, kind, data in columns:
+        offset = _align(offset)
+        directory += _DIR_ENTRY.pack(name.encode(), kind, offset, len(data))
+        offset += len(data)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(columns), len(rows)))
+        f.write(directory)
+        for _, _, data in columns:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _encode_column(kind: int, values: list) -> bytes:
+    if kind == _TEXT:
+        heap = bytearray()
+        offsets = [0]
+        for value in values:
+            heap += ("" if value is None else str(value)).encode("utf-8")
+            offsets.append(len(heap))
+        return struct.pack(f"<{len(offsets)}I", *offsets) + bytes(heap)
+    fmt = _ARRAY_FORMATS[kind]
+    return struct.pack(f"<{len(values)}{fmt}", *(value or 0 for value in values))
+
+
+# =========================
+# Read
+# =========================
+class CustomerBook:
+    """Read-only view over a snapshot file built by build_book()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        # Every view into the mmap, so close() can release them in order
+        self._views = [view]
+
+        magic, version, n_columns, self.rows = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise CustomerBookError(f"{path} is not a customer book (version {VERSION})")
+
+        self._columns = {}
+        for i in range(n_columns):
+            raw_name, kind, offset, length = _DIR_ENTRY.unpack_from(view, _HEADER.size + i * _DIR_ENTRY.size)
+            name = raw_name.rstrip(b"\0").decode()
+            data = view[offset:offset + length]
+            self._views.append(data)
+            if kind == _TEXT:
+                split = (self.rows + 1) * 4
+                offsets, heap = data[:split], data[split:]
+                self._views += [offsets, heap, offsets.cast("I")]
+                self._columns[name] = (kind, (self._views[-1], heap))
+            else:
+                self._views.append(data.cast(_ARRAY_FORMATS[kind]))
+                self._columns[name] = (kind, self._views[-1])
+
+        self._keys = self._columns["phone_key"][1]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def find_row(self, phone: str) -> Optional[int]:
+        """Binary-search the phone index. Returns the row number or None."""
+        e164 = normalize_phone(phone)
+        if e164 is None:
+            return None
+        key = _phone_key(e164)
+        row = bisect.bisect_left(self._keys, key)
+        if row < self.rows and self._keys[row] == key:
+            return row
+        return None
+
+    def _value(self, column: str, row: int):
+        kind, data = self._columns[column]
+        if kind == _TEXT:
+            offsets, heap = data
+            return str(heap[offsets[row]:offsets[row + 1]], "utf-8")
+        value = data[row]
+        if kind == _F64 and value.is_integer():
+            return int(value)
+        return value
+
+    def get_customer_with_loan(self, phone: str) -> Optional[dict]:
+        """Same shape as src.data.get_customer_with_loan()."""
+        row = self.find_row(phone)
+        if row is None:
+            return None
+        customer = {
+            "id": self._value("customer_id", row),
+            "name": self._value("name", row),
+            "dob": self._value("dob", row),
+            "phone": self._value("phone", row),
+        }
+        loan = None
+        if self._value("has_loan", row):
+            loan = {
+                "id": self._value("loan_id", row),
+                "type": self._value("loan_type", row),
+                "principal": self._value("principal", row),
+                "outstanding": self._value("outstanding", row),
+                "emi": self._value("emi", row),
+                "due_date": self._value("due_date", row),
+                "days_past_due": self._value("days_past_due", row),
+            }
+        return {"customer": customer, "loan": loan}
+
+    def close(self) -> None:
+        self._keys = None
+        self._columns.clear()
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+        self._file.close()
@@ -3,8 +3,18 @@
 """
 Mock data for debt collection agent.
 In production, this would come from CRM APIs.
+
+Set CUSTOMER_BOOK_PATH to serve lookups from a memory-mapped snapshot
+(see src/customer_book.py and scripts/build_customer_book.py) instead.
 """
 
+import os
+from datetime import datetime
+
+from src.customer_book import CustomerBook, normalize_phone
+from src.records import get_record_store
+from src.timing import timed
+
 
 # Customer database (keyed by phone number)
 CUSTOMERS = {
@@ -65,7 +75,7 @@ LOANS = {
 
 def get_customer_by_phone(phone: str) -> dict | None:
     """Look up customer by phone number."""
-    return CUSTOMERS.get(phone)
+    return CUSTOMERS.get(normalize_phone(phone) or phone)
 
 
 
@@ -77,53 +87,83 @@ def get_loan_by_customer(customer_id: str) -> dict | None:
 
 
 
+_customer_book: CustomerBook | None = None
+
+
+def get_customer_book() -> CustomerBook | None:
+    """Open the memory-mapped book once per process, if configured."""
+    global _customer_book
+    path = os.getenv("CUSTOMER_BOOK_PATH")
+    if _customer_book is None and path:
+        _customer_book = CustomerBook(path)
+    return _customer_book
+
+
 def get_customer_with_loan(phone: str) -> dict | None:
     """Get combined customer and loan info."""
+    book = get_customer_book()
+    if book is not None:
+        return book.get_customer_with_loan(phone)
+    
     customer = get_customer_by_phone(phone)
     if not customer:
         return None
     loan = get_loan_by_customer(customer["id"])
     return {"customer": customer, "loan": loan}
 
-# In-memory storage for call outcomes
-# (In production, this would be saved to database)
-CALL_RECORDS = []
-PTP_RECORDS = []
-DISPUTE_RECORDS = []
+# Call outcomes go to the record store (src/records.py): durable SQLite
+# with group commit by default, so saving never waits on disk I/O.
+# Call records and PTPs also update the outcome analytics (src/analytics.py).
 
 
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
 
 
 def save_ptp(customer_id: str, amount: float, date: str, plan_type: str) -> str:
     """Save Promise-to-Pay record. Returns PTP ID."""
-    ptp_id = f"PTP{len(PTP_RECORDS)+1:04d}"
-    PTP_RECORDS.append({
-        "id": ptp_id,
+    record = {
         "customer_id": customer_id,
         "amount": amount,
         "date": date,
         "plan_type": plan_type,
-    })
-    return ptp_id
+        "recorded_at": _now(),
+    }
+    with timed("records", "ptp"):
+        return get_record_store().append("ptp", record)
 
 
 
 
 def save_dispute(customer_id: str, reason: str) -> str:
     """Save dispute record. Returns Dispute ID."""
-    dispute_id = f"DSP{len(DISPUTE_RECORDS)+1:04d}"
-    DISPUTE_RECORDS.append({
-        "id": dispute_id,
+    record = {
         "customer_id": customer_id,
         "reason": reason,
-    })
-    return dispute_id
+        "recorded_at": _now(),
+    }
+    with timed("records", "dispute"):
+        return get_record_store().append("dispute", record)
 
 
 
 
 def save_call_record(call_summary: dict) -> str:
     """Save call summary. Returns Call ID."""
-    call_id = f"CALL{len(CALL_RECORDS)+1:04d}"
-    CALL_RECORDS.append({"id": call_id, **call_summary})
-    return call_id
+    record = {**call_summary, "recorded_at": _now()}
+    with timed("records", "call"):
+        return get_record_store().append("call", record)
+
+
+
+
+def list_records(kind: str) -> list[dict]:
+    """All saved records of a kind ("ptp", "dispute" or "call")."""
+    return get_record_store().list(kind)
+
+
+
+
+def search_disputes(query: str, offset: int = 0, limit: int = 20) -> tuple[int, list[dict]]:
+    """Ranked full-text search over dispute reasons. Returns (total, page)."""
+    return get_record_store().search("dispute", query, offset, limit)
@@ -0,0 +1,103 @@
+# src/deadline.py
+
+"""
+Per-turn latency budget.
+
+turn_deadline() starts a budget of TURN_DEADLINE_S seconds for one turn and
+stores its deadline in a ContextVar, so it reaches every node and LLM call
+made while handling the turn (asyncio tasks inherit the context).
+
+LLM helpers ask llm_budget() how long they may wait. They skip the call
+when less than LLM_MIN_CALL_S would remain after keeping LLM_RESERVE_S for
+the rest of the turn, and otherwise time out at the budget. Either way the
+caller falls back to rules or templates, and record_fallback() counts it.
+"""
+
+import math
+import os
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+TURN_DEADLINE_S = float(os.getenv("TURN_DEADLINE_S", "8"))
+LLM_RESERVE_S = float(os.getenv("LLM_RESERVE_S", "0.3"))
+LLM_MIN_CALL_S = float(os.getenv("LLM_MIN_CALL_S", "0.5"))
+
+# Turns kept for latency percentiles
+LATENCY_WINDOW = 2000
+
+_deadline: ContextVar[Optional[float]] = ContextVar("turn_deadline", default=None)
+
+# (call kind, reason) -> count; reason is "budget", "timeout" or "error"
+_fallbacks: Counter = Counter()
+_turn_latencies: deque = deque(maxlen=LATENCY_WINDOW)
+_turn_stats = {"turns": 0, "over_deadline": 0}
+
+
+@contextmanager
+def turn_deadline(budget: float = TURN_DEADLINE_S):
+    """Run the body under a turn deadline and record the turn's latency."""
+    started = time.monotonic()
+    token = _deadline.set(started + budget)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+        elapsed = time.monotonic() - started
+        _turn_latencies.append(elapsed)
+        _turn_stats["turns"] += 1
+        if elapsed > budget:
+            _turn_stats["over_deadline"] += 1
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current turn, or None outside a turn."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def llm_budget() -> Optional[float]:
+    """
+    Seconds an LLM call may take right now.
+    None means no deadline applies; 0 means skip the call and fall back.
+    """
+    left = remaining()
+    if left is None:
+        return None
+    budget = left - LLM_RESERVE_S
+    return budget if budget >= LLM_MIN_CALL_S else 0.0
+
+
+def record_fallback(kind: str, reason: str) -> None:
+    """Count an LLM call replaced by its rule/template fallback."""
+    _fallbacks[(kind, reason)] += 1
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+
+def deadline_metrics() -> dict:
+    """Fallback counts and recent turn latency percentiles."""
+    latencies = sorted(_turn_latencies)
+    fallbacks: dict[str, dict[str, int]] = {}
+    for (kind, reason), count in _fallbacks.items():
+        fallbacks.setdefault(kind, {})[reason] = count
+    return {
+        "turn_deadline_s": TURN_DEADLINE_S,
+        **_turn_stats,
+        "latency_s": {
+            "p50": round(_percentile(latencies, 0.50), 4),
+            "p95": round(_percentile(latencies, 0.95), 4),
+            "p99": round(_percentile(latencies, 0.99), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+        "fallbacks": fallbacks,
+    }
@@ -1,7 +1,12 @@
 # src/graph.py
 
+import os
+from contextlib import nullcontext
+
 from langgraph.graph import StateGraph, END
 from src.state import CallState
+from src.tracing import GraphTracer
+from src.timing import timed_node
 
 from src.nodes.greeting import greeting_node
 from src.nodes.verification import verification_node
@@ -9,6 +14,22 @@ from src.nodes.disclosure import disclosure_node
 from src.nodes.payment_check import payment_check_node
 from src.nodes.negotiation import negotiation_node
 from src.nodes.closing import closing_node
+from src.nodes.analysis import start_analysis_node, rule_analysis_node, entity_analysis_node, llm_analysis_node
+from src.memory import compact_history_node, needs_compaction
+
+
+# Max supersteps per invocation. payment_check and negotiation are async
+# nodes, so the compiled graph must be driven with `ainvoke`.
+RECURSION_LIMIT = 25
+
+# Independent analyses of a negotiation utterance. `start_analysis` resets
+# `turn_analysis`, then they run as parallel branches in one superstep and
+# their writes are merged by the reducer on CallState before `negotiation`.
+NEGOTIATION_ANALYSIS_NODES = ["analyze_rules", "analyze_entities", "analyze_llm"]
+
+# Opt-in node tracer (GRAPH_TRACE=1): per-turn node sequence, timings,
+# written keys and recursion depth, queryable via /api/debug/traces.
+TRACER = GraphTracer(RECURSION_LIMIT) if os.getenv("GRAPH_TRACE", "0") == "1" else None
 
 
 def should_continue(state: CallState) -> str:
@@ -62,6 +83,10 @@ def should_continue(state: CallState) -> str:
                 if any(phrase in content for phrase in closing_phrases):
                     return "closing"
         
+        # New customer utterance: fan out the analysis branches first
+        if state.get("last_user_input"):
+            return "start_analysis"
+        
         # Otherwise stay in negotiation
         return "negotiation"
     
@@ -72,48 +97,73 @@ def should_continue(state: CallState) -> str:
     return END
 
 
-def create_graph():
+def route_entry(state: CallState) -> str:
+    """
+    Entry routing: fold old history first when the live window is full,
+    then route by stage as usual.
+    """
+    if not state.get("is_complete") and needs_compaction(state):
+        return "compact_history"
+    return should_continue(state)
+
+
+ROUTES = {
+    "compact_history": "compact_history",
+    "greeting": "greeting",
+    "verification": "verification",
+    "disclosure": "disclosure",
+    "payment_check": "payment_check",
+    "negotiation": "negotiation",
+    "closing": "closing",
+    "start_analysis": "start_analysis",
+    END: END,
+}
+
+
+def create_graph(tracer: GraphTracer | None = None):
     graph = StateGraph(CallState)
 
-    # Register nodes
-    graph.add_node("greeting", greeting_node)
-    graph.add_node("verification", verification_node)
-    graph.add_node("disclosure", disclosure_node)
-    graph.add_node("payment_check", payment_check_node)
-    graph.add_node("negotiation", negotiation_node)
-    graph.add_node("closing", closing_node)
+    nodes = {
+        "greeting": greeting_node,
+        "verification": verification_node,
+        "disclosure": disclosure_node,
+        "payment_check": payment_check_node,
+        "negotiation": negotiation_node,
+        "closing": closing_node,
+        "start_analysis": start_analysis_node,
+        "analyze_rules": rule_analysis_node,
+        "analyze_entities": entity_analysis_node,
+        "analyze_llm": llm_analysis_node,
+        "compact_history": compact_history_node,
+    }
+
+    # Register nodes, each timed for Server-Timing (a no-op outside a request)
+    for name, node in nodes.items():
+        node = timed_node(name, node)
+        graph.add_node(name, tracer.wrap(name, node) if tracer else node)
 
     # Set conditional edges from each node
-    graph.set_conditional_entry_point(
-        should_continue,
-        {
-            "greeting": "greeting",
-            "verification": "verification",
-            "disclosure": "disclosure",
-            "payment_check": "payment_check",
-            "negotiation": "negotiation",
-            "closing": "closing",
-            END: END,
-        }
-    )
+    graph.set_conditional_entry_point(route_entry, ROUTES)
     
     # Each node routes through the same conditional logic
-    for node_name in ["greeting", "verification", "disclosure", "payment_check", "negotiation", "closing"]:
-        graph.add_conditional_edges(
-            node_name,
-            should_continue,
-            {
-                "greeting": "greeting",
-                "verification": "verification",
-                "disclosure": "disclosure",
-                "payment_check": "payment_check",
-                "negotiation": "negotiation",
-                "closing": "closing",
-                END: END,
-            }
-        )
+    for node_name in ["compact_history", "greeting", "verification", "disclosure", "payment_check", "negotiation", "closing"]:
+        graph.add_conditional_edges(node_name, should_continue, ROUTES)
+
+    # Analysis branches fan out from start_analysis and join into
+    # negotiation once all of them finish
+    for name in NEGOTIATION_ANALYSIS_NODES:
+        graph.add_edge("start_analysis", name)
+    graph.add_edge(NEGOTIATION_ANALYSIS_NODES, "negotiation")
 
     return graph
 
 
-app = create_graph().compile()
\ No newline at end of file
+def trace_turn(session_id: str):
+    """
+    Scope node spans to one turn of a session.
+    No-op unless tracing is enabled.
+    """
+    return TRACER.turn(session_id) if TRACER else nullcontext()
+
+
+app = create_graph(TRACER).compile()
@@ -0,0 +1,175 @@
+# src/memory.py
+
+"""
+Bounded conversation memory.
+
+Once `messages` grows past HISTORY_MAX_MESSAGES, older messages are folded
+into `history_summary` (a small structured record of the facts the nodes
+rely on) and moved to the transcript archive. The most recent
+HISTORY_KEEP_RECENT messages stay verbatim on the state.
+
+The archive lives with the session, not in this process: the folded
+messages are handed over in `pending_archive`, which the session store
+moves to the session's archive when it saves the turn (see
+backend/session_store.py). Reads take an ArchiveReader for the session.
+"""
+
+import os
+from typing import Callable, Optional
+
+from src.state import CallState
+from src.utils.log import get_logger
+from src.nodes.negotiation import (
+    count_negotiation_turns,
+    has_commitment_details,
+    WILLINGNESS_PHRASES,
+)
+
+logger = get_logger(__name__)
+
+
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "40"))
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "12"))
+
+
+# =========================
+# Transcript archive
+# =========================
+# Returns archived messages [start:end] of one session
+ArchiveReader = Callable[[int, Optional[int]], list[dict]]
+
+
+def get_full_transcript(state: CallState, read_archive: ArchiveReader) -> list[dict]:
+    """Archived messages followed by the live window."""
+    archived = state.get("archived_message_count", 0)
+    return (read_archive(0, archived) if archived else []) + state.get("messages", [])
+
+
+def message_count(state: CallState) -> int:
+    """Total messages in the call, archived ones included."""
+    return state.get("archived_message_count", 0) + len(state.get("messages", []))
+
+
+def get_messages_range(
+    state: CallState,
+    start: int,
+    end: Optional[int] = None,
+    *,
+    read_archive: ArchiveReader,
+) -> list[dict]:
+    """
+    Messages [start:end] by absolute position in the call.
+    Positions stay stable across compaction, so they work as client cursors.
+    """
+    archived = state.get("archived_message_count", 0)
+    total = archived + len(state.get("messages", []))
+    start = max(0, start)
+    end = total if end is None else min(end, total)
+    if start >= end:
+        return []
+
+    result = []
+    if start < archived:
+        result = read_archive(start, min(end, archived))
+    if end > archived:
+        result += state["messages"][max(start, archived) - archived:end - archived]
+    return result
+
+
+# =========================
+# Compaction
+# =========================
+def needs_compaction(state: CallState) -> bool:
+    return len(state.get("messages", [])) > HISTORY_MAX_MESSAGES
+
+
+def fold_messages(state: CallState, folded: list[dict]) -> dict:
+    """
+    Fold `folded` messages into the existing history summary.
+    Keeps the disclosure marker, plan offers, commitments and negotiation
+    progress so nodes behave the same on the shortened window.
+    """
+    summary = dict(state.get("history_summary") or {})
+    offered_before = summary.get("plans_offered", False)
+
+    assistant_text = [m.get("content", "").lower() for m in folded if m.get("role") == "assistant"]
+    user_text = [m.get("content", "").lower() for m in folded if m.get("role") == "user"]
+
+    summary["messages_folded"] = summary.get("messages_folded", 0) + len(folded)
+    summary["disclosed"] = summary.get("disclosed", False) or any(
+        "outstanding payment" in text for text in assistant_text
+    )
+    summary["plans_offered"] = summary.get("plans_offered", False) or any(
+        "option" in text or "installment" in text for text in assistant_text
+    )
+    summary["willing_to_pay"] = summary.get("willing_to_pay", False) or any(
+        phrase in text for text in user_text for phrase in WILLINGNESS_PHRASES
+    )
+
+    turns, in_negotiation = count_negotiation_turns(
+        folded,
+        summary.get("negotiation_turns", 0),
+        summary.get("in_negotiation", False),
+    )
+    summary["negotiation_turns"] = turns
+    summary["in_negotiation"] = in_negotiation
+
+    # Commitments made in the folded turns (seeded from the previous
+    # summary, which says whether the plan offer came before these turns)
+    _, amount, date, plan = has_commitment_details(
+        {**state, "messages": folded, "history_summary": {**summary, "plans_offered": offered_before}},
+        "",
+    )
+    summary["committed_amount"] = amount
+    summary["committed_date"] = date
+    summary["selected_plan"] = plan
+
+    summary["text"] = summarize_text(state, summary)
+    return summary
+
+
+def summarize_text(state: CallState, summary: dict) -> str:
+    """One-line, bounded description of the folded history for prompts."""
+    parts = [f"{summary['messages_folded']} earlier messages"]
+    if summary.get("disclosed"):
+        parts.append("disclosure given")
+    if summary.get("plans_offered") and state.get("offered_plans"):
+        parts.append("plans offered: " + ", ".join(p["name"] for p in state["offered_plans"]))
+    if summary.get("selected_plan"):
+        parts.append(f"customer chose {summary['selected_plan']['name']}")
+    if summary.get("committed_amount"):
+        parts.append(f"amount ₹{summary['committed_amount']:,.0f}")
+    if summary.get("committed_date"):
+        parts.append(f"date {summary['committed_date']}")
+    if summary.get("willing_to_pay"):
+        parts.append("customer said they want to pay")
+    return "; ".join(parts)
+
+
+def compact_history_node(state: CallState) -> dict:
+    """
+    History-compaction stage.
+    Archives everything but the recent window and folds it into the summary.
+    """
+    messages = state["messages"]
+    split = len(messages) - HISTORY_KEEP_RECENT
+
+    # Start the window on an assistant message so reply detection
+    # (e.g. "sounds good" after a plan offer) still sees its prompt
+    while split > 0 and messages[split].get("role") != "assistant":
+        split -= 1
+    if split <= 0:
+        return {}
+
+    folded, recent = messages[:split], messages[split:]
+    summary = fold_messages(state, folded)
+
+    logger.debug("Folded %d messages, keeping %d (%s)", len(folded), len(recent), summary['text'])
+
+    return {
+        "messages": recent,
+        # Archived with the session when the turn is saved
+        "pending_archive": (state.get("pending_archive") or []) + folded,
+        "history_summary": summary,
+        "archived_message_count": state.get("archived_message_count", 0) + len(folded),
+    }
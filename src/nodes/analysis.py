@@ -0,0 +1,63 @@
+# src/nodes/analysis.py
+
+import os
+
+from ..state import CallState
+from ..utils.llm import classify_intent_rule_based, classify_intent_with_gemini_async
+from ..utils.log import get_logger
+from .negotiation import analyze_utterance, has_commitment_details
+
+logger = get_logger(__name__)
+
+
+# Opt-in: ask Gemini for the intent of negotiation utterances the rule
+# classifier can't place. Runs alongside the other branches, so it only
+# adds latency when it is the slowest one.
+LLM_INTENT_ENABLED = os.getenv("NEGOTIATION_LLM_INTENT", "0") == "1"
+
+
+def start_analysis_node(state: CallState) -> dict:
+    """
+    Fan-out point: clear the previous utterance's analysis, so the branches
+    below merge into an empty `turn_analysis`.
+    """
+    return {"turn_analysis": None}
+
+
+def rule_analysis_node(state: CallState) -> dict:
+    """
+    Rule-based branch: end signals, plan requests and rule intent.
+    """
+    user_input = state.get("last_user_input") or ""
+    return {
+        "turn_analysis": {"input": user_input, **analyze_utterance(user_input)},
+    }
+
+
+def entity_analysis_node(state: CallState) -> dict:
+    """
+    Local extraction branch: plan selection, amount and date commitments.
+    """
+    user_input = state.get("last_user_input") or ""
+    return {
+        "turn_analysis": {
+            "input": user_input,
+            "commitment": has_commitment_details(state, user_input),
+        },
+    }
+
+
+async def llm_analysis_node(state: CallState) -> dict:
+    """
+    Optional LLM branch: Gemini intent for utterances the rules miss.
+    """
+    user_input = state.get("last_user_input") or ""
+    llm_intent = None
+
+    if LLM_INTENT_ENABLED and user_input and classify_intent_rule_based(user_input) == "unknown":
+        llm_intent = await classify_intent_with_gemini_async(user_input)
+        logger.debug("Gemini intent: %s", llm_intent)
+
+    return {
+        "turn_analysis": {"input": user_input, "llm_intent": llm_intent},
+    }
@@ -1,11 +1,19 @@
 # src/nodes/negotiation.py
 
 from ..state import CallState
-from ..utils.llm import generate_negotiation_response, generate_payment_plans
+from ..utils.llm import (
+    generate_negotiation_response_async,
+    generate_payment_plans_async,
+    classify_intent_rule_based,
+)
 from ..data import save_ptp
+from ..utils.log import get_logger
 from datetime import datetime, timedelta
+import logging
 import re
 
+logger = get_logger(__name__)
+
 
 def extract_amount(text: str) -> float:
     """Extract monetary amount from text."""
@@ -116,6 +124,14 @@ def extract_date(text: str) -> str:
     return None
 
 
+WILLINGNESS_PHRASES = [
+    "i want to pay", "ready to pay", "will pay", "can pay", "i'll pay",
+    "want to pay", "willing to pay", "prepared to pay", "ready to make payment",
+    "can make payment", "will make payment", "i can pay", "i will pay",
+    "let's pay", "let us pay", "i'd like to pay", "i would like to pay"
+]
+
+
 def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
     """
     Check if customer has provided both amount and date commitment.
@@ -124,9 +140,11 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
     messages = state.get("messages", [])
     offered_plans = state.get("offered_plans", [])
     
-    committed_amount = None
-    committed_date = None
-    selected_plan = None
+    # Commitments found in turns already folded into the history summary
+    summary = state.get("history_summary") or {}
+    committed_amount = summary.get("committed_amount")
+    committed_date = summary.get("committed_date")
+    selected_plan = summary.get("selected_plan")
     
     # Find where verification ended
     verification_done_index = -1
@@ -136,39 +154,41 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
             if "thank you for confirming" in content or "outstanding payment" in content:
                 verification_done_index = i
     
-    # Find where plans were offered
-    plan_offer_index = -1
-    for i, msg in enumerate(messages):
-        if msg.get("role") == "assistant" and i > verification_done_index:
-            if "option" in msg.get("content", "").lower() or "installment" in msg.get("content", "").lower():
-                plan_offer_index = i
-                break
+    # Find where plans were offered. If that was in folded history, every
+    # message here came after it; a later mention of a plan name is no offer.
+    plan_offer_index = 0 if summary.get("plans_offered") else -1
+    if plan_offer_index < 0:
+        for i, msg in enumerate(messages):
+            if msg.get("role") == "assistant" and i > verification_done_index:
+                if "option" in msg.get("content", "").lower() or "installment" in msg.get("content", "").lower():
+                    plan_offer_index = i
+                    break
     
     start_index = max(plan_offer_index, verification_done_index + 1) if plan_offer_index >= 0 else verification_done_index + 1
     relevant_messages = messages[start_index:] if start_index >= 0 else messages[-3:]
     
-    print(f"[COMMITMENT] Checking {len(relevant_messages)} messages after plans offered")
-    if offered_plans:
-        print(f"[COMMITMENT] Available plans: {[p['name'] for p in offered_plans]}")
+    logger.debug("Checking %d messages after plans offered", len(relevant_messages))
+    if offered_plans and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Available plans: %s", [p['name'] for p in offered_plans])
     
     for msg in relevant_messages:
         if msg.get("role") == "user":
             content = msg.get("content", "").lower()
             
-            print(f"[COMMITMENT] Analyzing user message: '{content}'")
+            logger.debug("Analyzing user message: %r", content)
             
             if offered_plans and not selected_plan:
-                print(f"[COMMITMENT] Plans available: {len(offered_plans)}")
+                logger.debug("Plans available: %d", len(offered_plans))
                 # Try to match by month count (e.g., "3 month", "3-month", "three month")
                 month_match = re.search(r'(\d+)\s*[-]?\s*month', content)
                 if month_match:
                     months = int(month_match.group(1))
-                    print(f"[PLAN DETECTION] Found {months}-month mention in: '{content}'")
+                    logger.debug("Found %d-month mention in: %r", months, content)
                     for idx, plan in enumerate(offered_plans):
                         plan_name_lower = plan['name'].lower()
                         plan_desc_lower = plan['description'].lower()
                         
-                        print(f"[PLAN DETECTION] Checking plan {idx+1}: '{plan_name_lower}' / '{plan_desc_lower}'")
+                        logger.debug("Checking plan %d: %r / %r", idx + 1, plan_name_lower, plan_desc_lower)
                         
                         matches = (
                             f"{months}-month" in plan_name_lower or
@@ -179,24 +199,24 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
                         
                         if matches:
                             selected_plan = plan
-                            print(f"[PLAN DETECTION] ✅ Matched to plan: {plan['name']}")
+                            logger.debug("Matched to plan: %s", plan['name'])
                             amount_match = re.search(r'₹(\d+(?:,\d+)*)', plan['description'])
                             if amount_match:
                                 committed_amount = float(amount_match.group(1).replace(',', ''))
-                                print(f"[PLAN DETECTION] Amount: ₹{committed_amount:,.0f}")
+                                logger.debug("Plan amount: ₹%s", f"{committed_amount:,.0f}")
                             break
                         else:
-                            print(f"[PLAN DETECTION] No match for {months} months")
+                            logger.debug("No match for %d months", months)
                 
                 # Try to match by plan/option number (e.g., "plan 1", "option 2", "1st plan")
                 if not selected_plan:
                     plan_num_match = re.search(r'(?:plan|option|choice)\s*(\d+)', content)
                     if plan_num_match:
                         plan_idx = int(plan_num_match.group(1)) - 1
-                        print(f"[PLAN DETECTION] Plan number {plan_idx + 1} selected")
+                        logger.debug("Plan number %d selected", plan_idx + 1)
                         if 0 <= plan_idx < len(offered_plans):
                             selected_plan = offered_plans[plan_idx]
-                            print(f"[PLAN DETECTION] Matched to: {selected_plan['name']}")
+                            logger.debug("Matched to plan: %s", selected_plan['name'])
                             amount_match = re.search(r'₹(\d+(?:,\d+)*)', selected_plan['description'])
                             if amount_match:
                                 committed_amount = float(amount_match.group(1).replace(',', ''))
@@ -213,7 +233,7 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
                         if keyword in content:
                             if idx < len(offered_plans):
                                 selected_plan = offered_plans[idx]
-                                print(f"[PLAN DETECTION] Position-based selection ({keyword}): {selected_plan['name']}")
+                                logger.debug("Position-based selection (%s): %s", keyword, selected_plan['name'])
                                 amount_match = re.search(r'₹(\d+(?:,\d+)*)', selected_plan['description'])
                                 if amount_match:
                                     committed_amount = float(amount_match.group(1).replace(',', ''))
@@ -228,7 +248,7 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
                         'let\'s go with', 'let us go with', 'i\'d like', 'i would like'
                     ]
                     if any(phrase in content for phrase in acceptance_phrases):
-                        print("[PLAN DETECTION] Acceptance phrase detected")
+                        logger.debug("Acceptance phrase detected")
                         msg_index = messages.index(msg)
                         if msg_index > 0:
                             prev_msg = messages[msg_index - 1]
@@ -239,7 +259,7 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
                                 else:
                                     selected_plan = offered_plans[0]
                                 
-                                print(f"[PLAN DETECTION] Assumed plan: {selected_plan['name']}")
+                                logger.debug("Assumed plan: %s", selected_plan['name'])
                                 amount_match = re.search(r'₹(\d+(?:,\d+)*)', selected_plan['description'])
                                 if amount_match:
                                     committed_amount = float(amount_match.group(1).replace(',', ''))
@@ -252,7 +272,7 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
                         # If significant overlap in keywords, consider it a match
                         if len(plan_name_words & content_words) >= 2:
                             selected_plan = plan
-                            print(f"[PLAN DETECTION] Keyword-based match: {plan['name']}")
+                            logger.debug("Keyword-based match: %s", plan['name'])
                             amount_match = re.search(r'₹(\d+(?:,\d+)*)', plan['description'])
                             if amount_match:
                                 committed_amount = float(amount_match.group(1).replace(',', ''))
@@ -262,39 +282,97 @@ def has_commitment_details(state: CallState, last_user_input: str) -> tuple:
                 date = extract_date(content)
                 if date:
                     committed_date = date
-                    print(f"[DATE DETECTION] Found date: {date}")
+                    logger.debug("Found date: %s", date)
             
             if not committed_amount and not selected_plan:
                 amount = extract_amount(content)
                 if amount:
                     committed_amount = amount
-                    print(f"[AMOUNT DETECTION] Found explicit amount: {amount}")
+                    logger.debug("Found explicit amount: %s", amount)
     
     # If we have a date but no amount/plan, and user expressed willingness to pay, use full outstanding amount
     if committed_date and not committed_amount and not selected_plan:
         # Check if user expressed willingness to pay (various phrasings)
         all_user_messages = [msg.get("content", "").lower() for msg in messages if msg.get("role") == "user"]
-        willingness_phrases = [
-            "i want to pay", "ready to pay", "will pay", "can pay", "i'll pay",
-            "want to pay", "willing to pay", "prepared to pay", "ready to make payment",
-            "can make payment", "will make payment", "i can pay", "i will pay",
-            "let's pay", "let us pay", "i'd like to pay", "i would like to pay"
-        ]
-        if any(phrase in msg for msg in all_user_messages for phrase in willingness_phrases):
+        if summary.get("willing_to_pay") or any(phrase in msg for msg in all_user_messages for phrase in WILLINGNESS_PHRASES):
             committed_amount = state.get("outstanding_amount")
-            print(f"[COMMITMENT] Direct payment commitment detected, using full amount: ₹{committed_amount:,.0f}")
+            logger.debug("Direct payment commitment, using full amount: %s", committed_amount)
     
     has_both = committed_amount is not None and committed_date is not None
     
-    print(f"[COMMITMENT] Final - Amount: {committed_amount}, Date: {committed_date}, Plan: {selected_plan['name'] if selected_plan else None}")
+    logger.debug(
+        "Commitment: amount=%s date=%s plan=%s",
+        committed_amount, committed_date, selected_plan['name'] if selected_plan else None,
+    )
     
     return has_both, committed_amount, committed_date, selected_plan
 
 
-def negotiation_node(state: CallState) -> dict:
+END_SIGNALS = ["no that's all", "no thanks bye", "goodbye", "bye bye", "nothing else", "that's all"]
+
+PLAN_REQUEST_KEYWORDS = [
+    "payment plan", "installment", "emi", "monthly payment",
+    "break it up", "pay in parts", "split", "work out a plan",
+    "options", "what are my options", "can you offer"
+]
+
+
+def count_negotiation_turns(messages: list, turns: int = 0, in_negotiation: bool = False) -> tuple:
+    """
+    Count assistant negotiation turns in `messages`.
+    Accepts a starting count/flag so folded history can be resumed.
+    Returns (turns, in_negotiation).
+    """
+    for msg in messages:
+        if msg.get("role") == "assistant":
+            content = msg.get("content", "").lower()
+            if "outstanding payment" in content or "able to make this payment" in content:
+                in_negotiation = False
+            elif in_negotiation or any(keyword in content for keyword in ["option", "installment", "plan", "appreciate your willingness"]):
+                in_negotiation = True
+                turns += 1
+    return turns, in_negotiation
+
+
+def analyze_utterance(text: str) -> dict:
+    """
+    Cheap rule-based reading of a negotiation utterance.
+    Returns end/plan-request signals and the rule-based intent.
+    """
+    text_lower = text.lower()
+    return {
+        "wants_to_end": any(signal in text_lower for signal in END_SIGNALS),
+        "plan_request": any(keyword in text_lower for keyword in PLAN_REQUEST_KEYWORDS),
+        "rule_intent": classify_intent_rule_based(text) if text else "unknown",
+    }
+
+
+def get_turn_analysis(state: CallState, last_user_input: str) -> dict:
+    """
+    Return the merged analysis branch results for this utterance.
+    Falls back to computing them inline when the node runs without the
+    fan-out (e.g. invoked directly or on the first negotiation turn).
+    """
+    analysis = state.get("turn_analysis") or {}
+    if analysis.get("input") != last_user_input:
+        analysis = {}
+    
+    if "wants_to_end" not in analysis:
+        analysis = {**analysis, **analyze_utterance(last_user_input)}
+    if "commitment" not in analysis:
+        analysis = {**analysis, "commitment": has_commitment_details(state, last_user_input)}
+    
+    return analysis
+
+
+async def negotiation_node(state: CallState) -> dict:
     """
     Have an intelligent conversation with the customer about payment.
     Detects when customer commits to amount AND date, then moves to closing.
+    
+    Utterance analysis (rules, entity extraction, optional LLM intent) is
+    produced by the parallel branches in src/nodes/analysis.py and merged
+    into `turn_analysis` before this node runs.
     """
 
     amount = state["outstanding_amount"]
@@ -303,25 +381,21 @@ def negotiation_node(state: CallState) -> dict:
     last_user_input = state.get("last_user_input") or ""
     messages = state.get("messages", [])
     
-    negotiation_turns = 0
-    in_negotiation = False
-    for msg in messages:
-        if msg.get("role") == "assistant":
-            content = msg.get("content", "").lower()
-            if "outstanding payment" in content or "able to make this payment" in content:
-                in_negotiation = False
-            elif in_negotiation or any(keyword in content for keyword in ["option", "installment", "plan", "appreciate your willingness"]):
-                in_negotiation = True
-                negotiation_turns += 1
+    summary = state.get("history_summary") or {}
+    negotiation_turns, _ = count_negotiation_turns(
+        messages,
+        summary.get("negotiation_turns", 0),
+        summary.get("in_negotiation", False),
+    )
     
-    print(f"[NEGOTIATION] Turn {negotiation_turns + 1}, User input: '{last_user_input}'")
+    logger.debug("Negotiation turn %d, user input: %r", negotiation_turns + 1, last_user_input)
     
-    commitment_result = has_commitment_details(state, last_user_input)
-    has_both, committed_amount, committed_date, selected_plan = commitment_result
+    analysis = get_turn_analysis(state, last_user_input)
+    has_both, committed_amount, committed_date, selected_plan = analysis["commitment"]
     
     # If we have both - CLOSE IMMEDIATELY
     if has_both:
-        print(f"[NEGOTIATION] ✅ Full commitment received - CLOSING NOW")
+        logger.info("Full commitment received, closing")
         
         # Save PTP record
         plan_name = selected_plan['name'] if selected_plan else "Custom Payment Plan"
@@ -332,7 +406,7 @@ def negotiation_node(state: CallState) -> dict:
             date=committed_date,
             plan_type=plan_type
         )
-        print(f"[NEGOTIATION] PTP saved with ID: {ptp_id}")
+        logger.info("PTP saved", extra={"ptp_id": ptp_id})
         
         response = (
             f"Perfect, {customer_name}. I've documented your commitment to the {plan_name} "
@@ -360,7 +434,7 @@ def negotiation_node(state: CallState) -> dict:
         }
     
     if selected_plan and not committed_date:
-        print(f"[NEGOTIATION] Plan selected, asking for date")
+        logger.debug("Plan selected, asking for date")
         response = (
             f"Great choice, {customer_name}! I've noted the {selected_plan['name']}. "
             f"When would you like to make your first payment?"
@@ -376,13 +450,12 @@ def negotiation_node(state: CallState) -> dict:
             "payment_status": "willing",
         }
     
-    end_signals = ["no that's all", "no thanks bye", "goodbye", "bye bye", "nothing else", "that's all"]
-    user_wants_to_end = any(signal in last_user_input.lower() for signal in end_signals)
+    user_wants_to_end = analysis["wants_to_end"]
     
     should_close = user_wants_to_end or negotiation_turns >= 8
     
     if should_close:
-        print(f"[NEGOTIATION] Closing conversation (user_wants_to_end={user_wants_to_end}, turns={negotiation_turns})")
+        logger.info("Closing conversation (user_wants_to_end=%s, turns=%d)", user_wants_to_end, negotiation_turns)
         response = (
             f"Thank you, {customer_name}. I've documented our discussion. "
             f"We'll follow up with you shortly to finalize the arrangement. "
@@ -398,19 +471,13 @@ def negotiation_node(state: CallState) -> dict:
             "last_user_input": None,
         }
     
-    plan_request_keywords = [
-        "payment plan", "installment", "emi", "monthly payment",
-        "break it up", "pay in parts", "split", "work out a plan",
-        "options", "what are my options", "can you offer"
-    ]
-    
-    is_plan_request = any(keyword in last_user_input.lower() for keyword in plan_request_keywords)
+    is_plan_request = analysis["plan_request"]
     
     if negotiation_turns == 0 or (is_plan_request and not state.get("offered_plans")):
         try:
-            plans = generate_payment_plans(amount, customer_name)
+            plans = await generate_payment_plans_async(amount, customer_name)
         except Exception as e:
-            print(f"[NEGOTIATION] Error generating plans: {e}, using fallback")
+            logger.warning("Error generating plans, using fallback: %s", e)
             from ..utils.llm import generate_fallback_plans
             plans = generate_fallback_plans(amount)
         
@@ -452,6 +519,8 @@ def negotiation_node(state: CallState) -> dict:
             }
     
     recent_conversation = ""
+    if summary.get("text"):
+        recent_conversation += f"(Earlier in the call: {summary['text']})\n"
     for msg in messages[-6:]:
         role = "Agent" if msg["role"] == "assistant" else "Customer"
         recent_conversation += f"{role}: {msg['content']}\n"
@@ -462,6 +531,9 @@ def negotiation_node(state: CallState) -> dict:
         for plan in state["offered_plans"]:
             plans_context += f"- {plan['name']}: {plan['description']}\n"
     
+    intent = analysis.get("llm_intent") or analysis.get("rule_intent")
+    intent_context = f"\nDetected customer intent: {intent}\n" if intent and intent != "unknown" else ""
+    
     context = f"""You are a professional debt collection agent.
 
 Customer: {customer_name}
@@ -469,7 +541,7 @@ Outstanding: ₹{amount:,.0f}
 
 Recent conversation:
 {recent_conversation}
-{plans_context}
+{plans_context}{intent_context}
 
 Customer said: "{last_user_input}"
 
@@ -477,10 +549,10 @@ Task: Respond naturally. If they selected a plan, confirm it and ask for payment
 
 Response:"""
 
-    response = generate_negotiation_response(context)
+    response = await generate_negotiation_response_async(context)
     
     if not response:
-        print("[NEGOTIATION] Using smart template fallback")
+        logger.debug("Using smart template fallback")
         
         if committed_date and not committed_amount and not selected_plan:
             response = (
@@ -1,15 +1,19 @@
 # src/nodes/payment_check.py
 
 from ..state import CallState
-from ..utils.llm import classify_intent
+from ..utils.llm import classify_intent_async
+from ..utils.log import get_logger
 
+logger = get_logger(__name__)
 
-def payment_check_node(state: CallState) -> dict:
+
+async def payment_check_node(state: CallState) -> dict:
     """
     Classify customer's payment intent using Gemini-powered classification.
     
     This node determines the customer's response to the debt disclosure
-    and routes them to the appropriate next step.
+    and routes them to the appropriate next step. Async so the Gemini
+    call does not block other conversations on the same worker.
     """
 
     user_input = state.get("last_user_input")
@@ -22,9 +26,9 @@ def payment_check_node(state: CallState) -> dict:
         }
 
     # Classify intent using improved Gemini-based classifier
-    print(f"\n[PAYMENT_CHECK] Analyzing user input: '{user_input}'")
-    intent = classify_intent(user_input).strip().lower()
-    print(f"[PAYMENT_CHECK] Classified intent: {intent}\n")
+    logger.debug("Analyzing user input: %r", user_input)
+    intent = (await classify_intent_async(user_input)).strip().lower()
+    logger.debug("Classified intent: %s", intent)
 
     # Normalize any spelling variations (just in case)
     alias_map = {
@@ -38,7 +42,7 @@ def payment_check_node(state: CallState) -> dict:
     # Validate that we got a valid status
     valid_statuses = ["paid", "disputed", "callback", "unable", "willing"]
     if payment_status not in valid_statuses:
-        print(f"[WARNING] Unexpected payment status: {payment_status}, defaulting to 'unable'")
+        logger.warning("Unexpected payment status %r, defaulting to 'unable'", payment_status)
         payment_status = "unable"
 
     return {
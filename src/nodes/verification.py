@@ -1,6 +1,7 @@
 # src/nodes/verification.py
 
 from ..state import CallState
+from ..data import save_call_record
 
 
 def verification_node(state: CallState) -> dict:
@@ -66,6 +67,12 @@ def verification_node(state: CallState) -> dict:
 
     # Max attempts reached (>= 4 means 3 failed attempts)
     if new_attempts >= 4:
+        save_call_record({
+            "customer_id": state["customer_id"],
+            "outcome": "verification_failed",
+            "payment_status": state.get("payment_status"),
+            "summary": f"Call ended. Identity verification failed after {attempts} attempts.",
+        })
         return {
             "verification_attempts": new_attempts,
             "is_verified": False,
@@ -0,0 +1,229 @@
+# src/profiling.py
+
+"""
+On-demand sampling profiler for production requests.
+
+A fraction of /api/chat requests ("chat") and graph invocations ("invoke")
+run under cProfile. Each profile is written to PROFILE_DIR as
+    <unix ms>-<target>-<stage>-<session id>.prof
+and can be read with `python -m pstats` or snakeviz. With memory profiling
+on, tracemalloc is started and each sampled request also writes
+    ....tracemalloc  the snapshot at its end (tracemalloc.Snapshot.load)
+    ....memory.txt   the top allocation growth during the request
+
+Configuration, from the environment at startup or at runtime via
+PUT /api/debug/profiling (see backend/routes/debug.py):
+- PROFILE_SAMPLE_RATE: fraction of requests profiled (default 0, off)
+- PROFILE_TARGETS: comma-separated, "chat" and/or "invoke" (default both)
+- PROFILE_MEMORY: 1 to add tracemalloc snapshots (slows every allocation
+  while on, profiled or not)
+- PROFILE_DIR (default .data/profiles), PROFILE_MAX_FILES (default 500,
+  oldest removed first)
+
+cProfile traces one thread, and this worker runs all turns on its event
+loop thread, so one request is profiled at a time; a sampled request that
+finds the profiler busy is skipped. Coroutines of other sessions that run
+while the profiled one awaits show up in its profile too.
+"""
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from src.utils.log import get_logger
+
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TARGETS = os.getenv("PROFILE_TARGETS", "chat,invoke")
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(".data", "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "500"))
+
+TARGETS = ("chat", "invoke")
+
+# Frames kept per tracemalloc allocation
+TRACEMALLOC_FRAMES = 10
+
+logger = get_logger(__name__)
+
+# Labels of the profile running in this context, if any (no nesting)
+_labels: ContextVar[Optional[dict]] = ContextVar("profile_labels", default=None)
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class Profiler:
+    """Samples requests into cProfile runs and writes them out."""
+
+    def __init__(
+        self,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        targets: str = PROFILE_TARGETS,
+        memory: bool = PROFILE_MEMORY,
+        directory: str = PROFILE_DIR,
+        max_files: int = PROFILE_MAX_FILES,
+    ):
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = 0.0
+        self.targets: frozenset = frozenset()
+        self.memory = False
+        # cProfile can only run one profile at a time per thread
+        self._busy = threading.Lock()
+        self.counters = {"profiled": 0, "skipped_busy": 0, "written": 0, "failed": 0}
+        self.configure(sample_rate=sample_rate, targets=targets, memory=memory)
+
+    def configure(
+        self,
+        sample_rate: Optional[float] = None,
+        targets: Optional[str] = None,
+        memory: Optional[bool] = None,
+    ) -> None:
+        """Change settings at runtime. Raises ValueError on bad values."""
+        if sample_rate is not None:
+            if not 0 <= sample_rate <= 1:
+                raise ValueError("sample_rate must be between 0 and 1")
+            self.sample_rate = sample_rate
+        if targets is not None:
+            names = frozenset(t.strip() for t in targets.split(",") if t.strip())
+            unknown = names - set(TARGETS)
+            if unknown:
+                raise ValueError(f"Unknown profile targets: {', '.join(sorted(unknown))}")
+            self.targets = names
+        if memory is not None:
+            self.memory = memory
+            if memory and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            elif not memory and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    @contextmanager
+    def profile(self, target: str, session_id: str, stage: Optional[str] = None):
+        """
+        Profile this block if it is sampled. Yields its labels, or None
+        when not profiling. label_profile() fills in labels known later.
+        """
+        if (
+            self.sample_rate <= 0
+            or target not in self.targets
+            or _labels.get() is not None
+            or random.random() >= self.sample_rate
+        ):
+            yield None
+            return
+        if not self._busy.acquire(blocking=False):
+            self.counters["skipped_busy"] += 1
+            yield None
+            return
+
+        labels = {"target": target, "session_id": session_id, "stage": stage or "unknown"}
+        token = _labels.set(labels)
+        memory = self.memory and tracemalloc.is_tracing()
+        before = tracemalloc.take_snapshot() if memory else None
+        profiler = cProfile.Profile()
+        started = time.time()
+        profiler.enable()
+        try:
+            yield labels
+        finally:
+            profiler.disable()
+            after = tracemalloc.take_snapshot() if memory else None
+            _labels.reset(token)
+            self._busy.release()
+            self.counters["profiled"] += 1
+            # Writing takes milliseconds; keep it off the request
+            threading.Thread(
+                target=self._write, args=(dict(labels), started, profiler, before, after), daemon=True
+            ).start()
+
+    def _write(self, labels: dict, started: float, profiler: cProfile.Profile, before, after) -> None:
+        name = "-".join([
+            str(int(started * 1000)),
+            labels["target"],
+            _UNSAFE.sub("_", str(labels["stage"])),
+            _UNSAFE.sub("_", labels["session_id"])[:36],
+        ])
+        base = os.path.join(self.directory, name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(base + ".prof")
+            if after is not None:
+                after.dump(base + ".tracemalloc")
+                growth = after.compare_to(before, "lineno")[:25]
+                with open(base + ".memory.txt", "w", encoding="utf-8") as f:
+                    f.write("\n".join(str(stat) for stat in growth) + "\n")
+            self.counters["written"] += 1
+            self._prune()
+        except OSError as e:
+            self.counters["failed"] += 1
+            logger.error("Writing profile %s failed: %s", name, e)
+
+    def _prune(self) -> None:
+        """Keep the newest max_files profiles (with their memory files)."""
+        profiles = sorted(f for f in os.listdir(self.directory) if f.endswith(".prof"))
+        for old in profiles[:max(0, len(profiles) - self.max_files)]:
+            base = os.path.join(self.directory, old[:-len(".prof")])
+            for suffix in (".prof", ".tracemalloc", ".memory.txt"):
+                try:
+                    os.remove(base + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def files(self, limit: int = 50) -> list[dict]:
+        """Newest profiles first."""
+        try:
+            names = sorted((f for f in os.listdir(self.directory) if f.endswith(".prof")), reverse=True)
+        except FileNotFoundError:
+            return []
+        return [
+            {"name": name, "size": os.path.getsize(os.path.join(self.directory, name))}
+            for name in names[:limit]
+        ]
+
+    def settings(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "targets": sorted(self.targets),
+            "memory": self.memory,
+            "directory": self.directory,
+            **self.counters,
+        }
+
+
+# =========================
+# Process-wide profiler
+# =========================
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Profiler:
+    """Return the process-wide profiler, creating it on first use."""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+
+def set_profiler(profiler: Profiler) -> None:
+    """Replace the process-wide profiler (tests)."""
+    global _profiler
+    _profiler = profiler
+
+
+def profiled(target: str, session_id: str, stage: Optional[str] = None):
+    """Shortcut for get_profiler().profile(...)."""
+    return get_profiler().profile(target, session_id, stage)
+
+
+def label_profile(**labels) -> None:
+    """Set labels (e.g. stage) of the profile running in this context, if any."""
+    current = _labels.get()
+    if current is not None:
+        current.update(labels)
@@ -0,0 +1,600 @@
+# src/records.py
+
+"""
+Record store for call outcomes: PTPs, disputes and call records.
+
+Backends:
+- SQLiteRecordStore (default): durable. Appends go to a queue and a
+  background writer commits them in batches (group commit), so callers
+  never wait on disk I/O. IDs come from blocks reserved in the database,
+  which keeps them unique across threads and worker processes. A failed
+  commit is retried up to RECORD_COMMIT_RETRIES times before its records
+  are reported lost.
+- MemoryRecordStore: process-local lists, for tests and local runs.
+
+Free-text fields listed in src/search.py (dispute reasons) are indexed as
+records are written and can be queried with search().
+
+Select with RECORD_STORE=sqlite|memory and RECORD_STORE_PATH.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Callable, Optional
+
+from src.search import InvertedIndex, SEARCH_FIELDS, fts5_query, query_terms, search_text
+from src.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+# Record kind -> ID prefix (IDs look like PTP0001, DSP0001, CALL0001)
+ID_PREFIXES = {
+    "ptp": "PTP",
+    "dispute": "DSP",
+    "call": "CALL",
+}
+
+DEFAULT_PATH = os.path.join(".data", "records.sqlite3")
+
+# SQLite search ranks only the newest matches, so a query that matches a
+# large share of the table (e.g. "paid") still answers in milliseconds.
+# Totals are always exact.
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "10000"))
+
+# Attempts after a failed group commit, with doubling delays
+RECORD_COMMIT_RETRIES = int(os.getenv("RECORD_COMMIT_RETRIES", "5"))
+
+
+class RecordWriteError(RuntimeError):
+    """Appended records could not be committed."""
+
+
+def format_record_id(kind: str, seq: int) -> str:
+    return f"{ID_PREFIXES[kind]}{seq:04d}"
+
+
+class RecordStore:
+    """Interface shared by record store backends."""
+
+    def append(self, kind: str, record: dict) -> str:
+        """Assign an ID, store the record and return the ID."""
+        raise NotImplementedError
+
+    def list(self, kind: str) -> list[dict]:
+        """All records of a kind, in ID order, including pending writes."""
+        raise NotImplementedError
+
+    def search(self, kind: str, query: str, offset: int = 0, limit: int = 20) -> tuple[int, list[dict]]:
+        """
+        Ranked full-text search over a kind's indexed fields.
+        Returns (total matches, one page of records), each with a "score".
+        """
+        raise NotImplementedError
+
+    def changes(self, kinds: tuple[str, ...], cursor: int = 0) -> tuple[int, list[tuple[str, dict]]]:
+        """
+        (kind, record) pairs of `kinds` stored after `cursor` (0: all), in
+        write order, and the cursor to pass next time. Only committed
+        records count, so every process sees the same sequence.
+        """
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """
+        Block until every appended record is durable. Raises
+        RecordWriteError if some of them could not be committed.
+        """
+
+    def close(self) -> None:
+        """Flush and release resources."""
+
+    def snapshot_records(self) -> Optional[dict[str, list[dict]]]:
+        """All records by kind for a snapshot; None if the store is durable."""
+        return None
+
+    def restore(self, load: Callable[[], dict[str, list[dict]]]) -> None:
+        """Load records from a snapshot. Durable stores ignore snapshots."""
+
+
+class MemoryRecordStore(RecordStore):
+    """
+    In-memory lists. Thread-safe; durable only through snapshots
+    (backend/snapshot.py), which restore() loads on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: dict[str, list[dict]] = {kind: [] for kind in ID_PREFIXES}
+        self._indexes: dict[str, InvertedIndex] = {kind: InvertedIndex() for kind in SEARCH_FIELDS}
+        # (kind, record) in write order, for changes()
+        self._log: list[tuple[str, dict]] = []
+        self._pending_restore: Optional[Callable[[], dict[str, list[dict]]]] = None
+
+    def restore(self, load: Callable[[], dict[str, list[dict]]]) -> None:
+        """
+        Register a snapshot to load before the next read or write. Restored
+        records keep their IDs and come before anything appended since.
+        """
+        with self._lock:
+            self._pending_restore = load
+
+    def _load_pending(self) -> None:
+        # Caller holds self._lock
+        load, self._pending_restore = self._pending_restore, None
+        if load is None:
+            return
+        for kind, restored in load().items():
+            if kind not in self._records:
+                continue
+            self._records[kind][:0] = restored
+            self._log[:0] = [(kind, record) for record in restored]
+            if kind in self._indexes:
+                index = self._indexes[kind] = InvertedIndex()
+                for record in self._records[kind]:
+                    text = search_text(kind, record)
+                    if text is not None:
+                        index.add(record["id"], text)
+
+    def snapshot_records(self) -> dict[str, list[dict]]:
+        with self._lock:
+            self._load_pending()
+            return {kind: list(records) for kind, records in self._records.items()}
+
+    def append(self, kind: str, record: dict) -> str:
+        with self._lock:
+            self._load_pending()
+            records = self._records[kind]
+            record_id = format_record_id(kind, len(records) + 1)
+            records.append({"id": record_id, **record})
+            self._log.append((kind, records[-1]))
+            text = search_text(kind, record)
+            if text is not None:
+                self._indexes[kind].add(record_id, text)
+        return record_id
+
+    def list(self, kind: str) -> list[dict]:
+        with self._lock:
+            self._load_pending()
+            return list(self._records[kind])
+
+    def changes(self, kinds: tuple[str, ...], cursor: int = 0) -> tuple[int, list[tuple[str, dict]]]:
+        with self._lock:
+            self._load_pending()
+            return len(self._log), [(kind, record) for kind, record in self._log[cursor:] if kind in kinds]
+
+    def search(self, kind: str, query: str, offset: int = 0, limit: int = 20) -> tuple[int, list[dict]]:
+        index = self._indexes.get(kind)
+        if index is None:
+            raise ValueError(f"Records of kind {kind!r} are not searchable")
+        with self._lock:
+            self._load_pending()
+            index = self._indexes[kind]
+            total, hits = index.search(query_terms(query), offset, limit)
+            records = self._records[kind]
+            # IDs are sequential, so the position is the sequence number
+            return total, [{**records[int(doc_id[len(ID_PREFIXES[kind]):]) - 1], "score": score}
+                           for doc_id, score in hits]
+
+
+_STOP = object()
+
+
+class _Flush:
+    """flush() marker: set once the records queued before it are settled."""
+
+    __slots__ = ("event", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error: Optional[RecordWriteError] = None
+
+    def done(self, error: Optional[RecordWriteError]) -> None:
+        self.error = error
+        self.event.set()
+
+
+class _Reserve:
+    """Asks the writer to reserve the next ID block of a kind."""
+
+    __slots__ = ("kind",)
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+
+class SQLiteRecordStore(RecordStore):
+    """
+    Durable SQLite backend with group commit.
+
+    append() allocates an ID under a lock and enqueues the record. The
+    writer thread drains the queue in batches of up to `batch_size`,
+    waiting at most `commit_interval` seconds to fill a batch, and commits
+    each batch in one transaction (one fsync per batch).
+
+    A batch whose commit fails is retried, ahead of newer records, up to
+    `max_retries` times with delays doubling from `retry_delay`. Records
+    stay listed as pending until committed; if the retries run out they
+    are logged as lost (listed only until the process exits) and the
+    flush() waiting on them raises.
+
+    ID blocks are reserved by the writer thread ahead of need: when a
+    kind's current block is half used, the next one is requested. append()
+    only reserves a block itself if it outruns the writer.
+
+    Searchable fields go into a contentless FTS5 table per kind
+    (search_<kind>, rowid = seq) in the same transaction, so
+    the index never disagrees with the records. Records still waiting for
+    their batch are listed but not yet searchable.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        batch_size: int = 256,
+        commit_interval: float = 0.005,
+        id_block_size: int = 1000,
+        max_retries: int = RECORD_COMMIT_RETRIES,
+        retry_delay: float = 0.05,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.id_block_size = id_block_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS records_kind_seq ON records (kind, seq)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sequences (kind TEXT PRIMARY KEY, next_seq INTEGER NOT NULL)")
+            self._create_search_index(conn)
+
+        self._id_lock = threading.Lock()
+        self._id_blocks: dict[str, tuple[int, int]] = {}  # kind -> (next, end)
+        self._next_blocks: dict[str, tuple[int, int]] = {}  # reserved ahead by the writer
+        self._reserving: set[str] = set()  # kinds with a reservation queued
+
+        self._queue: queue.Queue = queue.Queue()
+        self._pending_lock = threading.Lock()
+        self._pending: dict[str, dict] = {}
+        self.counters = {"committed": 0, "retried": 0, "lost": 0}
+        self._closed = False
+        # First blocks, so no append has to reserve one itself
+        for kind in ID_PREFIXES:
+            self._request_block(kind)
+        self._writer = threading.Thread(target=self._run_writer, name="record-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    @staticmethod
+    def _create_search_index(conn: sqlite3.Connection) -> None:
+        """Create the FTS5 tables, backfilling them from existing records on first run."""
+        for kind, fields in SEARCH_FIELDS.items():
+            table = f"search_{kind}"
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone():
+                continue
+            text = " || ' ' || ".join(f"coalesce(json_extract(data, '$.{field}'), '')" for field in fields)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                " text, content = '', tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            conn.execute(f"INSERT INTO {table} (rowid, text) SELECT seq, {text} FROM records WHERE kind = ?", (kind,))
+            conn.execute("COMMIT")
+
+    # ------------------------------------------------------------------
+    # ID allocation
+    # ------------------------------------------------------------------
+
+    def _next_seq(self, kind: str) -> int:
+        with self._id_lock:
+            next_seq, end = self._id_blocks.get(kind, (0, 0))
+            if next_seq >= end:
+                block = self._next_blocks.pop(kind, None)
+                if block is None:
+                    # Outran the writer's reservation: reserve inline
+                    with closing(self._connect()) as conn:
+                        block = self._reserve_block(conn, kind)
+                next_seq, end = block
+            self._id_blocks[kind] = (next_seq + 1, end)
+            if end - next_seq <= max(1, self.id_block_size // 2) and kind not in self._next_blocks:
+                self._request_block(kind)
+            return next_seq
+
+    def _request_block(self, kind: str) -> None:
+        if kind not in self._reserving:
+            self._reserving.add(kind)
+            self._queue.put(_Reserve(kind))
+
+    def _reserve_ahead(self, conn: sqlite3.Connection, kind: str) -> None:
+        """Writer side of _request_block()."""
+        try:
+            block = self._reserve_block(conn, kind)
+        except sqlite3.Error as e:
+            # The next append past the current block reserves inline
+            logger.error("Reserving %s IDs failed: %s", kind, e)
+            block = None
+        with self._id_lock:
+            self._reserving.discard(kind)
+            if block is not None:
+                self._next_blocks[kind] = block
+
+    def _reserve_block(self, conn: sqlite3.Connection, kind: str) -> tuple[int, int]:
+        """Claim the next `id_block_size` sequence numbers (one small transaction)."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next_seq FROM sequences WHERE kind = ?", (kind,)).fetchone()
+            if row is None:
+                # First block for this kind: continue after any existing records
+                max_seq = conn.execute("SELECT MAX(seq) FROM records WHERE kind = ?", (kind,)).fetchone()[0]
+                start = (max_seq or 0) + 1
+            else:
+                start = row[0]
+            end = start + self.id_block_size
+            conn.execute(
+                "INSERT INTO sequences (kind, next_seq) VALUES (?, ?) "
+                "ON CONFLICT(kind) DO UPDATE SET next_seq = excluded.next_seq",
+                (kind, end),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return start, end
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, kind: str, record: dict) -> str:
+        if self._closed:
+            raise RuntimeError("Record store is closed")
+        seq = self._next_seq(kind)
+        record_id = format_record_id(kind, seq)
+        row = (record_id, kind, seq, time.time(), json.dumps(record, ensure_ascii=False), search_text(kind, record))
+        with self._pending_lock:
+            self._pending[record_id] = {"kind": kind, "seq": seq, "record": {"id": record_id, **record}}
+        self._queue.put(row)
+        return record_id
+
+    def _run_writer(self) -> None:
+        conn = self._connect()
+        # A failed batch, its flush waiters and attempts so far; it is
+        # committed again, ahead of newer records, until it succeeds or
+        # runs out of retries
+        retry, retry_waiters, attempts = [], [], 0
+        stopping = False
+        try:
+            while True:
+                batch, waiters, reservations = list(retry), list(retry_waiters), []
+                if stopping:
+                    time.sleep(self.retry_delay * 2 ** (attempts - 1))
+                else:
+                    try:
+                        # With a batch to retry, wait for new records only until it is due
+                        item = self._queue.get(timeout=self.retry_delay * 2 ** (attempts - 1) if retry else None)
+                    except queue.Empty:
+                        item = None
+                    if item is _STOP:
+                        stopping = True
+                    elif item is not None:
+                        self._add_to_batch(item, batch, waiters, reservations)
+                        stopping = self._fill_batch(batch, waiters, reservations)
+
+                for kind in reservations:
+                    self._reserve_ahead(conn, kind)
+
+                error = self._commit(conn, batch)
+                if error is None:
+                    retry, retry_waiters, attempts = [], [], 0
+                elif attempts < self.max_retries:
+                    retry, retry_waiters, attempts = batch, waiters, attempts + 1
+                    self.counters["retried"] += len(batch)
+                    logger.warning(
+                        "Group commit of %d records failed (attempt %d of %d): %s",
+                        len(batch), attempts, self.max_retries + 1, error,
+                    )
+                    continue
+                else:
+                    self.counters["lost"] += len(batch)
+                    logger.error(
+                        "Group commit of %d records failed %d times, giving up: %s (records %s)",
+                        len(batch), attempts + 1, error, ", ".join(row[0] for row in batch),
+                    )
+                    retry, retry_waiters, attempts = [], [], 0
+
+                failure = None if error is None else RecordWriteError(f"Committing records failed: {error}")
+                for waiter in waiters:
+                    waiter.done(failure)
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _fill_batch(self, batch: list, waiters: list, reservations: list) -> bool:
+        """Add queued items for up to `commit_interval`. Returns True on _STOP."""
+        deadline = time.monotonic() + self.commit_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            if item is _STOP:
+                return True
+            self._add_to_batch(item, batch, waiters, reservations)
+        return False
+
+    @staticmethod
+    def _add_to_batch(item, batch: list, waiters: list, reservations: list) -> None:
+        if isinstance(item, _Flush):
+            waiters.append(item)
+        elif isinstance(item, _Reserve):
+            reservations.append(item.kind)
+        else:
+            batch.append(item)
+
+    def _commit(self, conn: sqlite3.Connection, batch: list) -> Optional[sqlite3.Error]:
+        """Commit a batch in one transaction. Returns the error if it failed."""
+        if not batch:
+            return None
+        try:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO records (id, kind, seq, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                (row[:5] for row in batch),
+            )
+            for kind in SEARCH_FIELDS:
+                conn.executemany(
+                    f"INSERT INTO search_{kind} (rowid, text) VALUES (?, ?)",
+                    ((row[2], row[5]) for row in batch if row[1] == kind),
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return e
+        self.counters["committed"] += len(batch)
+        with self._pending_lock:
+            for row in batch:
+                self._pending.pop(row[0], None)
+        return None
+
+    def flush(self) -> None:
+        if self._closed:
+            return
+        waiter = _Flush()
+        self._queue.put(waiter)
+        waiter.event.wait()
+        if waiter.error is not None:
+            raise waiter.error
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def list(self, kind: str) -> list[dict]:
+        with self._pending_lock:
+            pending = [p for p in self._pending.values() if p["kind"] == kind]
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT seq, id, data FROM records WHERE kind = ? ORDER BY seq", (kind,)
+            ).fetchall()
+        records = {seq: {"id": record_id, **json.loads(data)} for seq, record_id, data in rows}
+        for p in pending:
+            records[p["seq"]] = p["record"]
+        return [records[seq] for seq in sorted(records)]
+
+    def changes(self, kinds: tuple[str, ...], cursor: int = 0) -> tuple[int, list[tuple[str, dict]]]:
+        # Records are never deleted, and writers commit one at a time, so
+        # rowids only grow in commit order: max(rowid) is the cursor
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN")
+            end = conn.execute("SELECT coalesce(max(rowid), 0) FROM records").fetchone()[0]
+            rows = conn.execute(
+                f"SELECT kind, id, data FROM records WHERE rowid > ? AND rowid <= ?"
+                f" AND kind IN ({', '.join('?' * len(kinds))}) ORDER BY rowid",
+                (cursor, end, *kinds),
+            ).fetchall()
+            conn.execute("COMMIT")
+        return end, [(kind, {"id": record_id, **json.loads(data)}) for kind, record_id, data in rows]
+
+    def search(self, kind: str, query: str, offset: int = 0, limit: int = 20) -> tuple[int, list[dict]]:
+        if kind not in SEARCH_FIELDS:
+            raise ValueError(f"Records of kind {kind!r} are not searchable")
+        terms = query_terms(query)
+        if not terms:
+            return 0, []
+        match = fts5_query(terms)
+        table = f"search_{kind}"
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT count(*) FROM {table} WHERE {table} MATCH ?", (match,)).fetchone()[0]
+            if total == 0:
+                return 0, []
+            hits = conn.execute(
+                f"SELECT seq, score FROM ("
+                f" SELECT rowid AS seq, -bm25({table}) AS score FROM {table} WHERE {table} MATCH ?"
+                f" ORDER BY rowid DESC LIMIT ?)"
+                f" ORDER BY score DESC, seq DESC LIMIT ? OFFSET ?",
+                (match, max(SEARCH_RANK_WINDOW, offset + limit), limit, offset),
+            ).fetchall()
+            if not hits:
+                return total, []
+            data = dict(conn.execute(
+                f"SELECT seq, data FROM records WHERE kind = ? AND seq IN ({', '.join('?' * len(hits))})",
+                (kind, *(seq for seq, _ in hits)),
+            ).fetchall())
+        return total, [
+            {"id": format_record_id(kind, seq), **json.loads(data[seq]), "score": score}
+            for seq, score in hits
+        ]
+
+
+# =========================
+# Process-wide store
+# =========================
+_store: Optional[RecordStore] = None
+_store_lock = threading.Lock()
+
+
+def create_record_store() -> RecordStore:
+    """Build the store selected by RECORD_STORE / RECORD_STORE_PATH."""
+    backend = os.getenv("RECORD_STORE", "sqlite")
+    if backend == "memory":
+        return MemoryRecordStore()
+    if backend == "sqlite":
+        return SQLiteRecordStore(os.getenv("RECORD_STORE_PATH", DEFAULT_PATH))
+    raise ValueError(f"Unknown RECORD_STORE backend: {backend}")
+
+
+def get_record_store() -> RecordStore:
+    """Return the process-wide record store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_record_store()
+                atexit.register(_store.close)
+    return _store
+
+
+def set_record_store(store: RecordStore) -> None:
+    """Replace the process-wide store (tests, benchmarks)."""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,116 @@
+# src/search.py
+
+"""
+Full-text search over free-text record fields (e.g. dispute reasons).
+
+SQLiteRecordStore indexes these fields in an FTS5 table inside the records
+database; MemoryRecordStore uses the InvertedIndex below. Both rank with
+BM25 and share the tokenizer, so a query means the same thing on either.
+"""
+
+import math
+import re
+import unicodedata
+from typing import Optional
+
+
+# Record kind -> fields indexed for search
+SEARCH_FIELDS = {
+    "dispute": ("reason",),
+}
+
+MAX_QUERY_TERMS = 16
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with diacritics removed (matches FTS5 unicode61)."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+def search_text(kind: str, record: dict) -> Optional[str]:
+    """The indexed text of a record, or None if its kind isn't searchable."""
+    fields = SEARCH_FIELDS.get(kind)
+    if not fields:
+        return None
+    return " ".join(str(record.get(field) or "") for field in fields)
+
+
+def query_terms(query: str) -> list[str]:
+    """Distinct query tokens, in order, capped at MAX_QUERY_TERMS."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def fts5_query(terms: list[str]) -> str:
+    """
+    FTS5 MATCH expression requiring every term.
+    Terms are quoted, so user input can't inject FTS5 syntax.
+    """
+    return " ".join(f'"{term}"' for term in terms)
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index with BM25 ranking.
+    Documents are added incrementally; a query matches documents that
+    contain every term.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[str, int]] = {}  # term -> {doc_id: term frequency}
+        self._lengths: dict[str, int] = {}  # doc_id -> token count
+        self._order: dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_id: str, text: str) -> None:
+        tokens = tokenize(text)
+        self._lengths[doc_id] = len(tokens)
+        self._order[doc_id] = len(self._order)
+        self._total_length += len(tokens)
+        for token in tokens:
+            postings = self._postings.setdefault(token, {})
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+
+    def search(self, terms: list[str], offset: int = 0, limit: int = 20) -> tuple[int, list[tuple[str, float]]]:
+        """
+        Return (total matches, [(doc_id, score)]) for one page, best first.
+        Ties go to the most recently added document.
+        """
+        if not terms:
+            return 0, []
+        postings = [self._postings.get(term) for term in terms]
+        if not all(postings):
+            return 0, []
+
+        # Intersect starting from the rarest term
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates.intersection_update(p)
+            if not candidates:
+                return 0, []
+
+        n_docs = len(self._lengths)
+        avg_length = self._total_length / n_docs
+        scored = []
+        for doc_id in candidates:
+            length_norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+            score = 0.0
+            for p in postings:
+                tf = p[doc_id]
+                idf = math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5))
+                score += idf * tf * (self.k1 + 1) / (tf + length_norm)
+            scored.append((doc_id, score))
+
+        scored.sort(key=lambda hit: (-hit[1], -self._order[hit[0]]))
+        return len(scored), scored[offset:offset + limit]
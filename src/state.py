@@ -1,7 +1,9 @@
 # src/state.py
 
-from typing import TypedDict, List, Optional, Literal
+from typing import TypedDict, List, Optional, Literal, Annotated
+import uuid
 from src.data import get_customer_with_loan
+from src.crm import get_customer_with_loan_async
 
 
 Stage = Literal[
@@ -29,11 +31,23 @@ PaymentStatus = Literal[
 ]
 
 
+def merge_turn_analysis(left: Optional[dict], right: Optional[dict]) -> dict:
+    """
+    Reducer for `turn_analysis`: parallel analysis branches each write
+    their own keys within one superstep and the results are merged.
+    Writing None resets the analysis.
+    """
+    if right is None:
+        return {}
+    return {**(left or {}), **right}
+
+
 # =========================
 # Call State
 # =========================
 class CallState(TypedDict):
     # === Conversation ===
+    call_id: str
     messages: List[dict]
     stage: Stage
     turn_count: int
@@ -42,6 +56,12 @@ class CallState(TypedDict):
     has_greeted: bool
     has_disclosed: bool  
     
+    # === History (see src/memory.py) ===
+    history_summary: Optional[dict]
+    archived_message_count: int
+    # Messages folded this turn, until the session store archives them
+    pending_archive: Optional[List[dict]]
+    
     # === Customer Info ===
     customer_id: str
     customer_name: str
@@ -73,6 +93,7 @@ class CallState(TypedDict):
     # === Negotiation ===
     offered_plans: List[dict]
     selected_plan: Optional[dict]
+    turn_analysis: Annotated[dict, merge_turn_analysis]
     
     # === Call Outcome ===
     call_outcome: Optional[str]
@@ -90,7 +111,22 @@ def create_initial_state(phone: str) -> Optional[CallState]:
     Create initial CallState using mock customer + loan data.
     Returns None if customer not found.
     """
-    data = get_customer_with_loan(phone)
+    return build_initial_state(get_customer_with_loan(phone))
+
+
+async def create_initial_state_async(phone: str) -> Optional[CallState]:
+    """
+    Create initial CallState through the async CRM client (src/crm.py).
+    Returns None if customer not found.
+    """
+    return build_initial_state(await get_customer_with_loan_async(phone))
+
+
+def build_initial_state(data: Optional[dict]) -> Optional[CallState]:
+    """
+    Build the initial CallState from a {"customer", "loan"} lookup result.
+    Returns None if there is no result.
+    """
     if not data:
         return None
     
@@ -99,6 +135,7 @@ def create_initial_state(phone: str) -> Optional[CallState]:
     
     return CallState(
         # Conversation
+        call_id=uuid.uuid4().hex,
         messages=[],
         stage="init",
         turn_count=0,
@@ -107,6 +144,10 @@ def create_initial_state(phone: str) -> Optional[CallState]:
         has_greeted=False,
         has_disclosed=False,
         
+        # History
+        history_summary=None,
+        archived_message_count=0,
+        
         # Customer
         customer_id=customer["id"],
         customer_name=customer["name"],
@@ -138,6 +179,7 @@ def create_initial_state(phone: str) -> Optional[CallState]:
         # Negotiation
         offered_plans=[],
         selected_plan=None,
+        turn_analysis={},
         
         # Outcome
         call_outcome=None,
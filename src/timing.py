@@ -0,0 +1,114 @@
+# src/timing.py
+
+"""
+Per-turn latency breakdown for Server-Timing headers.
+
+turn_timings() starts collecting for one request and holds the collector
+in a ContextVar, so it reaches every graph node, LLM call and record write
+made for the turn (asyncio tasks and LangGraph's worker threads inherit
+the context). timed(name) adds one entry; outside a turn it only checks
+the ContextVar.
+
+Entries keep their order. A name seen again in the same turn gets a
+numeric suffix, e.g. node-negotiation and node-negotiation-2.
+"""
+
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+_timings: ContextVar[Optional["TurnTimings"]] = ContextVar("turn_timings", default=None)
+
+
+class TurnTimings:
+    """Timed steps of one request."""
+
+    __slots__ = ("started", "entries", "_seen")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (name, duration in ms, description)
+        self.entries: list[tuple[str, float, Optional[str]]] = []
+        self._seen: dict[str, int] = {}
+
+    def add(self, name: str, duration_ms: float, desc: Optional[str] = None) -> None:
+        count = self._seen.get(name, 0) + 1
+        self._seen[name] = count
+        self.entries.append((name if count == 1 else f"{name}-{count}", duration_ms, desc))
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self) -> str:
+        """Server-Timing value, with the request's total last."""
+        parts = []
+        for name, duration_ms, desc in self.entries:
+            part = f"{name};dur={duration_ms:.1f}"
+            if desc:
+                part += f';desc="{desc}"'
+            parts.append(part)
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+    def to_list(self) -> list[dict]:
+        """The entries as the optional `timings` response field."""
+        return [
+            {"name": name, "duration_ms": round(duration_ms, 3), **({"desc": desc} if desc else {})}
+            for name, duration_ms, desc in self.entries
+        ]
+
+
+@contextmanager
+def turn_timings():
+    """Collect timings for the request handled in this block."""
+    timings = TurnTimings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current_timings() -> Optional[TurnTimings]:
+    return _timings.get()
+
+
+def record_timing(name: str, duration_ms: float, desc: Optional[str] = None) -> None:
+    """Add an already measured entry to the current turn, if one is collecting."""
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, duration_ms, desc)
+
+
+@contextmanager
+def timed(name: str, desc: Optional[str] = None):
+    """Time this block as `name` in the current turn, if one is collecting."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - started) * 1000, desc)
+
+
+def timed_node(name: str, fn):
+    """Wrap a graph node so each run is timed as node-<name>. Keeps sync nodes sync."""
+    label = f"node-{name}"
+
+    if inspect.iscoroutinefunction(fn):
+        async def node(state):
+            with timed(label):
+                return await fn(state)
+    else:
+        def node(state):
+            with timed(label):
+                return fn(state)
+
+    node.__name__ = fn.__name__
+    return node
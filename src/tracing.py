@@ -0,0 +1,206 @@
+# src/tracing.py
+
+"""
+Opt-in execution tracer for the compiled graph.
+
+Records, per turn, which nodes ran, their wall time, the state keys they
+wrote and the superstep (recursion depth) they ran at. Warns when a turn
+gets close to the recursion limit or keeps re-entering the same node.
+"""
+
+import inspect
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from src.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+_current_turn: ContextVar[Optional["TurnTrace"]] = ContextVar("current_turn", default=None)
+
+
+class TurnTrace:
+    """Node spans for one graph invocation of one session."""
+
+    __slots__ = ("session_id", "started_at", "duration_ms", "spans", "warnings", "error")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.duration_ms = None
+        self.spans = []
+        self.warnings = []
+        self.error = None
+
+    @property
+    def depth(self) -> int:
+        """Highest superstep reached in this turn."""
+        return max((span["step"] for span in self.spans), default=0)
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "depth": self.depth,
+            "nodes": [span["node"] for span in self.spans],
+            "spans": list(self.spans),
+            "warnings": list(self.warnings),
+            "error": self.error,
+        }
+
+
+class GraphTracer:
+    """
+    Wraps graph nodes to time them and keeps the last turns per session.
+
+    Usage:
+        tracer = GraphTracer(recursion_limit=25)
+        graph.add_node("greeting", tracer.wrap("greeting", greeting_node))
+        with tracer.turn(session_id):
+            await app.ainvoke(state, config)
+    """
+
+    def __init__(
+        self,
+        recursion_limit: int,
+        warn_ratio: float = 0.8,
+        repeat_threshold: int = 4,
+        max_turns_per_session: int = 50,
+        max_sessions: int = 1000,
+    ):
+        self.recursion_limit = recursion_limit
+        self.warn_depth = max(1, int(recursion_limit * warn_ratio))
+        self.repeat_threshold = repeat_threshold
+        self.max_turns_per_session = max_turns_per_session
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, deque] = OrderedDict()
+        self._node_stats: dict[str, dict] = {}
+
+    # ------------------------------------------------------------------
+    # Node wrapping
+    # ------------------------------------------------------------------
+
+    def wrap(self, name: str, fn):
+        """
+        Return a node that records a span into the current turn.
+        Runs the original node untouched when no turn is being traced.
+        Sync nodes stay sync, so LangGraph still runs them in its executor.
+        """
+        # No functools.wraps: LangGraph inspects the signature to decide
+        # whether to pass `config`, and we need it for the superstep.
+        if inspect.iscoroutinefunction(fn):
+            async def traced(state, config: RunnableConfig):
+                turn = _current_turn.get()
+                if turn is None:
+                    return await fn(state)
+                started = time.perf_counter()
+                try:
+                    result = await fn(state)
+                finally:
+                    duration_ms = (time.perf_counter() - started) * 1000
+                return self._finish(turn, name, config, duration_ms, result)
+        else:
+            def traced(state, config: RunnableConfig):
+                turn = _current_turn.get()
+                if turn is None:
+                    return fn(state)
+                started = time.perf_counter()
+                try:
+                    result = fn(state)
+                finally:
+                    duration_ms = (time.perf_counter() - started) * 1000
+                return self._finish(turn, name, config, duration_ms, result)
+
+        traced.__name__ = f"traced_{name}"
+        return traced
+
+    def _finish(self, turn: TurnTrace, name: str, config: RunnableConfig, duration_ms: float, result):
+        step = (config or {}).get("metadata", {}).get("langgraph_step", len(turn.spans) + 1)
+        self._record(turn, name, step, duration_ms, sorted((result or {}).keys()))
+        return result
+
+    def _record(self, turn: TurnTrace, node: str, step: int, duration_ms: float, keys: list) -> None:
+        turn.spans.append({
+            "node": node,
+            "step": step,
+            "duration_ms": round(duration_ms, 3),
+            "keys": keys,
+        })
+
+        stats = self._node_stats.setdefault(node, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["calls"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+        if step == self.warn_depth:
+            self._warn(turn, f"depth {step} of recursion limit {self.recursion_limit} reached")
+
+        repeats = sum(1 for span in turn.spans if span["node"] == node)
+        if repeats == self.repeat_threshold:
+            self._warn(turn, f"node '{node}' ran {repeats} times in one turn (possible loop)")
+
+    def _warn(self, turn: TurnTrace, message: str) -> None:
+        turn.warnings.append(message)
+        logger.warning("%s", message, extra={"session_id": turn.session_id})
+
+    # ------------------------------------------------------------------
+    # Turn scoping
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def turn(self, session_id: str):
+        """Trace every node executed inside this block as one turn."""
+        trace = TurnTrace(session_id)
+        token = _current_turn.set(trace)
+        started = time.perf_counter()
+        try:
+            yield trace
+        except Exception as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _current_turn.reset(token)
+            self._store(trace)
+
+    def _store(self, trace: TurnTrace) -> None:
+        turns = self._sessions.get(trace.session_id)
+        if turns is None:
+            turns = deque(maxlen=self.max_turns_per_session)
+            self._sessions[trace.session_id] = turns
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(trace.session_id)
+        turns.append(trace)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def get_traces(self, session_id: str) -> Optional[list[dict]]:
+        """Return recorded turns for a session, oldest first."""
+        turns = self._sessions.get(session_id)
+        if turns is None:
+            return None
+        return [trace.to_dict() for trace in turns]
+
+    def node_stats(self) -> dict:
+        """Per-node call count and timings across all traced turns, hottest first."""
+        rows = {
+            node: {
+                "calls": stats["calls"],
+                "total_ms": round(stats["total_ms"], 3),
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 3),
+                "max_ms": round(stats["max_ms"], 3),
+            }
+            for node, stats in self._node_stats.items()
+        }
+        return dict(sorted(rows.items(), key=lambda item: item[1]["total_ms"], reverse=True))
@@ -6,10 +6,17 @@ Rule-based patterns act as quick shortcuts for obvious cases.
 """
 
 from dotenv import load_dotenv
+import asyncio
 import os
 
+from ..deadline import llm_budget, record_fallback
+from ..timing import record_timing, timed
+from .log import get_logger
+
 load_dotenv()
 
+logger = get_logger(__name__)
+
 # ------------------------------------------------------------------
 # Configuration
 # ------------------------------------------------------------------
@@ -62,7 +69,7 @@ def get_gemini_model():
     last_error = None
     for model_name in GEMINI_MODELS_TO_TRY:
         try:
-            print(f"[GEMINI] Trying model: {model_name}")
+            logger.debug("Trying Gemini model %s", model_name)
             model = genai.GenerativeModel(model_name)
             
             # Test it with a simple generation
@@ -72,20 +79,80 @@ def get_gemini_model():
             )
             
             if test_response and test_response.text:
-                print(f"[GEMINI] ✅ Successfully initialized model: {model_name}")
+                logger.info("Initialized Gemini model %s", model_name)
                 _model_cache = model
                 _working_model_name = model_name
                 return _model_cache
                 
         except Exception as e:
             last_error = e
-            print(f"[GEMINI] ❌ Model {model_name} failed: {str(e)[:100]}")
+            logger.warning("Gemini model %s failed: %.100s", model_name, e)
             continue
     
     # If all models fail, raise the last error
     raise RuntimeError(f"All Gemini models failed. Last error: {last_error}")
 
 
+async def get_gemini_model_async():
+    """
+    Async counterpart of get_gemini_model().
+    The first (blocking) initialization runs in a worker thread so the
+    event loop keeps serving other conversations meanwhile.
+    """
+    if _model_cache is not None:
+        return _model_cache
+    return await asyncio.to_thread(get_gemini_model)
+
+
+class DeadlineSkipError(Exception):
+    """The turn's remaining budget is too small to start an LLM call."""
+
+
+class ModelInitError(Exception):
+    """Gemini could not be initialized (no API key, no working model)."""
+
+
+async def generate_within_deadline(contents, *, label: str = "llm", **kwargs):
+    """
+    Call Gemini within the current turn's budget (see src/deadline.py).
+    Raises DeadlineSkipError without calling when the budget is too small,
+    ModelInitError when Gemini cannot be initialized, and
+    asyncio.TimeoutError when the call (including a first model
+    initialization) runs past it. Callers fall back in all three cases.
+    The call is timed as llm-<label> for Server-Timing (src/timing.py),
+    with any wait for model initialization as llm-<label>-wait.
+    """
+    budget = llm_budget()
+    if budget == 0:
+        record_timing(f"llm-{label}", 0.0, "skipped")
+        raise DeadlineSkipError("Turn deadline too close for an LLM call")
+
+    async def call():
+        if _model_cache is None:
+            with timed(f"llm-{label}-wait", "model init"):
+                try:
+                    model = await get_gemini_model_async()
+                except Exception as e:
+                    raise ModelInitError(str(e)) from e
+        else:
+            model = _model_cache
+        with timed(f"llm-{label}"):
+            return await model.generate_content_async(contents, **kwargs)
+
+    if budget is None:
+        return await call()
+    return await asyncio.wait_for(call(), budget)
+
+
+def fallback_reason(error: Exception) -> str:
+    """Metrics label for why an LLM call fell back."""
+    if isinstance(error, DeadlineSkipError):
+        return "budget"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    return "error"
+
+
 def safe_get_response_text(response):
     """
     Safely extract text from Gemini response, handling all safety filter cases.
@@ -96,12 +163,12 @@ def safe_get_response_text(response):
         if hasattr(response, 'prompt_feedback'):
             if hasattr(response.prompt_feedback, 'block_reason'):
                 if response.prompt_feedback.block_reason:
-                    print(f"[GEMINI] Prompt blocked: {response.prompt_feedback.block_reason}")
+                    logger.warning("Gemini prompt blocked: %s", response.prompt_feedback.block_reason)
                     return None, True
         
         # Check if candidates exist
         if not response.candidates or len(response.candidates) == 0:
-            print("[GEMINI] No candidates in response")
+            logger.warning("No candidates in Gemini response")
             return None, True
         
         candidate = response.candidates[0]
@@ -122,7 +189,7 @@ def safe_get_response_text(response):
                 # Check for blocking reasons (SAFETY, RECITATION, OTHER, or dangerous_content)
                 blocking_reasons = ['SAFETY', 'RECITATION', 'OTHER', 'dangerous_content']
                 if any(reason in finish_reason_str.upper() for reason in blocking_reasons):
-                    print(f"[GEMINI] Candidate blocked: {finish_reason_str}")
+                    logger.warning("Gemini candidate blocked: %s", finish_reason_str)
                     return None, True
         
         # Try multiple methods to get text
@@ -135,7 +202,7 @@ def safe_get_response_text(response):
                 if parts and len(parts) > 0:
                     text = ''.join([part.text for part in parts if hasattr(part, 'text')])
         except (KeyError, AttributeError) as e:
-            print(f"[GEMINI] Error accessing content.parts: {e}")
+            logger.debug("Could not read content.parts: %s", e)
         
         # Method 2: Try direct text access
         if not text:
@@ -143,7 +210,7 @@ def safe_get_response_text(response):
                 if hasattr(response, 'text') and response.text:
                     text = response.text
             except (KeyError, AttributeError, ValueError) as e:
-                print(f"[GEMINI] Error accessing response.text: {e}")
+                logger.debug("Could not read response.text: %s", e)
         
         # Method 3: Try candidate.text
         if not text:
@@ -151,33 +218,36 @@ def safe_get_response_text(response):
                 if hasattr(candidate, 'text'):
                     text = candidate.text
             except (KeyError, AttributeError) as e:
-                print(f"[GEMINI] Error accessing candidate.text: {e}")
+                logger.debug("Could not read candidate.text: %s", e)
         
         if text and len(text.strip()) > 0:
             return text.strip(), False
         
-        print("[GEMINI] No text found in response")
+        logger.warning("No text found in Gemini response")
         return None, True
         
     except Exception as e:
-        print(f"[GEMINI] Unexpected error extracting text: {type(e).__name__} - {e}")
+        logger.warning("Unexpected error extracting Gemini text: %s - %s", type(e).__name__, e)
         return None, True
 
 
-def classify_intent_with_gemini(prompt: str) -> str:
-    """
-    Use Gemini to intelligently classify customer intent.
-    Returns one of the ALLOWED_INTENTS.
-    """
-    
-    try:
-        model = get_gemini_model()
-    except Exception as e:
-        print(f"Error initializing Gemini: {e}")
-        return classify_intent_rule_based(prompt)
+SAFETY_SETTINGS = {
+    'HARASSMENT': 'BLOCK_NONE',
+    'HATE_SPEECH': 'BLOCK_NONE',
+    'SEXUALLY_EXPLICIT': 'BLOCK_NONE',
+    'DANGEROUS_CONTENT': 'BLOCK_NONE',
+}
+
+CLASSIFICATION_CONFIG = {
+    'temperature': 0.1,
+    'max_output_tokens': 10,
+}
+
 
+def build_classification_prompt(prompt: str) -> str:
+    """Build the Gemini prompt used for intent classification."""
     # Simplified prompt to avoid safety filters
-    llm_prompt = f"""Classify this customer response in a debt collection call.
+    return f"""Classify this customer response in a debt collection call.
 
 Response: "{prompt}"
 
@@ -195,82 +265,110 @@ Return ONE word only: paid, disputed, callback, unable, or willing
 
 Classification:"""
 
+
+def fallback_intent(prompt: str) -> str:
+    """
+    Best-effort intent when Gemini is unavailable or blocked.
+    Rule-based first, then keyword heuristics, then 'willing'.
+    """
+    rule_intent = classify_intent_rule_based(prompt)
+    
+    # If rule-based found something, use it
+    if rule_intent != "unknown":
+        return rule_intent
+    
+    # Smart fallback: check for common patterns
+    text_lower = prompt.lower()
+    dispute_keywords = ["not right", "doesnt seem", "doesn't seem", "wrong", "mistake", "not mine", "never took", "didn't take"]
+    if any(kw in text_lower for kw in dispute_keywords):
+        return "disputed"
+    
+    # If they mention payment but can't pay full, they're willing to negotiate
+    if any(phrase in text_lower for phrase in ["can't pay", "cant pay", "cannot pay", "pay", "payment"]):
+        if any(phrase in text_lower for phrase in ["full", "all", "complete", "entire"]):
+            return "willing"  # Willing to pay partial/negotiate
+    
+    # Default to willing (most common case - customer wants to work something out)
+    return "willing"
+
+
+def interpret_classification(prompt: str, response) -> str:
+    """
+    Turn a Gemini classification response into one of the ALLOWED_INTENTS.
+    """
+    text, was_blocked = safe_get_response_text(response)
+    
+    if was_blocked or not text:
+        logger.info("Gemini classification blocked, using rule-based fallback")
+        return fallback_intent(prompt)
+    
+    intent = text.strip().lower()
+    
+    # Validate response
+    if intent in ALLOWED_INTENTS:
+        return intent
+    
+    # Try to extract valid intent from response
+    for valid_intent in ALLOWED_INTENTS:
+        if valid_intent in intent:
+            return valid_intent
+    
+    # Fallback
+    logger.warning("Gemini returned unexpected intent %r", intent)
+    rule_intent = classify_intent_rule_based(prompt)
+    return rule_intent if rule_intent != "unknown" else "disputed"
+
+
+def classify_intent_with_gemini(prompt: str) -> str:
+    """
+    Use Gemini to intelligently classify customer intent.
+    Returns one of the ALLOWED_INTENTS.
+    """
+    
+    try:
+        model = get_gemini_model()
+    except Exception as e:
+        logger.warning("Error initializing Gemini: %s", e)
+        return classify_intent_rule_based(prompt)
+
     try:
         response = model.generate_content(
-            llm_prompt,
-            generation_config={
-                'temperature': 0.1,
-                'max_output_tokens': 10,
-            },
-            safety_settings={
-                'HARASSMENT': 'BLOCK_NONE',
-                'HATE_SPEECH': 'BLOCK_NONE',
-                'SEXUALLY_EXPLICIT': 'BLOCK_NONE',
-                'DANGEROUS_CONTENT': 'BLOCK_NONE',
-            }
+            build_classification_prompt(prompt),
+            generation_config=CLASSIFICATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
         )
-        
-        text, was_blocked = safe_get_response_text(response)
-        
-        if was_blocked or not text:
-            print("Gemini classification blocked, using rule-based fallback")
-            rule_intent = classify_intent_rule_based(prompt)
-            
-            # If rule-based found something, use it
-            if rule_intent != "unknown":
-                return rule_intent
-            
-            # Smart fallback for blocked cases
-            text_lower = prompt.lower()
-            dispute_keywords = ["not right", "doesnt seem", "doesn't seem", "wrong", "mistake", "not mine", "never took", "didn't take"]
-            if any(kw in text_lower for kw in dispute_keywords):
-                return "disputed"
-            
-            # If they mention payment but can't pay full, they're willing to negotiate
-            if any(phrase in text_lower for phrase in ["can't pay", "cant pay", "cannot pay", "pay", "payment"]):
-                if any(phrase in text_lower for phrase in ["full", "all", "complete", "entire"]):
-                    return "willing"  # Willing to pay partial/negotiate
-            
-            # Default to willing (most common case)
-            return "willing"
-        
-        intent = text.strip().lower()
-        
-        # Validate response
-        if intent in ALLOWED_INTENTS:
-            return intent
-        
-        # Try to extract valid intent from response
-        for valid_intent in ALLOWED_INTENTS:
-            if valid_intent in intent:
-                return valid_intent
-        
-        # Fallback
-        print(f"Warning: Gemini returned unexpected intent '{intent}'")
-        rule_intent = classify_intent_rule_based(prompt)
-        return rule_intent if rule_intent != "unknown" else "disputed"
+        return interpret_classification(prompt, response)
         
     except Exception as e:
-        print(f"Error in Gemini classification: {e}")
-        rule_intent = classify_intent_rule_based(prompt)
-        
-        # If rule-based found something, use it
-        if rule_intent != "unknown":
-            return rule_intent
-        
-        # Smart fallback: check for common patterns
-        text_lower = prompt.lower()
-        dispute_keywords = ["not right", "doesnt seem", "doesn't seem", "wrong", "mistake", "not mine", "never took", "didn't take"]
-        if any(kw in text_lower for kw in dispute_keywords):
-            return "disputed"
-        
-        # If they mention payment but can't pay full, they're willing to negotiate
-        if any(phrase in text_lower for phrase in ["can't pay", "cant pay", "cannot pay", "pay", "payment"]):
-            if any(phrase in text_lower for phrase in ["full", "all", "complete", "entire"]):
-                return "willing"  # Willing to pay partial/negotiate
-        
-        # Default to willing (most common case - customer wants to work something out)
-        return "willing"
+        logger.warning("Gemini classification failed: %s", e)
+        return fallback_intent(prompt)
+
+
+async def classify_intent_with_gemini_async(prompt: str) -> str:
+    """
+    Async variant of classify_intent_with_gemini().
+    Awaits the Gemini call instead of blocking the event loop.
+    """
+    
+    try:
+        response = await generate_within_deadline(
+            build_classification_prompt(prompt),
+            label="intent",
+            generation_config=CLASSIFICATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
+        )
+        return interpret_classification(prompt, response)
+
+    except ModelInitError as e:
+        # Same as the sync path: "unknown" is mapped to "unable" downstream
+        logger.warning("Error initializing Gemini: %s", e)
+        record_fallback("intent", fallback_reason(e))
+        return classify_intent_rule_based(prompt)
+
+    except Exception as e:
+        logger.warning("Gemini classification failed: %s", e)
+        record_fallback("intent", fallback_reason(e))
+        return fallback_intent(prompt)
 
 
 # ------------------------------------------------------------------
@@ -386,12 +484,31 @@ def classify_intent(prompt: str) -> str:
     rule_intent = classify_intent_rule_based(prompt)
     
     if rule_intent in ALLOWED_INTENTS:
-        print(f"[INTENT] Rule-based: {rule_intent}")
+        logger.debug("Rule-based intent: %s", rule_intent)
         return rule_intent
     
-    print(f"[INTENT] Using Gemini for: '{prompt[:50]}...'")
+    logger.debug("Classifying with Gemini: %.50r", prompt)
     gemini_intent = classify_intent_with_gemini(prompt)
-    print(f"[INTENT] Gemini classified as: {gemini_intent}")
+    logger.debug("Gemini intent: %s", gemini_intent)
+    
+    return gemini_intent
+
+
+async def classify_intent_async(prompt: str) -> str:
+    """
+    Async variant of classify_intent(). Same strategy, but the Gemini
+    call is awaited so other conversations progress while it runs.
+    """
+    
+    rule_intent = classify_intent_rule_based(prompt)
+    
+    if rule_intent in ALLOWED_INTENTS:
+        logger.debug("Rule-based intent: %s", rule_intent)
+        return rule_intent
+    
+    logger.debug("Classifying with Gemini: %.50r", prompt)
+    gemini_intent = await classify_intent_with_gemini_async(prompt)
+    logger.debug("Gemini intent: %s", gemini_intent)
     
     return gemini_intent
 
@@ -400,6 +517,36 @@ def classify_intent(prompt: str) -> str:
 # Response generation (for negotiation node)
 # ------------------------------------------------------------------
 
+NEGOTIATION_CONFIG = {
+    'temperature': 0.7,
+    'max_output_tokens': 150,
+}
+
+PLANS_CONFIG = {
+    'temperature': 0.3,
+    'max_output_tokens': 500,
+}
+
+
+def build_negotiation_prompt(context: str) -> str:
+    """Wrap negotiation context in the safer prompt structure."""
+    # Simplified, safer prompt structure
+    return f"""{context}
+
+Respond professionally in 2-3 sentences."""
+
+
+def interpret_negotiation_response(response) -> str:
+    """Extract the negotiation reply, raising if blocked or too short."""
+    text, was_blocked = safe_get_response_text(response)
+    
+    if was_blocked or not text or len(text.strip()) < 20:
+        logger.info("Gemini response blocked or incomplete, using template")
+        raise Exception("Blocked or incomplete response")
+    
+    return text
+
+
 def generate_negotiation_response(context: str) -> str:
     """
     Generate intelligent, conversational responses for negotiation.
@@ -409,50 +556,45 @@ def generate_negotiation_response(context: str) -> str:
     try:
         model = get_gemini_model()
         
-        # Simplified, safer prompt structure
-        safe_prompt = f"""{context}
-
-Respond professionally in 2-3 sentences."""
-        
         response = model.generate_content(
-            safe_prompt,
-            generation_config={
-                'temperature': 0.7,
-                'max_output_tokens': 150,
-            },
-            safety_settings={
-                'HARASSMENT': 'BLOCK_NONE',
-                'HATE_SPEECH': 'BLOCK_NONE',
-                'SEXUALLY_EXPLICIT': 'BLOCK_NONE',
-                'DANGEROUS_CONTENT': 'BLOCK_NONE',
-            }
+            build_negotiation_prompt(context),
+            generation_config=NEGOTIATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
         )
-        
-        text, was_blocked = safe_get_response_text(response)
-        
-        if was_blocked or not text or len(text.strip()) < 20:
-            print("Warning: Gemini response blocked or incomplete, using template")
-            raise Exception("Blocked or incomplete response")
-        
-        return text
+        return interpret_negotiation_response(response)
         
     except Exception as e:
-        print(f"Error generating negotiation response: {e}")
+        logger.warning("Negotiation response failed: %s", e)
         # Return None to signal fallback needed
         return None
 
 
-def generate_payment_plans(outstanding_amount: float, customer_name: str) -> list:
+async def generate_negotiation_response_async(context: str) -> str:
     """
-    Generate 2-3 payment plan options using Gemini.
-    Falls back to rule-based plans if Gemini fails.
+    Async variant of generate_negotiation_response().
+    Returns None to signal that the template fallback is needed.
     """
     
     try:
-        model = get_gemini_model()
+        response = await generate_within_deadline(
+            build_negotiation_prompt(context),
+            label="negotiation",
+            generation_config=NEGOTIATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
+        )
+        return interpret_negotiation_response(response)
         
-        # Safer prompt structure
-        prompt = f"""Create 2-3 payment plans for a debt of ₹{outstanding_amount:,.0f}.
+    except Exception as e:
+        logger.warning("Negotiation response failed: %s", e)
+        record_fallback("negotiation", fallback_reason(e))
+        # Return None to signal fallback needed
+        return None
+
+
+def build_plans_prompt(outstanding_amount: float) -> str:
+    """Build the Gemini prompt that asks for payment plan options."""
+    # Safer prompt structure
+    return f"""Create 2-3 payment plans for a debt of ₹{outstanding_amount:,.0f}.
 
 Return JSON array only:
 [
@@ -461,47 +603,74 @@ Return JSON array only:
 
 Generate plans:"""
 
+
+def interpret_plans_response(response) -> list:
+    """Parse the plan list out of a Gemini response, raising if invalid."""
+    text, was_blocked = safe_get_response_text(response)
+    
+    if was_blocked or not text:
+        logger.info("Plan generation blocked, using fallback")
+        raise Exception("Response blocked")
+    
+    # Extract JSON
+    import json
+    import re
+    
+    json_match = re.search(r'\[\s*\{.*?\}\s*\]', text, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(0)
+        plans = json.loads(json_str)
+        
+        if isinstance(plans, list) and len(plans) > 0:
+            for plan in plans:
+                if 'name' not in plan or 'description' not in plan:
+                    raise Exception("Invalid plan structure")
+            
+            logger.debug("Generated %d payment plans", len(plans))
+            return plans
+    
+    raise Exception("Could not extract valid JSON")
+
+
+def generate_payment_plans(outstanding_amount: float, customer_name: str) -> list:
+    """
+    Generate 2-3 payment plan options using Gemini.
+    Falls back to rule-based plans if Gemini fails.
+    """
+    
+    try:
+        model = get_gemini_model()
+        
         response = model.generate_content(
-            prompt,
-            generation_config={
-                'temperature': 0.3,
-                'max_output_tokens': 500,
-            },
-            safety_settings={
-                'HARASSMENT': 'BLOCK_NONE',
-                'HATE_SPEECH': 'BLOCK_NONE',
-                'SEXUALLY_EXPLICIT': 'BLOCK_NONE',
-                'DANGEROUS_CONTENT': 'BLOCK_NONE',
-            }
+            build_plans_prompt(outstanding_amount),
+            generation_config=PLANS_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
         )
+        return interpret_plans_response(response)
         
-        text, was_blocked = safe_get_response_text(response)
-        
-        if was_blocked or not text:
-            print("Warning: Plan generation blocked, using fallback")
-            raise Exception("Response blocked")
-        
-        # Extract JSON
-        import json
-        import re
-        
-        json_match = re.search(r'\[\s*\{.*?\}\s*\]', text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            plans = json.loads(json_str)
-            
-            if isinstance(plans, list) and len(plans) > 0:
-                for plan in plans:
-                    if 'name' not in plan or 'description' not in plan:
-                        raise Exception("Invalid plan structure")
-                
-                print(f"[PLANS] Generated {len(plans)} payment plans")
-                return plans
-        
-        raise Exception("Could not extract valid JSON")
+    except Exception as e:
+        logger.warning("Payment plan generation failed: %s", e)
+        return generate_fallback_plans(outstanding_amount)
+
+
+async def generate_payment_plans_async(outstanding_amount: float, customer_name: str) -> list:
+    """
+    Async variant of generate_payment_plans().
+    Falls back to rule-based plans if Gemini fails.
+    """
+    
+    try:
+        response = await generate_within_deadline(
+            build_plans_prompt(outstanding_amount),
+            label="plans",
+            generation_config=PLANS_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
+        )
+        return interpret_plans_response(response)
         
     except Exception as e:
-        print(f"Error generating payment plans: {e}")
+        logger.warning("Payment plan generation failed: %s", e)
+        record_fallback("plans", fallback_reason(e))
         return generate_fallback_plans(outstanding_amount)
 
 
@@ -540,5 +709,5 @@ def generate_fallback_plans(amount: float) -> list:
             "description": f"Pay ₹{monthly_2:,.0f} per month for 2 months"
         })
     
-    print(f"[PLANS] Using fallback plans ({len(plans)} options)")
+    logger.debug("Using fallback plans (%d options)", len(plans))
     return plans
@@ -0,0 +1,204 @@
+# src/utils/log.py
+
+"""
+Structured, non-blocking logging.
+
+Modules log through get_logger(__name__) instead of print(). Records go
+through a bounded in-memory queue to one background thread, which formats
+and writes them, so a turn never waits on stdout and lines from concurrent
+turns never interleave. When the queue is full, records are dropped and
+counted rather than blocking the caller.
+
+- LOG_FORMAT: "json" (default) writes one JSON object per line, with ts,
+  level, logger, msg, any log_context() fields and any extra= fields.
+  "text" writes readable lines for local runs.
+- LOG_LEVEL: threshold for the "src" and "backend" loggers (default INFO).
+  Per-message detail is logged at DEBUG and costs one level check when
+  filtered out.
+- LOG_DEBUG_SAMPLE: with LOG_LEVEL=DEBUG, the fraction of turns whose
+  DEBUG lines are kept (default 1). The choice is made once per
+  log_context(), so a sampled turn is logged in full.
+
+log_context(session_id=..., ...) adds fields to every record logged in
+its scope. It is held in a ContextVar, so it reaches the graph nodes and
+LLM calls of the turn.
+
+Exceptions logged with logger.exception() are formatted on the background
+thread as well.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Logger hierarchies configured by configure_logging()
+LOGGERS = ("src", "backend")
+
+_context: ContextVar[dict] = ContextVar("log_context", default={})
+# Whether DEBUG records of the current turn are kept (None: decide per record)
+_sampled: ContextVar[Optional[bool]] = ContextVar("log_sampled", default=None)
+
+# Attributes every LogRecord has; anything else came from extra= or context
+_RESERVED = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+@contextmanager
+def log_context(**fields):
+    """Add fields to every record logged in this scope (and its tasks)."""
+    token = _context.set({**_context.get(), **fields})
+    sample_token = None
+    if _sampled.get() is None:
+        sample_token = _sampled.set(random.random() < LOG_DEBUG_SAMPLE)
+    try:
+        yield
+    finally:
+        if sample_token is not None:
+            _sampled.reset(sample_token)
+        _context.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    """Attach context fields and drop unsampled DEBUG records (caller thread)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG:
+            sampled = _sampled.get()
+            if sampled is None:
+                sampled = random.random() < LOG_DEBUG_SAMPLE
+            if not sampled:
+                return False
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues without blocking. Unlike the stdlib handler, the message is
+    rendered here but the record is formatted (and any traceback with it)
+    by the listener thread.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room: stopping must not fail while the queue is full
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable lines with context fields appended."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{k}={v}" for k, v in record.__dict__.items() if k not in _RESERVED)
+        return f"{line} [{fields}]" if fields else line
+
+
+_handler: Optional[_QueueHandler] = None
+_listener: Optional[_QueueListener] = None
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    stream=None,
+) -> None:
+    """
+    Route the "src" and "backend" loggers through the background writer.
+    Arguments default to LOG_LEVEL / LOG_FORMAT / stdout. Calling it again
+    replaces the previous setup.
+    """
+    global _handler, _listener
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter() if (fmt or LOG_FORMAT) == "text" else JsonFormatter())
+
+    _handler = _QueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _handler.addFilter(_ContextFilter())
+    _listener = _QueueListener(_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+    for name in LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers = [_handler]
+        logger.setLevel(level or LOG_LEVEL)
+        logger.propagate = False
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def log_metrics() -> dict:
+    if _handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "level": logging.getLevelName(logging.getLogger(LOGGERS[0]).level),
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+    }
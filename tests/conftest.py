@@ -0,0 +1,41 @@
+# tests/conftest.py
+
+import pytest
+
+
+PLANS = [
+    {"name": "Full Settlement", "description": "Pay ₹45,000 in one payment"},
+    {"name": "3-Month Installment", "description": "Pay ₹15,000 per month for 3 months"},
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    TestClient for the API on in-memory session and record stores, with
+    the LLM calls replaced by their offline fallbacks. The lifespan is not
+    run, so nothing is snapshotted to disk.
+    """
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from backend.app import app
+    from backend.session_store import MemorySessionStore, set_session_store
+    from src.nodes import negotiation
+    from src.records import MemoryRecordStore, set_record_store
+
+    async def plans(amount, name):
+        return PLANS
+
+    async def no_llm_response(context):
+        return None
+
+    monkeypatch.setattr(negotiation, "generate_payment_plans_async", plans)
+    monkeypatch.setattr(negotiation, "generate_negotiation_response_async", no_llm_response)
+    set_session_store(MemorySessionStore())
+    set_record_store(MemoryRecordStore())
+    try:
+        yield TestClient(app)
+    finally:
+        set_session_store(None)
+        set_record_store(None)
@@ -0,0 +1,41 @@
+# tests/test_admin_api.py
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from backend.routes import debug
+from src.data import save_dispute
+
+
+TOKEN = "admin-secret"
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(debug, "PROFILE_ADMIN_TOKEN", TOKEN)
+    return {"X-Admin-Token": TOKEN}
+
+
+def test_dispute_search_needs_the_admin_token(client, admin):
+    save_dispute("CUST001", "I already paid last month")
+    url = "/api/disputes/search"
+
+    assert client.get(url, params={"q": "already paid"}).status_code == 403
+    assert client.get(url, params={"q": "already paid"}, headers={"X-Admin-Token": "guess"}).status_code == 403
+
+    response = client.get(url, params={"q": "already paid"}, headers=admin)
+    assert response.status_code == 200
+    assert [result["customer_id"] for result in response.json()["results"]] == ["CUST001"]
+
+
+def test_admin_endpoints_are_closed_without_a_configured_token(client):
+    response = client.get("/api/disputes/search", params={"q": "paid"}, headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
+
+
+def test_profiling_status_needs_the_admin_token(client, admin):
+    assert client.get("/api/debug/profiling").status_code == 403
+    response = client.get("/api/debug/profiling", headers=admin)
+    assert response.status_code == 200
+    assert "files" in response.json()
@@ -0,0 +1,77 @@
+# tests/test_analytics.py
+
+from src import analytics
+from src.analytics import OutcomeStats
+
+
+CALLS = [
+    {"outcome": "ptp_recorded", "payment_status": "willing", "recorded_at": "2024-12-01T10:00:00"},
+    {"outcome": "verification_failed", "payment_status": None, "recorded_at": "2024-12-01T11:00:00"},
+    {"outcome": "disputed", "payment_status": "disputed", "recorded_at": "2024-12-02T09:00:00"},
+    {"outcome": "ptp_recorded", "payment_status": "willing", "recorded_at": "2024-12-02T12:00:00"},
+]
+PTPS = [
+    {"amount": 15000, "date": "2024-12-10"},
+    {"amount": 7500, "date": "2024-12-10"},
+    {"amount": 42750, "date": "2024-12-15"},
+]
+
+
+def test_incremental_matches_rebuild(monkeypatch):
+    from src.records import MemoryRecordStore
+
+    store = MemoryRecordStore()
+    for call in CALLS:
+        store.append("call", call)
+    for ptp in PTPS:
+        store.append("ptp", ptp)
+    incremental = OutcomeStats()
+    assert incremental.catch_up(store) == len(CALLS) + len(PTPS)
+
+    stats = incremental.snapshot()
+    assert stats["by_outcome"] == {"ptp_recorded": 2, "verification_failed": 1, "disputed": 1}
+    assert stats["verification_failure_rate"] == 0.25
+    assert stats["calls_by_day"]["2024-12-01"] == {"ptp_recorded": 1, "verification_failed": 1}
+    assert stats["ptp"]["by_date"]["2024-12-10"] == {"count": 2, "amount": 22500.0}
+    assert incremental.snapshot() is stats
+
+    # Both group-by paths agree with the incremental counters
+    for np_module in {analytics.np, None}:
+        monkeypatch.setattr(analytics, "np", np_module)
+        rebuilt = OutcomeStats()
+        rebuilt.rebuild(CALLS, PTPS)
+        assert rebuilt.snapshot() == stats
+
+
+def test_workers_sharing_a_store_report_the_same_stats(tmp_path):
+    from src.records import SQLiteRecordStore
+
+    # Two workers: one store handle and one set of counters each, one file
+    path = str(tmp_path / "records.sqlite3")
+    workers = [(SQLiteRecordStore(path), OutcomeStats()) for _ in range(2)]
+    try:
+        for i, call in enumerate(CALLS):
+            workers[i % 2][0].append("call", call)
+        for i, ptp in enumerate(PTPS):
+            workers[i % 2][0].append("ptp", ptp)
+        workers[0][0].append("dispute", {"customer_id": "C1", "reason": "not mine"})
+        for store, _ in workers:
+            store.flush()
+
+        expected = OutcomeStats()
+        expected.rebuild(CALLS, PTPS)
+        for store, stats in workers:
+            assert stats.catch_up(store) == len(CALLS) + len(PTPS)
+            assert stats.snapshot() == expected.snapshot()
+            assert stats.catch_up(store) == 0
+
+        # A rebuild picks up where catch_up left off, without double counting
+        store, stats = workers[1]
+        stats.rebuild_from(store)
+        workers[0][0].append("ptp", {"amount": 100, "date": "2024-12-20"})
+        workers[0][0].flush()
+        assert stats.catch_up(store) == 1
+        assert stats.snapshot()["ptp"]["count"] == len(PTPS) + 1
+    finally:
+        for store, _ in workers:
+            store.close()
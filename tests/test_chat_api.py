@@ -0,0 +1,129 @@
+# tests/test_chat_api.py
+
+from src import memory
+
+
+PHONE = "+919876543210"
+TURNS = ["yes", "15-03-1985", "I want to pay but I need time", "hmm let me think", "what does it involve"]
+
+
+def start(client) -> dict:
+    response = client.post("/api/init", json={"phone": PHONE})
+    assert response.status_code == 200
+    return response.json()
+
+
+def chat(client, session_id: str, text: str, cursor=None) -> dict:
+    body = {"session_id": session_id, "user_input": text}
+    if cursor is not None:
+        body["cursor"] = cursor
+    response = client.post("/api/chat", json=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+def transcript(client, session_id: str) -> list[dict]:
+    return client.get(f"/api/sessions/{session_id}/messages", params={"limit": 500}).json()["messages"]
+
+
+def test_delta_responses_at_any_cursor(client):
+    session = start(client)
+    session_id, cursor = session["session_id"], session["cursor"]
+    assert cursor == len(session["messages"])
+
+    for text in TURNS[:3]:
+        delta = chat(client, session_id, text, cursor)
+        full = transcript(client, session_id)
+        # Exactly the messages after the cursor, and the new cursor
+        assert delta["messages"] == full[cursor:]
+        assert delta["messages"][0] == {"role": "user", "content": text}
+        assert delta["cursor"] == len(full)
+        cursor = delta["cursor"]
+    assert delta["changes"]["stage"] == "negotiation"
+    assert delta["changes"]["offered_plans"]
+
+    # A client that is behind catches up from its own cursor
+    delta = chat(client, session_id, TURNS[3], cursor=2)
+    full = transcript(client, session_id)
+    assert delta["messages"] == full[2:]
+    assert "stage" not in delta["changes"]
+
+    # Without a cursor the response is the full view
+    response = chat(client, session_id, TURNS[4])
+    assert response["messages"] == transcript(client, session_id)
+    assert response["cursor"] == len(response["messages"])
+    assert response["stage"] == "negotiation"
+
+
+def test_cursors_survive_compaction(client, monkeypatch):
+    monkeypatch.setattr(memory, "HISTORY_MAX_MESSAGES", 4)
+    monkeypatch.setattr(memory, "HISTORY_KEEP_RECENT", 2)
+    from backend.session_store import get_session
+
+    session = start(client)
+    session_id, cursor = session["session_id"], session["cursor"]
+    sent = list(session["messages"])
+    for text in TURNS:
+        delta = chat(client, session_id, text, cursor)
+        sent += delta["messages"]
+        cursor = delta["cursor"]
+
+    state = get_session(session_id)
+    assert state["archived_message_count"] > 0
+    assert len(state["messages"]) < cursor
+    # The deltas add up to the whole transcript, archived part included
+    assert sent == transcript(client, session_id)
+    assert cursor == len(sent)
+
+    # A cursor inside the archived part still gets everything after it
+    delta = chat(client, session_id, "ok", cursor=1)
+    assert delta["messages"] == transcript(client, session_id)[1:]
+    assert delta["messages"][:cursor - 1] == sent[1:]
+
+
+def test_message_pages(client, monkeypatch):
+    from backend.session_store import get_session
+
+    session = start(client)
+    session_id = session["session_id"]
+    uncompacted = []
+    for text in TURNS:
+        chat(client, session_id, text)
+        uncompacted = transcript(client, session_id)
+
+    # Same conversation with compaction: pages straddle the archive boundary
+    monkeypatch.setattr(memory, "HISTORY_MAX_MESSAGES", 4)
+    monkeypatch.setattr(memory, "HISTORY_KEEP_RECENT", 2)
+    session_id = start(client)["session_id"]
+    for text in TURNS:
+        chat(client, session_id, text)
+    archived = get_session(session_id)["archived_message_count"]
+    full = transcript(client, session_id)
+    total = len(full)
+    assert full == uncompacted
+    assert 0 < archived < total and archived % 4
+
+    pages, offset = [], 0
+    while offset < total:
+        page = client.get(f"/api/sessions/{session_id}/messages", params={"offset": offset, "limit": 4}).json()
+        assert page["total"] == total and page["offset"] == offset and page["limit"] == 4
+        pages.append(page["messages"])
+        offset += 4
+    assert [len(page) for page in pages[:-1]] == [4] * (len(pages) - 1)
+    assert 1 <= len(pages[-1]) <= 4
+    assert [message for page in pages for message in page] == full
+
+    # Past the end there is nothing; the window is clipped at the end
+    url = f"/api/sessions/{session_id}/messages"
+    assert client.get(url, params={"offset": total}).json()["messages"] == []
+    assert client.get(url, params={"offset": total - 1, "limit": 5}).json()["messages"] == full[-1:]
+
+    for params in ({"limit": 0}, {"limit": 501}, {"offset": -1}):
+        assert client.get(url, params=params).status_code == 422
+    assert client.get("/api/sessions/missing/messages").status_code == 404
+
+
+def test_negative_cursor_is_rejected(client):
+    session = start(client)
+    response = client.post("/api/chat", json={"session_id": session["session_id"], "user_input": "yes", "cursor": -1})
+    assert response.status_code == 422
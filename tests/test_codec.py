@@ -0,0 +1,67 @@
+# tests/test_codec.py
+
+import pytest
+
+from src.state import create_initial_state
+from src.codec import CompactCallState, CodecError, encode_state, decode_state, estimate_size
+
+
+def sample_state():
+    state = create_initial_state("+919876543210")
+    state["messages"] = [
+        {"role": "assistant", "content": "I'm calling regarding your outstanding payment of ₹45000."},
+        {"role": "user", "content": "I want a payment plan"},
+    ]
+    state["offered_plans"] = [{"name": "3-Month Installment", "description": "Pay ₹15,000 per month for 3 months"}]
+    state["ptp_amount"] = 15000.0
+    state["stage"] = "negotiation"
+    return state
+
+
+def test_round_trip_is_lossless():
+    state = sample_state()
+    state["custom_field"] = {"nested": [1, 2]}
+    state["messages"].append({"role": "user", "content": "hi", "channel": "web"})
+
+    decoded = decode_state(encode_state(state))
+
+    assert decoded == state
+    assert isinstance(decoded["outstanding_amount"], int)
+    assert isinstance(decoded["ptp_amount"], float)
+
+
+def test_compact_form_round_trip():
+    state = sample_state()
+    compact = CompactCallState.from_dict(state)
+
+    assert compact.to_dict() == state
+    assert encode_state(compact) == encode_state(state)
+
+    # Nested containers are copies: mutating a read never touches the store
+    read = compact.to_dict()
+    read["offered_plans"][0]["name"] = "changed"
+    read["turn_analysis"]["intent"] = "dispute"
+    assert compact.to_dict() == state
+
+
+def test_size_estimate_matches_encoding_for_ascii():
+    state = create_initial_state("+919876543210")
+    state["messages"] = [
+        {"role": "assistant", "content": "Hello, am I speaking with the account holder?"},
+        {"role": "user", "content": "yes", "channel": "web"},
+    ]
+    state["offered_plans"] = [{"name": "Settlement", "amount": 30000}]
+    state["custom_field"] = {"nested": [1, 2]}
+
+    assert estimate_size(state) == len(encode_state(state))
+    # Non-ASCII text is counted in characters: an underestimate, never more
+    assert estimate_size(sample_state()) <= len(encode_state(sample_state()))
+
+
+def test_rejects_foreign_and_truncated_blobs():
+    blob = encode_state(sample_state())
+
+    with pytest.raises(CodecError):
+        decode_state(b"XX" + blob[2:])
+    with pytest.raises(CodecError):
+        decode_state(blob[:40])
@@ -0,0 +1,114 @@
+# tests/test_crm.py
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.crm import CRMClient, CRMError, CachedCRMClient
+
+
+class SlowCRM(CRMClient):
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def get_customer_with_loan(self, phone):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise CRMError("down")
+        if phone == "+919876543210":
+            return {"customer": {"phone": phone}, "loan": None}
+        return None
+
+
+def test_coalescing_and_negative_cache():
+    async def run():
+        inner = SlowCRM()
+        crm = CachedCRMClient(inner)
+        results = await asyncio.gather(*(crm.get_customer_with_loan("9876543210") for _ in range(20)))
+        assert inner.calls == 1
+        assert all(r["customer"]["phone"] == "+919876543210" for r in results)
+
+        assert await crm.get_customer_with_loan("+910000000000") is None
+        assert await crm.get_customer_with_loan("+910000000000") is None
+        assert inner.calls == 2
+        assert crm.stats["negative_hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_errors_are_not_cached():
+    async def run():
+        inner = SlowCRM()
+        crm = CachedCRMClient(inner)
+        inner.fail = True
+        results = await asyncio.gather(
+            *(crm.get_customer_with_loan("+919876543210") for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, CRMError) for r in results)
+        inner.fail = False
+        assert await crm.get_customer_with_loan("+919876543210") is not None
+        assert inner.calls == 2
+
+    asyncio.run(run())
+
+
+def test_bulk_lookup_uses_cache_and_one_upstream_call():
+    class BulkCRM(SlowCRM):
+        def __init__(self):
+            super().__init__()
+            self.bulk_calls = []
+
+        async def get_many(self, phones):
+            self.bulk_calls.append(list(phones))
+            return {phone: await self.get_customer_with_loan(phone) for phone in phones}
+
+    async def run():
+        inner = BulkCRM()
+        crm = CachedCRMClient(inner)
+        await crm.get_customer_with_loan("+910000000000")
+
+        results = await crm.get_many(["9876543210", "+910000000000", "+919876543210", "+911111111111"])
+        assert inner.bulk_calls == [["+919876543210", "+911111111111"]]
+        assert results["9876543210"] == results["+919876543210"] is not None
+        assert results["+910000000000"] is None and results["+911111111111"] is None
+
+        await crm.get_many(["+919876543210", "+911111111111"])
+        assert len(inner.bulk_calls) == 1
+
+    asyncio.run(run())
+
+
+def test_malformed_phones_are_never_looked_up():
+    async def run():
+        inner = SlowCRM()
+        crm = CachedCRMClient(inner)
+        assert await crm.get_customer_with_loan("../admin?drop=1") is None
+        assert await crm.get_many(["not a phone", "9876543210"]) == {
+            "not a phone": None,
+            "9876543210": {"customer": {"phone": "+919876543210"}, "loan": None},
+        }
+        assert inner.calls == 1
+
+    asyncio.run(run())
+
+
+def test_waiters_redo_a_lookup_whose_owner_was_cancelled():
+    async def run():
+        inner = SlowCRM()
+        crm = CachedCRMClient(inner)
+        owner = asyncio.create_task(crm.get_customer_with_loan("+919876543210"))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(crm.get_customer_with_loan("+919876543210")) for _ in range(3)]
+        await asyncio.sleep(0)
+        owner.cancel()
+
+        results = await asyncio.gather(*waiters)
+        assert all(r["customer"]["phone"] == "+919876543210" for r in results)
+        # The cancelled lookup plus one redo shared by the waiters
+        assert inner.calls == 2
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+# tests/test_customer_book.py
+
+import pytest
+
+from src.customer_book import CustomerBook, CustomerBookError, build_book, normalize_phone
+from src.data import CUSTOMERS, LOANS
+
+
+def test_normalize_phone():
+    assert normalize_phone("+91 98765-43210") == "+919876543210"
+    assert normalize_phone("9876543210") == "+919876543210"
+    assert normalize_phone("09876543210") == "+919876543210"
+    assert normalize_phone("0044 20 7946 0958") == "+442079460958"
+    assert normalize_phone("12345") is None
+
+
+def test_lookup_matches_mock_data(tmp_path):
+    path = str(tmp_path / "book.bin")
+    records = [(customer, LOANS.get(customer["id"])) for customer in CUSTOMERS.values()]
+    records.append(({"id": "CUST999", "name": "No Loan", "dob": "01-01-1990", "phone": "+14155550100"}, None))
+    build_book(records, path)
+
+    book = CustomerBook(path)
+    try:
+        for phone, customer in CUSTOMERS.items():
+            result = book.get_customer_with_loan(phone)
+            assert result["customer"] == customer
+            assert result["loan"] == LOANS[customer["id"]]
+        assert book.get_customer_with_loan("98765 43212")["customer"]["id"] == "CUST003"
+        assert book.get_customer_with_loan("+14155550100")["loan"] is None
+        assert book.get_customer_with_loan("+919999999999") is None
+    finally:
+        book.close()
+
+
+def test_duplicate_phones_rejected(tmp_path):
+    customer = CUSTOMERS["+919876543210"]
+    with pytest.raises(CustomerBookError):
+        build_book([(customer, None), (dict(customer, id="DUP"), None)], str(tmp_path / "book.bin"))
@@ -0,0 +1,44 @@
+# tests/test_deadline.py
+
+import asyncio
+import time
+
+from src import deadline
+from src.deadline import deadline_metrics, llm_budget, record_fallback, remaining, turn_deadline
+
+
+def test_budget_follows_the_turn_deadline():
+    assert remaining() is None
+    assert llm_budget() is None
+
+    with turn_deadline(5.0):
+        budget = llm_budget()
+        assert 5.0 - deadline.LLM_RESERVE_S - 0.1 < budget <= 5.0 - deadline.LLM_RESERVE_S
+
+    # Too little left: the call is skipped
+    with turn_deadline(deadline.LLM_RESERVE_S + deadline.LLM_MIN_CALL_S / 2):
+        assert llm_budget() == 0.0
+
+    with turn_deadline(0.01):
+        time.sleep(0.02)
+    assert remaining() is None
+
+    metrics = deadline_metrics()
+    assert metrics["turns"] >= 3
+    assert metrics["over_deadline"] >= 1
+    assert metrics["latency_s"]["max"] >= 0.02
+
+
+def test_deadline_reaches_tasks_and_fallbacks_are_counted():
+    async def run():
+        with turn_deadline(3.0):
+            return await asyncio.create_task(asyncio.sleep(0, result=remaining()))
+
+    assert 2.9 < asyncio.run(run()) <= 3.0
+
+    record_fallback("plans", "budget")
+    record_fallback("plans", "budget")
+    record_fallback("plans", "timeout")
+    fallbacks = deadline_metrics()["fallbacks"]["plans"]
+    assert fallbacks["budget"] >= 2
+    assert fallbacks["timeout"] >= 1
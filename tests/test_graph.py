@@ -0,0 +1,80 @@
+# tests/test_graph.py
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from src import graph
+from src.nodes import negotiation
+from src.nodes.negotiation import analyze_utterance, has_commitment_details
+
+
+PLANS = [
+    {"name": "Full Settlement", "description": "Pay ₹45,000 in one payment"},
+    {"name": "3-Month Installment", "description": "Pay ₹15,000 per month for 3 months"},
+]
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    async def plans(amount, name):
+        return PLANS
+
+    async def no_llm_response(context):
+        return None
+
+    monkeypatch.setattr(negotiation, "generate_payment_plans_async", plans)
+    monkeypatch.setattr(negotiation, "generate_negotiation_response_async", no_llm_response)
+    monkeypatch.setattr(negotiation, "save_ptp", lambda **record: "PTP0001")
+
+
+def negotiation_state(user_input: str, **extra) -> dict:
+    return {
+        "messages": [
+            {"role": "assistant", "content": "Here are some options: 1. Full Settlement 2. 3-Month Installment"},
+            {"role": "user", "content": user_input},
+        ],
+        "customer_id": "CUST001",
+        "customer_name": "Rahul Sharma",
+        "outstanding_amount": 45000,
+        "stage": "negotiation",
+        "offered_plans": PLANS,
+        "last_user_input": user_input,
+        "awaiting_user": False,
+        **extra,
+    }
+
+
+@pytest.mark.parametrize("user_input", [
+    "I'll take the installment plan",
+    "I can pay 15000 on 5th december",
+    "I want to end this call",
+])
+def test_fan_out_merges_branches_like_a_sequential_run(user_input):
+    state = negotiation_state(user_input)
+    fanned = asyncio.run(graph.create_graph().compile().ainvoke(state, {"recursion_limit": graph.RECURSION_LIMIT}))
+    sequential = {**state, **asyncio.run(negotiation.negotiation_node(state))}
+
+    # All three branches wrote into one analysis
+    assert fanned["turn_analysis"] == {
+        "input": user_input,
+        **analyze_utterance(user_input),
+        "commitment": has_commitment_details(state, user_input),
+        "llm_intent": None,
+    }
+    assert fanned["messages"][2] == sequential["messages"][2]
+    for field in ("stage", "selected_plan", "ptp_amount", "ptp_date"):
+        assert fanned.get(field) == sequential.get(field)
+
+
+def test_fan_out_starts_from_an_empty_analysis():
+    # Left over from an earlier utterance with the same text
+    stale = {"input": "yes", "commitment": (True, 45000, "2026-12-05", PLANS[0]), "stale": True}
+    state = negotiation_state("yes", turn_analysis=stale)
+    fanned = asyncio.run(graph.create_graph().compile().ainvoke(state, {"recursion_limit": graph.RECURSION_LIMIT}))
+
+    assert "stale" not in fanned["turn_analysis"]
+    assert fanned["turn_analysis"]["commitment"] == has_commitment_details(state, "yes")
+    assert not fanned.get("is_complete")
@@ -0,0 +1,61 @@
+# tests/test_hash_ring.py
+
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.hash_ring import HashRing
+from backend.routing import decode_sessions, encode_sessions, session_id_from_body, session_id_from_path
+from backend.session_store import MemorySessionStore
+from src.state import CallState
+
+
+NODES = [f"http://10.0.0.{i}:8000" for i in range(1, 5)]
+KEYS = [f"session-{i}" for i in range(20000)]
+
+
+def _assign(nodes: list[str]) -> list[str]:
+    ring = HashRing(nodes)
+    return [ring.node_for(key) for key in KEYS]
+
+
+def test_ring_is_balanced_and_moves_few_sessions_across_processes():
+    # Every worker process must place sessions identically
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        first, second = pool.map(_assign, [NODES, NODES])
+        grown = pool.submit(_assign, NODES + ["http://10.0.0.5:8000"]).result()
+        shrunk = pool.submit(_assign, NODES[1:]).result()
+    assert first == second == _assign(list(reversed(NODES)))
+
+    counts = [first.count(node) for node in NODES]
+    assert max(counts) / (len(KEYS) / len(NODES)) < 1.2
+
+    # A joining node takes about 1/5 of the sessions, all from the others
+    moved = [(a, b) for a, b in zip(first, grown) if a != b]
+    assert 0.15 < len(moved) / len(KEYS) < 0.25
+    assert all(b == "http://10.0.0.5:8000" for _, b in moved)
+
+    # A leaving node gives up only its own sessions
+    moved = [(a, b) for a, b in zip(first, shrunk) if a != b]
+    assert all(a == NODES[0] for a, _ in moved)
+    assert len(moved) == first.count(NODES[0])
+
+
+def test_handoff_moves_sessions_between_stores():
+    old, new = MemorySessionStore(max_entries=10), MemorySessionStore(max_entries=10)
+    state = CallState(messages=[{"role": "user", "content": "hi"}], stage="verification", turn_count=1)
+    old.set("s1", state)
+    old.set("s1", state)
+    old.set("s2", state)
+
+    entries = old.take(["s1", "missing"])
+    assert old.session_ids() == ["s2"]
+    assert new.restore(decode_sessions(encode_sessions(entries))) == 1
+    restored, version = new.get_versioned("s1")
+    assert restored["stage"] == "verification" and version == 2
+
+
+def test_session_id_extraction():
+    assert session_id_from_path("/api/sessions/abc/messages") == "abc"
+    assert session_id_from_path("/api/ws/abc") == "abc"
+    assert session_id_from_path("/api/init") is None
+    assert session_id_from_body(b'{"session_id": "abc", "message": "hi"}') == "abc"
+    assert session_id_from_body(b"not json") is None
@@ -0,0 +1,95 @@
+# tests/test_idempotency.py
+
+import asyncio
+
+import pytest
+
+from backend.idempotency import IdempotencyCache, IdempotencyKeyReusedError
+
+
+def test_retries_wait_for_or_replay_one_run():
+    async def run():
+        cache = IdempotencyCache(ttl=60)
+        calls = []
+
+        async def turn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        # Concurrent retry waits for the original; a later one replays it
+        results = await asyncio.gather(
+            cache.run("s1", "k1", ("hi", None), turn),
+            cache.run("s1", "k1", ("hi", None), turn),
+        )
+        assert results == [(1, False), (1, True)]
+        assert await cache.run("s1", "k1", ("hi", None), turn) == (1, True)
+        assert len(calls) == 1
+
+        # Keys are per session, and can't be reused for another request
+        assert await cache.run("s2", "k1", ("hi", None), turn) == (2, False)
+        with pytest.raises(IdempotencyKeyReusedError):
+            await cache.run("s1", "k1", ("bye", None), turn)
+
+    asyncio.run(run())
+
+
+def test_failures_are_not_cached():
+    async def run():
+        cache = IdempotencyCache(ttl=60)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise RuntimeError("LLM timeout")
+            return "ok"
+
+        first, waiter = await asyncio.gather(
+            cache.run("s1", "k1", "x", flaky),
+            cache.run("s1", "k1", "x", flaky),
+            return_exceptions=True,
+        )
+        assert isinstance(first, RuntimeError) and isinstance(waiter, RuntimeError)
+        assert await cache.run("s1", "k1", "x", flaky) == ("ok", False)
+
+    asyncio.run(run())
+
+
+def test_eviction_never_drops_in_flight_requests():
+    async def run():
+        cache = IdempotencyCache(ttl=0.05, max_entries=2)
+        release = asyncio.Event()
+        calls = []
+
+        async def slow():
+            calls.append("slow")
+            await release.wait()
+            return "slow"
+
+        async def fast():
+            calls.append("fast")
+            return "fast"
+
+        running = asyncio.create_task(cache.run("s1", "slow", "x", slow))
+        await asyncio.sleep(0)
+        # Completed keys past the cap evict each other, not the running one
+        for n in range(4):
+            await cache.run("s1", f"k{n}", "x", fast)
+        assert cache.metrics()["entries"] == 2 and cache.metrics()["running"] == 1
+
+        # Expired keys behind the running one are still swept
+        await asyncio.sleep(0.06)
+        assert await cache.run("s2", "k", "x", fast) == ("fast", False)
+        assert cache.metrics()["entries"] == 1
+
+        # A retry of the running request waits for it instead of re-running
+        retry = asyncio.create_task(cache.run("s1", "slow", "x", slow))
+        await asyncio.sleep(0)
+        release.set()
+        assert await running == ("slow", False)
+        assert await retry == ("slow", True)
+        assert calls.count("slow") == 1
+
+    asyncio.run(run())
@@ -0,0 +1,61 @@
+# tests/test_log.py
+
+import io
+import json
+import logging
+
+import pytest
+
+from src.utils import log
+
+
+@pytest.fixture(autouse=True)
+def restore_loggers():
+    yield
+    log.shutdown_logging()
+    for name in log.LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers, logger.propagate = [], True
+        logger.setLevel(logging.NOTSET)
+
+
+def _lines(stream: io.StringIO) -> list[dict]:
+    log.shutdown_logging()  # flushes the queue
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_lines_with_context_and_exceptions():
+    stream = io.StringIO()
+    log.configure_logging(level="INFO", fmt="json", stream=stream)
+    logger = log.get_logger("src.test")
+
+    with log.log_context(session_id="s1"):
+        logger.info("Turn %d done", 3, extra={"stage": "negotiation"})
+        logger.debug("filtered by level")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Turn failed")
+    logger.warning("outside")
+
+    first, failed, outside = _lines(stream)
+    assert first["msg"] == "Turn 3 done" and first["level"] == "INFO" and first["logger"] == "src.test"
+    assert first["session_id"] == "s1" and first["stage"] == "negotiation"
+    assert failed["session_id"] == "s1" and "ValueError: boom" in failed["exc"]
+    assert "session_id" not in outside
+
+
+def test_debug_lines_are_sampled_per_turn(monkeypatch):
+    stream = io.StringIO()
+    log.configure_logging(level="DEBUG", fmt="json", stream=stream)
+    logger = log.get_logger("src.test")
+
+    monkeypatch.setattr(log, "LOG_DEBUG_SAMPLE", 0.0)
+    with log.log_context(session_id="skipped"):
+        logger.debug("dropped")
+        logger.info("kept")
+    monkeypatch.setattr(log, "LOG_DEBUG_SAMPLE", 1.0)
+    with log.log_context(session_id="sampled"):
+        logger.debug("detail")
+
+    assert [line["msg"] for line in _lines(stream)] == ["kept", "detail"]
@@ -0,0 +1,149 @@
+# tests/test_memory.py
+
+import asyncio
+
+from src import memory
+from src.memory import compact_history_node, get_full_transcript, get_messages_range, needs_compaction
+from src.nodes import negotiation
+
+
+PLANS = [
+    {"name": "Full Settlement", "description": "Pay ₹45,000 in one payment"},
+    {"name": "3-Month Installment", "description": "Pay ₹15,000 per month for 3 months"},
+]
+
+OPENING = [
+    {"role": "assistant", "content": "Hello, am I speaking with Rahul Sharma?"},
+    {"role": "user", "content": "yes"},
+    {"role": "assistant", "content": "Thank you for confirming. I'm calling regarding your outstanding payment of ₹45,000."},
+]
+
+# Plan choice early on, then enough small talk to fold it out of the window
+USER_TURNS = [
+    "I want to pay but I need some time",
+    "let me think about it",
+    "what does the installment involve",
+    "I'll take the installment plan",
+    "hold on",
+    "sorry, my signal dropped",
+    "5th december",
+]
+
+
+def make_state() -> dict:
+    return {
+        "messages": [dict(m) for m in OPENING],
+        "customer_id": "CUST001",
+        "customer_name": "Rahul Sharma",
+        "outstanding_amount": 45000,
+        "stage": "negotiation",
+        "offered_plans": [],
+    }
+
+
+def test_compaction_folds_old_messages_into_the_summary(monkeypatch):
+    monkeypatch.setattr(memory, "HISTORY_MAX_MESSAGES", 6)
+    monkeypatch.setattr(memory, "HISTORY_KEEP_RECENT", 2)
+    state = make_state()
+    state["messages"] += [
+        {"role": "user", "content": "I want to pay"},
+        {"role": "assistant", "content": "Here are some options: 1. Full Settlement 2. 3-Month Installment"},
+        {"role": "user", "content": "hmm"},
+        {"role": "assistant", "content": "Which option works best for you?"},
+        {"role": "user", "content": "still thinking"},
+    ]
+    assert needs_compaction(state)
+
+    update = compact_history_node(state)
+
+    assert update["messages"] == state["messages"][-2:]
+    assert update["pending_archive"] == state["messages"][:-2]
+    assert update["archived_message_count"] == 6
+    summary = update["history_summary"]
+    assert summary["messages_folded"] == 6
+    assert summary["disclosed"] and summary["plans_offered"] and summary["willing_to_pay"]
+    assert summary["negotiation_turns"] == 1 and summary["in_negotiation"]
+    assert summary["text"].startswith("6 earlier messages; disclosure given")
+
+    # A second compaction adds to the counts; the window starts on an
+    # assistant message, so it keeps 3 messages rather than 2
+    state.update(update)
+    state["messages"] += [
+        {"role": "assistant", "content": "Take your time."},
+        {"role": "user", "content": "ok"},
+        {"role": "assistant", "content": "Shall I note the installment plan?"},
+        {"role": "user", "content": "give me a second"},
+        {"role": "assistant", "content": "Of course."},
+    ]
+    second = compact_history_node(state)
+    assert second["messages"] == state["messages"][-3:]
+    assert second["archived_message_count"] == 10
+    assert second["history_summary"]["messages_folded"] == 10
+    assert second["history_summary"]["negotiation_turns"] == 3
+    assert not needs_compaction({**state, **second})
+
+
+def test_positions_are_stable_across_compaction(monkeypatch):
+    monkeypatch.setattr(memory, "HISTORY_MAX_MESSAGES", 4)
+    monkeypatch.setattr(memory, "HISTORY_KEEP_RECENT", 2)
+    full = [{"role": ("assistant", "user")[n % 2], "content": f"m{n}"} for n in range(7)]
+    state = {"messages": list(full)}
+    update = compact_history_node(state)
+    archive = update.pop("pending_archive")
+    state.update(update)
+
+    def read_archive(start, end):
+        return archive[start:end]
+
+    assert get_full_transcript(state, read_archive) == full
+    for start, end in [(0, 3), (2, 6), (5, None), (6, 7), (7, 9)]:
+        assert get_messages_range(state, start, end, read_archive=read_archive) == full[start:end]
+
+
+def _converse(monkeypatch, compact: bool):
+    async def plans(amount, name):
+        return PLANS
+
+    async def no_llm_response(context):
+        return None  # template replies, as when the LLM is unavailable
+
+    monkeypatch.setattr(negotiation, "generate_payment_plans_async", plans)
+    monkeypatch.setattr(negotiation, "generate_negotiation_response_async", no_llm_response)
+    monkeypatch.setattr(negotiation, "save_ptp", lambda **record: "PTP0001")
+    monkeypatch.setattr(memory, "HISTORY_MAX_MESSAGES", 6)
+    monkeypatch.setattr(memory, "HISTORY_KEEP_RECENT", 3)
+
+    async def run():
+        state, archive, compactions, replies = make_state(), [], 0, []
+        for text in USER_TURNS:
+            state["messages"].append({"role": "user", "content": text})
+            state["last_user_input"] = text
+            if compact and needs_compaction(state):
+                update = compact_history_node(state)
+                archive += update.pop("pending_archive")
+                state.update(update)
+                compactions += 1
+            state.update(await negotiation.negotiation_node(state))
+            replies.append(state["messages"][-1]["content"])
+            if state.get("is_complete"):
+                break
+        return replies, state, archive, compactions
+
+    return asyncio.run(run())
+
+
+def test_agent_answers_the_same_with_and_without_compaction(monkeypatch):
+    replies, state, _, _ = _converse(monkeypatch, compact=False)
+    compacted_replies, compacted, archive, compactions = _converse(monkeypatch, compact=True)
+
+    assert compactions >= 2
+    assert compacted["archived_message_count"] == len(archive)
+    assert len(compacted["messages"]) <= memory.HISTORY_MAX_MESSAGES + 1
+    # The plan was chosen in folded turns; the summary carried it
+    assert compacted["history_summary"]["selected_plan"] == PLANS[1]
+
+    assert compacted_replies == replies
+    assert compacted["is_complete"] and state["is_complete"]
+    for field in ("ptp_amount", "ptp_date", "selected_plan", "call_outcome"):
+        assert compacted[field] == state[field]
+    assert get_full_transcript(compacted, lambda start, end: archive[start:end]) == state["messages"]
@@ -0,0 +1,60 @@
+# tests/test_profiling.py
+
+import asyncio
+import os
+import pstats
+import time
+
+import pytest
+
+from src.profiling import Profiler, label_profile
+
+
+def _wait_for_files(directory, count: int) -> list[str]:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+        if len(names) >= count:
+            return names
+        time.sleep(0.01)
+    raise AssertionError(f"expected {count} files in {directory}, found {names}")
+
+
+def test_sampled_turn_is_written_with_labels(tmp_path):
+    profiler = Profiler(sample_rate=1.0, targets="chat,invoke", memory=True, directory=str(tmp_path))
+
+    async def turn():
+        with profiler.profile("chat", "session/1") as labels:
+            assert labels is not None
+            # Nested invoke is not profiled separately
+            with profiler.profile("invoke", "session/1", "negotiation") as nested:
+                assert nested is None
+            label_profile(stage="negotiation")
+            sum(i * i for i in range(10000))
+            await asyncio.sleep(0)
+
+    asyncio.run(turn())
+    profiler.configure(memory=False)
+
+    names = _wait_for_files(tmp_path, 3)
+    prof = next(name for name in names if name.endswith(".prof"))
+    assert prof.split("-", 1)[1] == "chat-negotiation-session_1.prof"
+    assert any(name.endswith(".tracemalloc") for name in names)
+    assert any(name.endswith(".memory.txt") for name in names)
+    assert pstats.Stats(str(tmp_path / prof)).total_calls > 0
+    assert profiler.settings()["profiled"] == 1
+
+
+def test_sampling_settings(tmp_path):
+    profiler = Profiler(sample_rate=0.0, directory=str(tmp_path))
+    with profiler.profile("chat", "s1") as labels:
+        assert labels is None
+
+    profiler.configure(sample_rate=1.0, targets="invoke")
+    with profiler.profile("chat", "s1") as labels:
+        assert labels is None
+
+    with pytest.raises(ValueError):
+        profiler.configure(sample_rate=2)
+    with pytest.raises(ValueError):
+        profiler.configure(targets="chat,everything")
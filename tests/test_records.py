@@ -0,0 +1,170 @@
+# tests/test_records.py
+
+import sqlite3
+import threading
+from contextlib import closing
+
+from src.records import SQLiteRecordStore
+
+
+def test_ids_unique_across_threads_and_restarts(tmp_path):
+    path = str(tmp_path / "records.sqlite3")
+    store = SQLiteRecordStore(path, id_block_size=10)
+
+    ids = []
+    lock = threading.Lock()
+
+    def worker(n):
+        for i in range(50):
+            record_id = store.append("ptp", {"customer_id": f"C{n}", "amount": i})
+            with lock:
+                ids.append(record_id)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.close()
+
+    assert len(set(ids)) == 400
+
+    reopened = SQLiteRecordStore(path, id_block_size=10)
+    try:
+        assert len(reopened.list("ptp")) == 400
+        next_id = reopened.append("ptp", {"customer_id": "C0", "amount": 1})
+        assert next_id not in ids
+        assert int(next_id[3:]) > max(int(i[3:]) for i in ids)
+    finally:
+        reopened.close()
+
+
+def test_pending_records_are_visible_before_commit(tmp_path):
+    store = SQLiteRecordStore(str(tmp_path / "records.sqlite3"), commit_interval=0.5)
+    try:
+        dispute_id = store.append("dispute", {"customer_id": "CUST001", "reason": "not mine"})
+        assert dispute_id == "DSP0001"
+        assert store.list("dispute") == [{"id": "DSP0001", "customer_id": "CUST001", "reason": "not mine"}]
+    finally:
+        store.close()
+
+
+def test_dispute_search_ranks_and_paginates(tmp_path):
+    from src.records import MemoryRecordStore
+
+    reasons = [
+        "Loan already paid in full last month",
+        "Amount is wrong, I paid half already",
+        "Not my loan",
+        "Paid, paid, paid! Bank never updated the amount",
+    ]
+    sqlite_store = SQLiteRecordStore(str(tmp_path / "records.sqlite3"))
+    for store in (sqlite_store, MemoryRecordStore()):
+        for i, reason in enumerate(reasons):
+            store.append("dispute", {"customer_id": f"C{i}", "reason": reason})
+        store.flush()
+
+        total, page = store.search("dispute", "PAID amount")
+        assert total == 2
+        assert [r["id"] for r in page] == ["DSP0004", "DSP0002"]
+        assert page[0]["score"] > page[1]["score"]
+
+        total, page = store.search("dispute", "paid", offset=1, limit=1)
+        assert total == 3 and len(page) == 1
+        assert store.search("dispute", '" OR NEAR(') == (0, [])
+    sqlite_store.close()
+
+    # Existing records are backfilled into a fresh index
+    with closing(sqlite3.connect(str(tmp_path / "records.sqlite3"))) as conn:
+        conn.execute("DROP TABLE search_dispute")
+    reopened = SQLiteRecordStore(str(tmp_path / "records.sqlite3"))
+    try:
+        assert reopened.search("dispute", "loan")[0] == 2
+    finally:
+        reopened.close()
+
+
+def _fail_inserts(path: str, on: bool) -> None:
+    with closing(sqlite3.connect(path)) as conn:
+        if on:
+            conn.execute(
+                "CREATE TRIGGER fail_inserts BEFORE INSERT ON records"
+                " BEGIN SELECT RAISE(ABORT, 'disk on fire'); END"
+            )
+        else:
+            conn.execute("DROP TRIGGER fail_inserts")
+
+
+def test_failed_commits_are_retried_then_reported(tmp_path):
+    import time
+
+    import pytest
+
+    from src.records import RecordWriteError
+
+    path = str(tmp_path / "records.sqlite3")
+    store = SQLiteRecordStore(path, retry_delay=0.01, max_retries=20)
+    try:
+        _fail_inserts(path, True)
+        ptp_id = store.append("ptp", {"customer_id": "C1", "amount": 100})
+        deadline = time.monotonic() + 5
+        while not store.counters["retried"] and time.monotonic() < deadline:
+            time.sleep(0.005)
+        _fail_inserts(path, False)
+        store.flush()  # the retry succeeds
+        assert store.counters["lost"] == 0
+    finally:
+        store.close()
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute("SELECT id FROM records").fetchall() == [(ptp_id,)]
+
+    store = SQLiteRecordStore(path, retry_delay=0.001, max_retries=2)
+    try:
+        _fail_inserts(path, True)
+        lost_id = store.append("ptp", {"customer_id": "C2", "amount": 50})
+        with pytest.raises(RecordWriteError):
+            store.flush()
+        assert store.counters == {"committed": 0, "retried": 2, "lost": 1}
+        # Still listed, never silently dropped from the process
+        assert lost_id in [record["id"] for record in store.list("ptp")]
+    finally:
+        _fail_inserts(path, False)
+        store.close()
+
+
+def test_id_blocks_are_reserved_ahead_on_the_writer(tmp_path):
+    store = SQLiteRecordStore(str(tmp_path / "records.sqlite3"), id_block_size=10)
+    reserved_on = []
+    reserve_block = store._reserve_block
+
+    def tracking_reserve_block(conn, kind):
+        reserved_on.append(threading.current_thread().name)
+        return reserve_block(conn, kind)
+
+    store._reserve_block = tracking_reserve_block
+    try:
+        store.flush()
+        for i in range(25):
+            store.append("call", {"customer_id": f"C{i}"})
+            if i % 5 == 4:
+                store.flush()  # let the writer keep up
+        assert [r["id"] for r in store.list("call")] == [f"CALL{n:04d}" for n in range(1, 26)]
+        assert reserved_on and set(reserved_on) == {"record-store-writer"}
+    finally:
+        store.close()
+
+
+def test_every_saved_kind_has_recorded_at():
+    from src.data import list_records, save_call_record, save_dispute, save_ptp
+    from src.records import MemoryRecordStore, set_record_store
+
+    set_record_store(MemoryRecordStore())
+    try:
+        save_ptp("CUST001", 15000, "2024-12-10", "3-Month Installment")
+        save_dispute("CUST001", "I already paid")
+        save_call_record({"customer_id": "CUST001", "outcome": "disputed"})
+        for kind in ("ptp", "dispute", "call"):
+            [record] = list_records(kind)
+            assert len(record["recorded_at"]) == len("2024-12-01T10:00:00")
+    finally:
+        set_record_store(None)
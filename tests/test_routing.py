@@ -0,0 +1,146 @@
+# tests/test_routing.py
+
+import asyncio
+import json
+from collections import defaultdict
+from contextvars import ContextVar
+
+import pytest
+
+from backend import routing
+from backend.session_store import MemorySessionStore
+
+
+A, B = "http://node-a", "http://node-b"
+
+
+def make_scope(path: str, headers: list) -> dict:
+    return {"type": "http", "method": "GET", "path": path, "headers": headers}
+
+
+def test_forwarded_header_must_be_signed(monkeypatch):
+    monkeypatch.setattr(routing, "CLUSTER_SECRET", "s3cret")
+    signature = routing.sign_forward("GET", "/api/sessions/abc")
+    header = routing.FORWARDED_HEADER.encode()
+
+    assert routing.check_forwarded(make_scope("/api/sessions/abc", [(header, signature.encode())]))
+    assert not routing.check_forwarded(make_scope("/api/sessions/abc", [(header, b"http://node-a")]))
+    assert not routing.check_forwarded(make_scope("/api/sessions/other", [(header, signature.encode())]))
+    assert not routing.check_forwarded(make_scope("/api/sessions/abc", []))
+
+    monkeypatch.setattr(routing, "CLUSTER_SECRET", "")
+    assert not routing.check_forwarded(make_scope("/api/sessions/abc", [(header, signature.encode())]))
+
+
+class Nodes:
+    """
+    Two nodes in one process. Each has its own session store and turn locks,
+    picked by the node handling the current request, and they reach each
+    other over in-process ASGI transports.
+    """
+
+    def __init__(self, monkeypatch, httpx):
+        self.current = ContextVar("node")
+        self.stores = {A: MemorySessionStore(), B: MemorySessionStore()}
+        locks = defaultdict(asyncio.Lock)
+        monkeypatch.setattr(routing, "CLUSTER_SECRET", "s3cret")
+        monkeypatch.setattr(routing, "get_session_store", lambda: self.stores[self.current.get()])
+        monkeypatch.setattr(routing, "session_lock", lambda session_id: locks[self.current.get(), session_id])
+
+        self.clusters, self.apps = {}, {}
+        for url in (A, B):
+            cluster = routing.Cluster(url, [A, B])
+            self.clusters[url] = cluster
+            self.apps[url] = routing.SessionRoutingMiddleware(self._inner_app(url, cluster), cluster)
+
+        nodes = self
+
+        class Transport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                node = f"{request.url.scheme}://{request.url.host}"
+                return await httpx.ASGITransport(app=nodes.app(node)).handle_async_request(request)
+
+        self.client = httpx.AsyncClient(transport=Transport())
+        for cluster in self.clusters.values():
+            cluster._client = self.client
+
+    def app(self, url: str):
+        async def app(scope, receive, send):
+            token = self.current.set(url)
+            try:
+                await self.apps[url](scope, receive, send)
+            finally:
+                self.current.reset(token)
+
+        return app
+
+    def _inner_app(self, url: str, cluster: routing.Cluster):
+        """Stand-in for the API: the cluster endpoints and a session lookup."""
+
+        async def app(scope, receive, send):
+            path, body = scope["path"], await routing._read_body(receive)
+            if path.startswith("/api/cluster/"):
+                secret = routing._header(scope, routing.SECRET_HEADER)
+                assert routing.check_secret(secret.decode() if secret else None)
+                if path == "/api/cluster/sessions":
+                    content = json.dumps({"restored": cluster.receive(body)}).encode()
+                else:
+                    content = await cluster.take_local(path.split("/")[4])
+            else:
+                state = routing.get_session_store().get(routing.session_id_from_path(path))
+                content = json.dumps({"node": url, "stage": state and state["stage"]}).encode()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": content})
+
+        return app
+
+    def owned_by(self, url: str) -> str:
+        return self.clusters[url].owned_session_id()
+
+    async def set_nodes(self, url: str, nodes: list[str]) -> None:
+        token = self.current.set(url)
+        try:
+            await self.clusters[url].set_nodes(nodes)
+            await self.clusters[url]._push_task
+        finally:
+            self.current.reset(token)
+
+
+def test_requests_are_forwarded_and_sessions_handed_off(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+
+    async def run():
+        nodes = Nodes(monkeypatch, httpx)
+        on_a, on_b, moved_later = nodes.owned_by(A), nodes.owned_by(B), nodes.owned_by(B)
+        nodes.stores[A].set(on_a, {"messages": [], "stage": "greeting"})
+        nodes.stores[B].set(on_b, {"messages": [], "stage": "negotiation"})
+        nodes.stores[B].set(moved_later, {"messages": [], "stage": "closing"})
+
+        # A proxies B's session to B and serves its own
+        response = await nodes.client.get(f"{A}/api/sessions/{on_b}")
+        assert response.json() == {"node": B, "stage": "negotiation"}
+        response = await nodes.client.get(f"{A}/api/sessions/{on_a}")
+        assert response.json() == {"node": A, "stage": "greeting"}
+
+        # A client can't make A serve B's session by claiming to be a peer
+        response = await nodes.client.get(
+            f"{A}/api/sessions/{on_b}", headers={routing.FORWARDED_HEADER: B}
+        )
+        assert response.json()["node"] == B
+        assert nodes.clusters[A].counters["forwarded"] == 2
+
+        # B leaves. A learns first and pulls a session on its first request
+        await nodes.set_nodes(A, [A])
+        response = await nodes.client.get(f"{A}/api/sessions/{on_b}")
+        assert response.json() == {"node": A, "stage": "negotiation"}
+        assert nodes.clusters[A].counters["pulled"] == 1
+        assert not nodes.stores[B].exists(on_b)
+
+        # Then B pushes the rest
+        await nodes.set_nodes(B, [A])
+        assert nodes.clusters[B].counters["pushed"] == 1
+        assert nodes.stores[A].get(moved_later)["stage"] == "closing"
+        assert nodes.stores[B].session_ids() == []
+        await nodes.client.aclose()
+
+    asyncio.run(run())
@@ -1,16 +1,18 @@
 # tests/test_scenarios.py
 
+import asyncio
+
 from src.state import create_initial_state
 from src.graph import app
 
 def run(phone, user_msgs):
     state = create_initial_state(phone)
-    state = app.invoke(state)
+    state = asyncio.run(app.ainvoke(state))
 
     for msg in user_msgs:
         state["messages"].append({"role": "user", "content": msg})
         state["last_user_input"] = msg
-        state = app.invoke(state)
+        state = asyncio.run(app.ainvoke(state))
         if state.get("is_complete"):
             break
     return state
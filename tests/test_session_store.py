@@ -0,0 +1,226 @@
+# tests/test_session_store.py
+
+import time
+
+from backend.session_store import JournalSessionStore, MemorySessionStore, SQLiteSessionStore
+
+
+def make_state(n: int, complete: bool = False) -> dict:
+    return {
+        "messages": [{"role": "assistant", "content": f"Hello {n}"}],
+        "stage": "greeting",
+        "is_complete": complete,
+    }
+
+
+def test_memory_store_lru_and_idle_expiry(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    store = MemorySessionStore(max_entries=3, idle_ttl=60, completed_ttl=10)
+
+    for n in range(3):
+        store.set(f"s{n}", make_state(n))
+    store.get("s0")  # s1 is now least recently used
+    store.set("s3", make_state(3))
+    assert store.get("s1") is None
+    assert store.get("s0")["messages"][0]["content"] == "Hello 0"
+
+    # Completed calls expire sooner; updates restart the TTL
+    store.set("s3", make_state(3, complete=True))
+    clock[0] += 30
+    assert store.sweep() == 1
+    assert store.get("s3") is None
+    store.set("s2", make_state(2))
+
+    clock[0] += 45
+    assert store.sweep() == 1  # s0, idle since t=1000
+    assert store.get("s2") is not None
+
+    metrics = store.metrics()
+    assert metrics["size"] == 1
+    assert metrics["evictions"] == {"idle": 2, "capacity": 1}
+    assert metrics["bytes"] > 0
+
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    worker_a = SQLiteSessionStore(path, max_entries=2, idle_ttl=60, completed_ttl=0)
+    worker_b = SQLiteSessionStore(path, max_entries=2, idle_ttl=60, completed_ttl=0)
+    try:
+        worker_a.set("s1", make_state(1))
+        assert worker_b.get("s1") == make_state(1)
+
+        worker_b.set("s2", make_state(2, complete=True))
+        assert not worker_a.exists("s2")
+
+        worker_a.set("s3", make_state(3))
+        worker_a.set("s4", make_state(4))
+        assert worker_b.sweep() == 2  # s2 expired, s1 over capacity
+        assert worker_a.metrics()["size"] == 2
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_version_conflicts(tmp_path):
+    import pytest
+    from backend.session_store import SessionConflictError
+
+    sqlite_store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    journal_store = JournalSessionStore(str(tmp_path / "journal.sqlite3"))
+    for store in (MemorySessionStore(), sqlite_store, journal_store):
+        assert store.set("s1", make_state(1)) == 1
+        state, version = store.get_versioned("s1")
+
+        # Two turns computed from the same version: the second one loses
+        assert store.set("s1", make_state(2), expected_version=version) == 2
+        with pytest.raises(SessionConflictError):
+            store.set("s1", make_state(3), expected_version=version)
+        assert store.get("s1") == make_state(2)
+
+        with pytest.raises(SessionConflictError):
+            store.set("missing", make_state(4), expected_version=1)
+    sqlite_store.close()
+    journal_store.close()
+
+
+def test_journal_appends_deltas_and_replays_after_restart(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    store = JournalSessionStore(path, snapshot_every=3)
+    state = make_state(0)
+    version = store.set("s1", state)
+    for n in range(1, 6):
+        state, version = store.get_versioned("s1")
+        state["messages"].append({"role": "user", "content": f"turn {n}"})
+        state["last_user_input"] = f"turn {n}"
+        state["stage"] = f"stage{n}"
+        if n == 4:
+            # History compaction drops messages from the front
+            state["messages"] = state["messages"][2:]
+            state["archived_message_count"] = 2
+        version = store.set("s1", state, expected_version=version)
+
+    events = store.events("s1")
+    assert [event["kind"] for event in events] == ["snapshot", "delta", "delta", "snapshot", "delta", "delta"]
+    assert events[1]["user_input"] == "turn 1"
+    assert events[1]["delta"]["append"] == [{"role": "user", "content": "turn 1"}]
+    assert store.metrics()["deltas"] == 4
+    store.close()
+
+    # A fresh worker has no cache and rebuilds from the latest snapshot
+    restarted = JournalSessionStore(path, snapshot_every=3)
+    assert restarted.get_versioned("s1") == (state, 6)
+    assert restarted.metrics()["replayed_events"] == 3
+    restarted.close()
+
+
+def test_session_lock_serializes_one_session_only():
+    import asyncio
+    from backend.session_store import session_lock
+
+    async def run():
+        events = []
+
+        async def turn(session_id, n):
+            async with session_lock(session_id):
+                events.append(("start", session_id, n))
+                await asyncio.sleep(0.01)
+                events.append(("end", session_id, n))
+
+        await asyncio.gather(turn("a", 1), turn("a", 2), turn("b", 1))
+        return events
+
+    events = asyncio.run(run())
+    a_events = [e for e in events if e[1] == "a"]
+    assert a_events == [("start", "a", 1), ("end", "a", 1), ("start", "a", 2), ("end", "a", 2)]
+    # "b" ran alongside the first "a" turn
+    assert events.index(("start", "b", 1)) < events.index(("end", "a", 1))
+
+
+def test_archive_lives_and_expires_with_the_session(tmp_path, monkeypatch):
+    from backend.session_store import set_session_store, update_session
+
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    folded = [{"role": "assistant", "content": "Hello"}, {"role": "user", "content": "hi"}]
+
+    sqlite_store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), idle_ttl=60)
+    journal_store = JournalSessionStore(str(tmp_path / "journal.sqlite3"), idle_ttl=60, retention=0)
+    try:
+        for store in (MemorySessionStore(idle_ttl=60), sqlite_store, journal_store):
+            set_session_store(store)
+            version = store.set("s1", make_state(1))
+            state = {**make_state(1), "archived_message_count": 2, "pending_archive": folded}
+            update_session("s1", state, expected_version=version)
+            assert "pending_archive" not in state
+            assert store.get("s1")["archived_message_count"] == 2
+            assert store.archived("s1") == folded
+            assert store.archived("s1", 1, 2) == folded[1:]
+
+            store.set("s2", {**make_state(2), "archived_message_count": 2}, archive=folded)
+            store.delete("s2")
+            assert store.archived("s2") == []
+
+            clock[0] += 61
+            assert store.sweep() == 1
+            assert store.archived("s1") == []
+            clock[0] -= 61
+    finally:
+        set_session_store(None)
+        sqlite_store.close()
+        journal_store.close()
+
+
+def test_handoff_carries_the_archive():
+    folded = [{"role": "assistant", "content": "Hello"}]
+    old, new = MemorySessionStore(), MemorySessionStore()
+    old.set("s1", {**make_state(1), "archived_message_count": 1}, archive=folded)
+
+    entries = old.take(["s1"])
+    assert old.archived("s1") == []
+    assert new.restore(entries) == 1
+    assert new.archived("s1") == folded
+
+
+def test_memory_archive_is_capped_and_counted():
+    messages = [{"role": "user", "content": f"message {n}"} for n in range(5)]
+    from src.codec import estimate_size
+
+    store = MemorySessionStore(archive_limit=3)
+    state_bytes = estimate_size({**make_state(1), "archived_message_count": 2})
+
+    store.set("s1", {**make_state(1), "archived_message_count": 2}, archive=messages[:2])
+    assert store.metrics()["bytes"] == state_bytes + 2 * (5 + len("message 0"))
+    store.set("s1", {**make_state(1), "archived_message_count": 5}, archive=messages[2:])
+    # The oldest two are dropped; positions stay absolute
+    assert store.metrics()["bytes"] == state_bytes + 3 * (5 + len("message 0"))
+    assert store.archived("s1") == messages[2:]
+    assert store.archived("s1", 0, 3) == messages[2:3]
+    assert store.archived("s1", 3, 4) == messages[3:4]
+
+    # Handoff keeps the positions of the dropped messages
+    other = MemorySessionStore(archive_limit=3)
+    other.restore(store.take(["s1"]))
+    assert other.archived("s1", 3) == messages[3:]
+    assert store.metrics()["bytes"] == 0
+
+
+def test_blocking_stores_are_called_off_the_event_loop(tmp_path):
+    import asyncio
+    import threading
+
+    from backend.session_store import call_store, set_session_store
+
+    async def caller_thread():
+        return await call_store(lambda: threading.current_thread())
+
+    try:
+        set_session_store(SQLiteSessionStore(str(tmp_path / "sessions.sqlite3")))
+        assert asyncio.run(caller_thread()) is not threading.main_thread()
+        set_session_store(JournalSessionStore(str(tmp_path / "journal.sqlite3")))
+        assert asyncio.run(caller_thread()) is not threading.main_thread()
+        set_session_store(MemorySessionStore())
+        assert asyncio.run(caller_thread()) is threading.main_thread()
+    finally:
+        set_session_store(None)
@@ -0,0 +1,93 @@
+# tests/test_snapshot.py
+
+import pytest
+
+from backend import snapshot
+from backend.session_store import MemorySessionStore, set_session_store
+from src.records import MemoryRecordStore, set_record_store
+
+
+def make_state(n: int) -> dict:
+    return {
+        "messages": [{"role": "assistant", "content": f"Hello {n}"}],
+        "stage": "greeting",
+        "is_complete": False,
+    }
+
+
+def test_snapshot_round_trip_restores_lazily(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    sessions, records = MemorySessionStore(max_entries=10), MemoryRecordStore()
+    set_session_store(sessions)
+    set_record_store(records)
+    try:
+        for n in range(3):
+            sessions.set(f"s{n}", make_state(n))
+        sessions.set("s1", make_state(11))  # version 2
+        records.append("dispute", {"customer_id": "C1", "reason": "amount is wrong"})
+
+        saved = snapshot.write_snapshot(path)
+        assert (saved["sessions"], saved["records"]) == (3, 1)
+        assert snapshot.write_snapshot(path) is None  # unchanged
+
+        # Restart: fresh stores, state comes back from the file
+        sessions, records = MemorySessionStore(max_entries=2), MemoryRecordStore()
+        set_session_store(sessions)
+        set_record_store(records)
+        assert snapshot.load_snapshot(path)["sessions"] == 3
+        # Over capacity: the least recently used session is dropped
+        assert sessions.metrics()["size"] == 2
+        assert sessions.metrics()["cold"] == 2
+        assert sessions.get("s0") is None
+
+        state, version = sessions.get_versioned("s1")
+        assert state["messages"][0]["content"] == "Hello 11" and version == 2
+        assert sessions.metrics()["cold"] == 1
+
+        # Restored records keep their IDs and come before new ones
+        assert records.append("dispute", {"customer_id": "C2", "reason": "never took"}) == "DSP0002"
+        total, hits = records.search("dispute", "wrong")
+        assert total == 1 and hits[0]["id"] == "DSP0001"
+
+        # Snapshots of a restored store reuse the still-encoded sessions
+        assert snapshot.write_snapshot(path)["sessions"] == 2
+    finally:
+        set_session_store(None)
+        set_record_store(None)
+
+
+def test_archive_survives_a_restart(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    sessions = MemorySessionStore()
+    set_session_store(sessions)
+    set_record_store(MemoryRecordStore())
+    try:
+        archived = [{"role": "user", "content": f"turn {n}"} for n in range(3)]
+        sessions.set("s1", make_state(1), archive=archived)
+        snapshot.write_snapshot(path, force=True)
+
+        sessions = MemorySessionStore()
+        set_session_store(sessions)
+        snapshot.load_snapshot(path)
+        assert sessions.archived("s1") == archived
+        assert sessions.archived("s1", 1, 2) == archived[1:2]
+    finally:
+        set_session_store(None)
+        set_record_store(None)
+
+
+@pytest.mark.skipif(snapshot.fcntl is None, reason="needs flock")
+def test_workers_claim_separate_snapshot_slots(tmp_path):
+    import os
+
+    base = str(tmp_path / "snapshot.bin")
+    first, first_fd = snapshot.claim_slot(base)
+    second, second_fd = snapshot.claim_slot(base)
+    assert (first, second) == (base, str(tmp_path / "snapshot.1.bin"))
+
+    # A worker exiting frees its slot for the next one to start
+    os.close(first_fd)
+    third, third_fd = snapshot.claim_slot(base)
+    assert third == base
+    for fd in (second_fd, third_fd):
+        os.close(fd)
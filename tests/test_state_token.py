@@ -0,0 +1,61 @@
+# tests/test_state_token.py
+
+import pytest
+
+from backend.message_log import MemoryMessageLog, MessageLogConflictError, SQLiteMessageLog
+from backend.state_token import StateTokenError, issue_token, read_token
+
+
+STATE = {
+    "messages": [{"role": "assistant", "content": "Hello"}],
+    "stage": "verification",
+    "turn_count": 1,
+    "awaiting_user": True,
+    "customer_phone": "9876543210",
+    "customer_dob": "1990-05-15",
+    "outstanding_amount": 50000.0,
+    "offered_plans": [],
+}
+
+
+def test_token_round_trip_and_rejections(monkeypatch):
+    monkeypatch.setenv("STATE_TOKEN_SECRET", "new-secret,old-secret")
+    token = issue_token("s1", STATE, 1)
+    state, count = read_token("s1", token)
+    assert count == 1
+    assert state["stage"] == "verification" and state["customer_phone"] == "9876543210"
+    # Messages live in the message log; CRM fields are looked up again
+    assert "messages" not in state and "customer_dob" not in state
+
+    with pytest.raises(StateTokenError):
+        read_token("s2", token)  # bound to its session
+    with pytest.raises(StateTokenError):
+        read_token("s1", token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB"))
+    with pytest.raises(StateTokenError):
+        read_token("s1", token, ttl=-1)
+
+    # Rotation: tokens signed with a retired secret still verify
+    monkeypatch.setenv("STATE_TOKEN_SECRET", "old-secret")
+    old_token = issue_token("s1", STATE, 1)
+    monkeypatch.setenv("STATE_TOKEN_SECRET", "new-secret,old-secret")
+    assert read_token("s1", old_token)[1] == 1
+    monkeypatch.setenv("STATE_TOKEN_SECRET", "other")
+    with pytest.raises(StateTokenError):
+        read_token("s1", token)
+
+
+def test_message_log_appends_only_at_the_end(tmp_path):
+    sqlite_log = SQLiteMessageLog(str(tmp_path / "messages.sqlite3"), retention=60)
+    for log in (MemoryMessageLog(retention=60), sqlite_log):
+        assert log.append("s1", 0, [{"role": "assistant", "content": "Hi"}]) == 1
+        assert log.append("s1", 1, [{"role": "user", "content": "yes"}, {"role": "assistant", "content": "ok"}]) == 3
+        # A turn computed from an older token loses
+        with pytest.raises(MessageLogConflictError):
+            log.append("s1", 1, [{"role": "user", "content": "again"}])
+        assert log.length("s1") == 3
+        assert [m["content"] for m in log.read("s1", 1)] == ["yes", "ok"]
+
+        log.retention = -1
+        assert log.sweep() == 1
+        assert log.length("s1") == 0
+    sqlite_log.close()
@@ -0,0 +1,49 @@
+# tests/test_timing.py
+
+import asyncio
+
+from backend.turn_pool import TurnPool
+from src.timing import current_timings, record_timing, timed, timed_node, turn_timings
+
+
+def test_turn_breakdown_and_header():
+    async def llm_node(state):
+        with timed("llm-intent"):
+            await asyncio.sleep(0)
+        return {}
+
+    def rule_node(state):
+        return {}
+
+    async def run():
+        nodes = [timed_node("payment_check", llm_node), timed_node("analyze_rules", rule_node)]
+        assert not asyncio.iscoroutinefunction(nodes[1])
+        with turn_timings() as timings:
+            async with TurnPool(max_concurrency=1).slot():
+                with timed("session-load"):
+                    pass
+                await nodes[0]({})
+                # Worker threads see the turn too
+                await asyncio.to_thread(nodes[1], {})
+                await asyncio.to_thread(nodes[1], {})
+            record_timing("llm-plans", 0.0, "skipped")
+        return timings
+
+    timings = asyncio.run(run())
+    assert current_timings() is None
+    names = [entry["name"] for entry in timings.to_list()]
+    assert names == [
+        "queue", "session-load", "llm-intent", "node-payment_check",
+        "node-analyze_rules", "node-analyze_rules-2", "llm-plans",
+    ]
+    header = timings.header()
+    assert header.startswith("queue;dur=0.0, session-load;dur=")
+    assert 'llm-plans;dur=0.0;desc="skipped"' in header
+    assert ", total;dur=" in header
+
+
+def test_timed_is_a_no_op_outside_a_turn():
+    with timed("session-load"):
+        pass
+    record_timing("llm-intent", 1.0)
+    assert current_timings() is None
@@ -0,0 +1,34 @@
+# tests/test_tracing.py
+
+import asyncio
+import inspect
+
+from src.tracing import GraphTracer
+
+
+def test_wrapped_nodes_keep_their_kind_and_record_spans():
+    tracer = GraphTracer(recursion_limit=10)
+
+    def sync_node(state):
+        return {"stage": "verification"}
+
+    async def async_node(state):
+        return {"stage": "negotiation", "turn_count": 1}
+
+    sync_traced = tracer.wrap("sync", sync_node)
+    async_traced = tracer.wrap("async", async_node)
+    assert not inspect.iscoroutinefunction(sync_traced)
+    assert inspect.iscoroutinefunction(async_traced)
+
+    # Untraced calls pass straight through
+    assert sync_traced({}, None) == {"stage": "verification"}
+
+    with tracer.turn("s1"):
+        sync_traced({}, {"metadata": {"langgraph_step": 1}})
+        asyncio.run(async_traced({}, {"metadata": {"langgraph_step": 2}}))
+
+    [trace] = tracer.get_traces("s1")
+    assert trace["nodes"] == ["sync", "async"]
+    assert [span["keys"] for span in trace["spans"]] == [["stage"], ["stage", "turn_count"]]
+    assert trace["depth"] == 2
+    assert tracer.node_stats()["sync"]["calls"] == 1
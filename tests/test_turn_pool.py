@@ -0,0 +1,95 @@
+# tests/test_turn_pool.py
+
+import asyncio
+
+import pytest
+
+from backend.turn_pool import TurnPool, TurnQueueFullError, TurnWaitTimeoutError
+
+
+def test_queue_limit_fifo_and_wait_timeout():
+    async def run():
+        pool = TurnPool(max_concurrency=1, max_queue=2, max_wait=0.2)
+        order = []
+        release_first = asyncio.Event()
+
+        async def turn(n, hold=None):
+            async with pool.slot():
+                order.append(n)
+                if hold is not None:
+                    await hold.wait()
+
+        first = asyncio.create_task(turn(1, release_first))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(turn(n)) for n in (2, 3)]
+        await asyncio.sleep(0)
+        assert pool.metrics()["queued"] == 2
+
+        with pytest.raises(TurnQueueFullError) as rejected:
+            await pool.acquire()
+        assert rejected.value.retry_after >= 1
+
+        release_first.set()
+        await asyncio.gather(first, *queued)
+        assert order == [1, 2, 3]
+
+        # A waiter that can't start within max_wait gives up
+        blocker = asyncio.Event()
+        holder = asyncio.create_task(turn(4, blocker))
+        await asyncio.sleep(0)
+        with pytest.raises(TurnWaitTimeoutError):
+            await turn(5)
+        blocker.set()
+        await holder
+
+        metrics = pool.metrics()
+        assert metrics["running"] == 0 and metrics["queued"] == 0
+        assert metrics["rejected_full"] == 1 and metrics["timed_out"] == 1
+
+    asyncio.run(run())
+
+
+def test_wait_is_capped_by_the_turn_deadline():
+    from src.deadline import turn_deadline
+
+    async def run():
+        pool = TurnPool(max_concurrency=1, max_queue=4, max_wait=10)
+        await pool.acquire()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with turn_deadline(0.05):
+            with pytest.raises(TurnWaitTimeoutError):
+                await pool.acquire()
+        assert loop.time() - started < 1
+        assert pool.metrics()["queued"] == 0
+
+        # A turn with no time left is not queued at all
+        with turn_deadline(0):
+            with pytest.raises(TurnWaitTimeoutError):
+                await pool.acquire()
+        pool.release()
+        assert pool.metrics()["running"] == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_already_popped_by_release():
+    async def run():
+        pool = TurnPool(max_concurrency=1, max_queue=4, max_wait=10)
+        await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        # The release runs before the cancelled waiter resumes. Depending on
+        # the Python version the waiter ends up with the slot or cancelled;
+        # either way nothing leaks and nothing raises ValueError
+        pool.release()
+        try:
+            await waiter
+            pool.release()
+        except asyncio.CancelledError:
+            pass
+        metrics = pool.metrics()
+        assert metrics["running"] == 0 and metrics["queued"] == 0
+
+    asyncio.run(run())
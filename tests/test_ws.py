@@ -0,0 +1,81 @@
+# tests/test_ws.py
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from backend.routes.ws import CLOSE_SESSION_NOT_FOUND, STREAM_CHUNK_CHARS, chunk_text
+
+
+def test_chunks_rejoin_to_the_text():
+    text = "For security purposes, could you please confirm your date of birth before we continue?"
+    chunks = chunk_text(text)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= STREAM_CHUNK_CHARS + 1 for chunk in chunks)
+    assert chunk_text("") == []
+
+
+def receive_turn(websocket) -> list[dict]:
+    events = []
+    while not events or events[-1]["type"] not in ("turn_complete", "error"):
+        events.append(websocket.receive_json())
+    return events
+
+
+def test_turn_over_the_socket(client):
+    session = client.post("/api/init", json={"phone": "+919876543210"}).json()
+    session_id = session["session_id"]
+
+    with client.websocket_connect(f"/api/ws/{session_id}") as websocket:
+        hello = websocket.receive_json()
+        assert hello["type"] == "session" and hello["session_id"] == session_id
+        assert hello["messages"] == session["messages"] and hello["cursor"] == session["cursor"]
+
+        websocket.send_json({"type": "user_message", "content": "yes"})
+        events = receive_turn(websocket)
+        kinds = [event["type"] for event in events]
+        assert kinds[0] == "message" and events[0]["message"] == {"role": "user", "content": "yes"}
+        assert kinds[-2:] == ["stage", "turn_complete"]
+        assert events[-2]["stage"] == "verification"
+
+        # Chunks of one assistant message, then the message itself
+        reply = next(event for event in events if event["type"] == "message" and event["index"] == 2)
+        chunks = [event for event in events if event["type"] == "message_delta"]
+        assert len(chunks) > 1 and {event["index"] for event in chunks} == {2}
+        assert "".join(event["text"] for event in chunks) == reply["message"]["content"]
+        assert kinds.index("message_delta") < events.index(reply)
+
+        done = events[-1]
+        assert done["cursor"] == 3 and done["changes"]["stage"] == "verification"
+        messages = client.get(f"/api/sessions/{session_id}/messages").json()["messages"]
+        assert messages[1:] == [events[0]["message"], reply["message"]]
+
+
+def test_socket_errors_keep_the_connection(client):
+    session_id = client.post("/api/init", json={"phone": "+919876543210"}).json()["session_id"]
+
+    with client.websocket_connect(f"/api/ws/{session_id}") as websocket:
+        websocket.receive_json()
+
+        websocket.send_text("not json")
+        assert websocket.receive_json() == {"type": "error", "status": 400, "detail": "Events must be JSON objects"}
+        websocket.send_json({"type": "shout"})
+        assert websocket.receive_json()["status"] == 400
+        websocket.send_json({"type": "user_message", "content": "   "})
+        assert websocket.receive_json() == {"type": "error", "status": 400, "detail": "user_input cannot be empty"}
+
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json() == {"type": "pong"}
+        websocket.send_json({"type": "user_message", "content": "yes"})
+        assert receive_turn(websocket)[-1]["cursor"] == 3
+
+
+def test_unknown_session_is_closed(client):
+    from starlette.websockets import WebSocketDisconnect
+
+    with client.websocket_connect("/api/ws/missing") as websocket:
+        assert websocket.receive_json()["status"] == 404
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == CLOSE_SESSION_NOT_FOUND